@@ -0,0 +1,155 @@
+"""
+Times the startup and the widget interactions of the Streamlit dashboard on the local DuckDB engine.
+
+Every run starts in a fresh process and drives spotify_viz_app.py with Streamlit's AppTest:
+
+- import_ms:           importing the modules the app imports at the top, before it renders
+                       anything (in a fresh interpreter)
+- first_view_ms:       the first script run, from an empty result cache (cold) and from the
+                       cache the cold run filled (warm)
+- interactions:        one rerun per widget change, in order: opening each section, the feature
+                       plot axis and kind, the decade selection and the artist comparison decade.
+                       Steps whose widget the app does not have are reported as skipped.
+
+    python benchmarks/app_benchmark.py --parquet cleaned_tracks_features.parquet --output app.json
+
+Pass another version of the app with --app (e.g., `git show HEAD~1:visualization/spotify_viz_app.py`)
+to compare both on the same data.
+"""
+import argparse
+import ast
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# common puts the dashboard modules on sys.path, so it is imported first
+from common import VISUALIZATION_DIR, emit  # isort: skip
+
+DEFAULT_APP = os.path.join(VISUALIZATION_DIR, "spotify_viz_app.py")
+
+# (step, widget type, widget label, value) in the order they are applied; None picks the last option
+INTERACTIONS = [
+    ("open_relationships", "radio", "Section", "Audio Feature Relationships"),
+    ("scatter_x_axis", "selectbox", "X-axis feature", "valence"),
+    ("sample_plot", "radio", "Plot", "Sample"),
+    ("decades", "multiselect", "Select Decades", None),
+    ("open_insights", "radio", "Section", "Additional Insights"),
+    ("artist_decade", "selectbox", "Select decade for artist comparison", None),
+    ("open_keys", "radio", "Section", "Musical Key Insights"),
+    ("open_decades", "radio", "Section", "Music Across Decades"),
+]
+
+
+def top_level_imports(app: str) -> list:
+    """Returns the modules a script imports at module level, before any of its code runs."""
+    with open(app) as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            modules.append(node.module)
+    return modules
+
+
+def import_ms(app: str) -> float:
+    code = (
+        "import sys, time; sys.path.insert(0, sys.argv[1]); start = time.perf_counter(); "
+        + "; ".join(f"import {module}" for module in top_level_imports(app))
+        + "; print((time.perf_counter() - start) * 1000)"
+    )
+    output = subprocess.run([sys.executable, "-c", code, VISUALIZATION_DIR], capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def _find(at, widget: str, label: str):
+    widgets = list(getattr(at, widget)) + list(getattr(at.sidebar, widget))
+    return next((w for w in widgets if w.label == label), None)
+
+
+def drive_app(app: str, interactions: bool, timeout: float) -> dict:
+    """Runs the app once in this process and times its first run and, optionally, every interaction."""
+    from streamlit.testing.v1 import AppTest
+
+    def run(at) -> float:
+        start = time.perf_counter()
+        at.run(timeout=timeout)
+        seconds = time.perf_counter() - start
+        if at.exception:
+            raise RuntimeError(f"The app raised: {[e.value for e in at.exception]}")
+        return seconds * 1000
+
+    at = AppTest.from_file(app, default_timeout=timeout)
+    result = {"first_view_ms": run(at)}
+    if not interactions:
+        return result
+
+    steps = {}
+    for step, widget_type, label, value in INTERACTIONS:
+        widget = _find(at, widget_type, label)
+        if widget is None:
+            steps[step] = {"skipped": f"no {widget_type} {label!r}"}
+            continue
+        if value is None:
+            value = [widget.options[-1]] if widget_type == "multiselect" else widget.options[-1]
+        widget.set_value(value)
+        steps[step] = {"ms": run(at)}
+    result["interactions"] = steps
+    return result
+
+
+def in_fresh_process(function, *args) -> dict:
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(function, *args).result()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--parquet", required=True, help="Cleaned tracks Parquet file or partitioned directory")
+    parser.add_argument("--app", default=DEFAULT_APP, help="Dashboard script to drive")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh-process runs; the median of each figure is reported")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds allowed per script run")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    os.environ.update({
+        "SPOTIFY_DASHBOARD_BACKEND": "local",
+        "SPOTIFY_PARQUET_PATH": os.path.abspath(args.parquet),
+    })
+
+    runs = []
+    for _ in range(args.repeat):
+        # Each repetition starts from an empty result cache
+        os.environ["SPOTIFY_CACHE_DIR"] = tempfile.mkdtemp(prefix="dashboard_cache_")
+        cold = in_fresh_process(drive_app, args.app, False, args.timeout)
+        warm = in_fresh_process(drive_app, args.app, True, args.timeout)
+        runs.append({"import_ms": import_ms(args.app), "cold": cold, "warm": warm})
+
+    def median(values):
+        values = sorted(values)
+        return values[len(values) // 2]
+
+    interactions = {}
+    for step in runs[0]["warm"]["interactions"]:
+        measured = [run["warm"]["interactions"][step] for run in runs]
+        interactions[step] = (
+            {"ms": median([m["ms"] for m in measured])} if "ms" in measured[0] else measured[0]
+        )
+    emit({
+        "app": args.app,
+        "parquet": args.parquet,
+        "repeat": args.repeat,
+        "import_ms": median([run["import_ms"] for run in runs]),
+        "first_view_cold_ms": median([run["cold"]["first_view_ms"] for run in runs]),
+        "first_view_warm_ms": median([run["warm"]["first_view_ms"] for run in runs]),
+        "interactions": interactions,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
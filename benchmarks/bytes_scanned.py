@@ -0,0 +1,81 @@
+"""
+Measures the bytes each dashboard query scans, before and after a model layout change.
+
+Runs every panel query of the dashboard against two dbt datasets (e.g., a copy of the
+dataset built before the change and the current one) with the query cache disabled and
+reports bytes processed, bytes billed and slot time per query:
+
+    bq cp -r dbt_spotify dbt_spotify_before  # before the change
+    python benchmarks/bytes_scanned.py \\
+        --before data-engineering-spotify.dbt_spotify_before \\
+        --after data-engineering-spotify.dbt_spotify \\
+        --decades 1960s 1970s
+
+With --dry-run only BigQuery's estimate is collected. Dry runs account for partition
+pruning but not for cluster pruning, so they overstate the bytes of clustered tables.
+"""
+import argparse
+
+from google.cloud import bigquery
+
+# common puts the dashboard modules on sys.path, so it is imported first
+from common import emit  # isort: skip
+from backends import bigquery_parameters
+from queries import dashboard_queries, panel_params
+
+
+def measure(client: bigquery.Client, dataset: str, decades: list, dry_run: bool) -> dict:
+    params = panel_params(decades)
+    results = {}
+    for panel, sql in dashboard_queries(dataset).items():
+        job_config = bigquery.QueryJobConfig(
+            use_query_cache=False, dry_run=dry_run, query_parameters=bigquery_parameters(sql, params)
+        )
+        job = client.query(sql, job_config=job_config)
+        if not dry_run:
+            job.result()
+        results[panel] = {
+            "bytes_processed": job.total_bytes_processed,
+            "bytes_billed": job.total_bytes_billed,
+            "slot_millis": job.slot_millis,
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--project", default="data-engineering-spotify")
+    parser.add_argument("--before", required=True, help="Project-qualified dbt dataset before the change")
+    parser.add_argument("--after", required=True, help="Project-qualified dbt dataset after the change")
+    parser.add_argument("--decades", nargs="*", default=["1960s", "1970s"], help="Decades selected in the dashboard")
+    parser.add_argument("--dry-run", action="store_true", help="Only collect the dry-run estimates")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    client = bigquery.Client(project=args.project)
+    before = measure(client, args.before, args.decades, args.dry_run)
+    after = measure(client, args.after, args.decades, args.dry_run)
+
+    emit({
+        "decades": args.decades,
+        "dry_run": args.dry_run,
+        "queries": {
+            panel: {
+                "before": before[panel],
+                "after": after[panel],
+                "bytes_processed_ratio": (
+                    after[panel]["bytes_processed"] / before[panel]["bytes_processed"]
+                    if before[panel]["bytes_processed"] else None
+                ),
+            }
+            for panel in before
+        },
+        "total_bytes_processed": {
+            "before": sum(m["bytes_processed"] or 0 for m in before.values()),
+            "after": sum(m["bytes_processed"] or 0 for m in after.values()),
+        },
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
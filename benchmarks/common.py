@@ -0,0 +1,58 @@
+import importlib.util
+import json
+import os
+import sys
+from types import ModuleType
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(REPO_DIR, "scripts")
+VISUALIZATION_DIR = os.path.join(REPO_DIR, "visualization")
+
+# Dashboard helper modules (queries.py, ...) are imported by name
+if VISUALIZATION_DIR not in sys.path:
+    sys.path.insert(0, VISUALIZATION_DIR)
+
+
+def load_script(name: str) -> ModuleType:
+    """
+    Imports a pipeline script from scripts/ by file name (e.g., 'csv-to-parquet').
+
+    The scripts are named for the command line and are not importable as regular modules.
+    """
+    if SCRIPTS_DIR not in sys.path:
+        sys.path.insert(0, SCRIPTS_DIR)
+    module_name = name.replace("-", "_")
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(SCRIPTS_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def rss_bytes(field: str) -> int:
+    """
+    Returns the VmRSS (current) or VmHWM (peak) RSS of this process.
+
+    Unlike ru_maxrss, VmHWM is not inherited from the parent across the exec of a spawned process.
+    Falls back to ru_maxrss where /proc is not available.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) * 1024 for line in f if line.startswith(f"{field}:"))
+    except (OSError, StopIteration):
+        import resource
+
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+def emit(results: dict, output_path: str = None) -> None:
+    """Prints benchmark results as JSON and optionally writes them to a file."""
+    text = json.dumps(results, indent=2)
+    print(text)
+    if output_path:
+        with open(output_path, "w") as f:
+            f.write(text + "\n")
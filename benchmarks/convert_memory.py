@@ -0,0 +1,119 @@
+"""
+Measures the peak memory of convert_csv_to_parquet as the input CSV grows.
+
+Builds inputs of growing size by repeating the rows of one cleaned CSV (--copies), then converts
+each with every --block-sizes in a freshly spawned process that reports:
+
+- seconds:               wall time of the conversion
+- arrow_peak_bytes:      peak of Arrow's memory pool (CSV blocks, batches and row groups)
+- peak_rss_bytes:        peak RSS of the process
+- baseline_rss_bytes:    RSS after the imports, before the conversion started
+
+If the conversion streams, the Arrow peak and the RSS above the baseline stay the same as the
+input grows; `growth` reports the ratio of the peaks of the largest and the smallest input:
+
+    python benchmarks/convert_memory.py --csv cleaned_tracks_features.csv --copies 1 2 4 --output memory.json
+    python benchmarks/convert_memory.py --rows 1000000 --block-sizes 1 16
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# common puts the dashboard modules on sys.path, so it is imported first
+from common import emit, load_script, rss_bytes  # isort: skip
+from generate_tracks import write_tracks_csv
+
+
+def repeat_csv(csv_path: str, copies: int, output_path: str) -> None:
+    """Writes the header of `csv_path` once followed by its rows `copies` times."""
+    with open(csv_path, "rb") as source, open(output_path, "wb") as output:
+        output.write(source.readline())
+        body_start = source.tell()
+        for _ in range(copies):
+            source.seek(body_start)
+            shutil.copyfileobj(source, output, 16 * 1024 * 1024)
+
+
+def _measure(csv_path: str, parquet_path: str, block_size_mb: int) -> dict:
+    import pyarrow as pa
+
+    converter = load_script("csv-to-parquet")
+    baseline = rss_bytes("VmRSS")
+    start = time.perf_counter()
+    converter.convert_csv_to_parquet(csv_path, parquet_path, block_size_mb=block_size_mb)
+    return {
+        "seconds": time.perf_counter() - start,
+        "arrow_peak_bytes": pa.default_memory_pool().max_memory(),
+        "peak_rss_bytes": rss_bytes("VmHWM"),
+        "baseline_rss_bytes": baseline,
+    }
+
+
+def convert(csv_path: str, parquet_path: str, block_size_mb: int) -> dict:
+    """Converts in a freshly spawned process, so its peaks are not inflated by earlier runs."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(_measure, csv_path, parquet_path, block_size_mb).result()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="Cleaned tracks CSV (output of clean_tracks.py)")
+    source.add_argument("--rows", type=int, help="Generate and clean this many synthetic tracks instead")
+    parser.add_argument("--copies", type=int, nargs="+", default=[1, 2, 4],
+                        help="Input sizes, as the number of times the rows of the CSV are repeated")
+    parser.add_argument("--block-sizes", type=int, nargs="+", default=[1, 16], help="CSV read block sizes (in MB)")
+    parser.add_argument("--workdir", help="Directory for the generated files (defaults to a temporary directory)")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="convert_memory_")
+    os.makedirs(workdir, exist_ok=True)
+    csv_path = args.csv
+    if csv_path is None:
+        raw_path = os.path.join(workdir, "tracks_features.csv")
+        csv_path = os.path.join(workdir, "cleaned_tracks_features.csv")
+        write_tracks_csv(raw_path, args.rows)
+        load_script("clean_tracks").clean_tracks_csv(raw_path, csv_path)
+
+    results = {size: [] for size in args.block_sizes}
+    parquet_path = os.path.join(workdir, "converted.parquet")
+    for copies in sorted(args.copies):
+        input_path = csv_path
+        if copies > 1:
+            input_path = os.path.join(workdir, f"input_x{copies}.csv")
+            repeat_csv(csv_path, copies, input_path)
+        for block_size_mb in args.block_sizes:
+            print(f"[x{copies}] block size {block_size_mb}MB...", file=sys.stderr)
+            measured = convert(input_path, parquet_path, block_size_mb)
+            results[block_size_mb].append({"copies": copies, "input_bytes": os.path.getsize(input_path), **measured})
+        if input_path != csv_path:
+            os.remove(input_path)
+
+    emit({
+        "csv": csv_path,
+        "block_sizes": [
+            {
+                "block_size_mb": block_size_mb,
+                "runs": runs,
+                "growth": {
+                    "input": runs[-1]["input_bytes"] / runs[0]["input_bytes"],
+                    "arrow_peak": runs[-1]["arrow_peak_bytes"] / runs[0]["arrow_peak_bytes"],
+                    "rss_above_baseline": (
+                        (runs[-1]["peak_rss_bytes"] - runs[-1]["baseline_rss_bytes"])
+                        / (runs[0]["peak_rss_bytes"] - runs[0]["baseline_rss_bytes"])
+                    ),
+                },
+            }
+            for block_size_mb, runs in results.items()
+        ],
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
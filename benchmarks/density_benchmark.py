@@ -0,0 +1,118 @@
+"""
+Compares the payload of the feature density plot with that of the sample scatter plot as more tracks match.
+
+Runs the panel queries of the Audio Feature Relationships section on the local DuckDB engine for
+growing decade selections, from the latest decade to every decade, and reports for each:
+
+- tracks:           the tracks the selection matches
+- density:          the density_query latency, its result rows and frame bytes for the selected
+                    decades, and the JSON size of the heatmap the dashboard draws from them
+- sample:           the same for the scatter plot of the default sample size
+- points:           the JSON size of a scatter plot of every matched track (what plotting the
+                    exact distribution as points would ship to the browser)
+
+    python benchmarks/density_benchmark.py --parquet cleaned_tracks_features.parquet --output density.json
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+import plotly.express as px
+
+# common puts the dashboard modules on sys.path, so it is imported first
+from common import emit  # isort: skip
+from backends import DuckDBBackend
+from panels import density_grids
+from queries import DECADES_FILTER, DEFAULT_DENSITY_BINS, DENSITY_FEATURES, density_query, panel_params, sample_query
+
+
+def points_query(x_feature: str, y_feature: str, dataset: str) -> str:
+    # Every selected track, as a scatter plot of the exact distribution would need
+    return f"""
+    SELECT {DENSITY_FEATURES[x_feature][0]} as {x_feature}, {DENSITY_FEATURES[y_feature][0]} as {y_feature}, mood
+    FROM `{dataset}.spotify_music_analysis`
+    WHERE decade IS NOT NULL {DECADES_FILTER}
+    """
+
+
+def timed_query(backend: DuckDBBackend, sql: str, params: dict, repeat: int):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = backend.query(sql, params)
+        seconds.append(time.perf_counter() - start)
+    return df, statistics.median(seconds)
+
+
+def figure_bytes(fig) -> int:
+    return len(fig.to_json())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--parquet", required=True, help="Cleaned tracks Parquet file or partitioned directory")
+    parser.add_argument("--x-feature", default="energy", choices=list(DENSITY_FEATURES))
+    parser.add_argument("--y-feature", default="danceability", choices=list(DENSITY_FEATURES))
+    parser.add_argument("--bins", type=int, default=DEFAULT_DENSITY_BINS, help="Bins per axis of the density plot")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query; the median is reported")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    backend = DuckDBBackend(args.parquet)
+    x, y = args.x_feature, args.y_feature
+    decades = backend.query("SELECT decade FROM spotify.spotify_decade_features WHERE decade IS NOT NULL ORDER BY decade")
+    decades = decades["decade"].astype(str).tolist()
+
+    # The dashboard fetches the density of every decade once and sums the selected decades
+    all_decades = panel_params([], density_bins=args.bins)
+    density_df, density_seconds = timed_query(backend, density_query(x, y, backend.dataset), all_decades, args.repeat)
+
+    results = []
+    for count in range(1, len(decades) + 1):
+        selected = decades[-count:]
+        params = panel_params(selected, density_bins=args.bins)
+
+        start = time.perf_counter()
+        selected_df = density_df[density_df["decade"].isin(selected)]
+        _, grids = density_grids(selected_df, selected, args.bins)
+        grid_seconds = time.perf_counter() - start
+        heatmap = px.imshow(grids, facet_col=0, origin="lower", aspect="auto")
+
+        sample_df, sample_seconds = timed_query(backend, sample_query(backend.dataset), params, args.repeat)
+        points_df = backend.query(points_query(x, y, backend.dataset), params)
+
+        results.append({
+            "decades": len(selected),
+            "tracks": int(grids.sum()),
+            "density": {
+                "query_ms": density_seconds * 1000,
+                "grid_ms": grid_seconds * 1000,
+                "rows": len(selected_df),
+                "frame_bytes": int(selected_df.memory_usage(deep=True).sum()),
+                "figure_bytes": figure_bytes(heatmap),
+            },
+            "sample": {
+                "query_ms": sample_seconds * 1000,
+                "rows": len(sample_df),
+                "frame_bytes": int(sample_df.memory_usage(deep=True).sum()),
+                "figure_bytes": figure_bytes(px.scatter(sample_df, x=x, y=y, color="mood")),
+            },
+            "points": {
+                "rows": len(points_df),
+                "figure_bytes": figure_bytes(px.scatter(points_df, x=x, y=y, color="mood")),
+            },
+        })
+
+    emit({
+        "parquet": args.parquet,
+        "x_feature": x,
+        "y_feature": y,
+        "bins": args.bins,
+        "heatmap_cells": int(np.prod(grids.shape)),
+        "selections": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
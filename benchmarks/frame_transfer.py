@@ -0,0 +1,89 @@
+"""
+Compares the default and the Arrow-native fetch path of the dashboard queries.
+
+For every dashboard query, and a large slice of spotify_music_analysis, reports the fetch
+latency and the memory of the resulting DataFrame for:
+
+- default: the previous path, `to_dataframe()` over REST on BigQuery or `.df()` on DuckDB,
+  with object strings and float64 columns
+- arrow:   the dashboard's path, an Arrow fetch converted by compact_frame (categoricals,
+  float32), streamed through the BigQuery Storage Read API when it is installed
+
+    python benchmarks/frame_transfer.py --parquet cleaned_tracks_features.parquet
+    python benchmarks/frame_transfer.py --bigquery --large-rows 1000000
+"""
+import argparse
+import statistics
+import time
+
+# common puts the dashboard modules on sys.path, so it is imported first
+from common import emit  # isort: skip
+from backends import BigQueryBackend, DuckDBBackend, bigquery_parameters, compact_frame
+from queries import dashboard_queries, panel_params
+
+LARGE_QUERY = """
+SELECT decade, mood, key_description, modality_description, primary_artist, danceability, energy, valence, tempo
+FROM `{dataset}.spotify_music_analysis`
+LIMIT @large_rows
+"""
+
+
+def default_fetch(backend, sql: str, params: dict):
+    if isinstance(backend, DuckDBBackend):
+        return backend.execute(sql, params).df()
+
+    from google.cloud import bigquery
+
+    job_config = bigquery.QueryJobConfig(query_parameters=bigquery_parameters(sql, params))
+    return backend.client.query(sql, job_config=job_config).to_dataframe(create_bqstorage_client=False)
+
+
+def arrow_fetch(backend, sql: str, params: dict):
+    return compact_frame(backend.query_arrow(sql, params))
+
+
+def measure(fetch, backend, sql: str, params: dict, repeat: int) -> dict:
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = fetch(backend, sql, params)
+        seconds.append(time.perf_counter() - start)
+    return {
+        "rows": len(df),
+        "median_seconds": statistics.median(seconds),
+        "memory_bytes": int(df.memory_usage(deep=True).sum()),
+        "dtypes": {column: str(dtype) for column, dtype in df.dtypes.items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--parquet", help="Parquet file or directory queried with the local DuckDB engine")
+    source.add_argument("--bigquery", action="store_true", help="Query the dbt dataset on BigQuery")
+    parser.add_argument("--decades", nargs="*", default=["1960s", "1970s"], help="Decades selected in the dashboard")
+    parser.add_argument("--large-rows", type=int, default=100_000, help="Rows of the large spotify_music_analysis slice")
+    parser.add_argument("--repeat", type=int, default=3, help="Fetches per query and path; the median is reported")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    backend = BigQueryBackend() if args.bigquery else DuckDBBackend(args.parquet)
+    params = {**panel_params(args.decades), "large_rows": args.large_rows}
+    queries = {**dashboard_queries(backend.dataset), "large": LARGE_QUERY.format(dataset=backend.dataset)}
+
+    results = {}
+    for name, sql in queries.items():
+        default = measure(default_fetch, backend, sql, params, args.repeat)
+        arrow = measure(arrow_fetch, backend, sql, params, args.repeat)
+        results[name] = {
+            "default": default,
+            "arrow": arrow,
+            "memory_ratio": arrow["memory_bytes"] / default["memory_bytes"] if default["memory_bytes"] else None,
+            "latency_ratio": arrow["median_seconds"] / default["median_seconds"],
+        }
+
+    emit({"backend": backend.name, "decades": args.decades, "queries": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
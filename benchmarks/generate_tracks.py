@@ -0,0 +1,167 @@
+"""
+Generates a synthetic Spotify `tracks_features.csv` at any scale.
+
+The output has the columns and quirks of the Kaggle export read by clean_tracks.py:
+
+- `artists` / `artist_ids` hold Python list strings ("['A', 'B']"), with double quotes around
+  names containing an apostrophe and the odd name containing a comma
+- artist popularity is Zipf-distributed, so a few artists have many tracks
+- `release_date` is a full date, a year-month or a bare year, and a few tracks have year 0
+- audio features follow skewed distributions in their real ranges, and a few names are missing
+
+Rows are generated and written in chunks, so 100M rows need no more memory than one chunk:
+
+    python benchmarks/generate_tracks.py --rows 10000000 --output tracks_features.csv
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+
+COLUMNS = [
+    "id", "name", "album", "album_id", "artists", "artist_ids", "track_number", "disc_number", "explicit",
+    "danceability", "energy", "key", "loudness", "mode", "speechiness", "acousticness", "instrumentalness",
+    "liveness", "valence", "tempo", "duration_ms", "time_signature", "year", "release_date",
+]
+
+WORDS = np.array([
+    "love", "night", "heart", "time", "baby", "dance", "fire", "dream", "blue", "home", "light", "rain",
+    "summer", "road", "girl", "world", "gold", "wild", "river", "shadow", "city", "star", "stone", "sky",
+    "ocean", "midnight", "radio", "ghost", "paradise", "thunder", "honey", "velvet", "echo", "silver",
+])
+SUFFIXES = np.array(["", "", "", "", "", " - Remastered", " - Live", " (feat. Guest)", " - 2011 Remaster"])
+ID_ALPHABET = np.frombuffer(b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz", dtype="S1")
+
+
+def _ids(rng: np.random.Generator, n: int) -> np.ndarray:
+    # 22-character base62 identifiers, like Spotify IDs
+    return ID_ALPHABET[rng.integers(0, len(ID_ALPHABET), size=(n, 22))].view("S22").ravel().astype(str)
+
+
+def _titles(rng: np.random.Generator, n: int, max_words: int) -> pd.Series:
+    words = WORDS[rng.integers(0, len(WORDS), size=(n, max_words))]
+    lengths = rng.integers(1, max_words + 1, size=n)
+    titles = pd.Series(words[:, 0]).str.title()
+    for i in range(1, max_words):
+        titles = titles.where(lengths <= i, titles + " " + words[:, i])
+    return titles
+
+
+def artist_pool(rng: np.random.Generator, size: int) -> tuple:
+    """Returns artist names and IDs; some names contain an apostrophe or a comma, as in the real export."""
+    names = ("The " + _titles(rng, size, 2) + " " + pd.Series(np.arange(size)).astype(str)).to_numpy()
+    quirks = rng.random(size)
+    names = np.where(quirks < 0.02, names + "'s Band", names)
+    names = np.where((quirks >= 0.02) & (quirks < 0.03), names + ", Jr.", names)
+    return names, _ids(rng, size)
+
+
+def _list_strings(names: np.ndarray) -> pd.Series:
+    # Python repr of a list of strings: names with an apostrophe are double-quoted
+    quoted = pd.Series(names)
+    has_apostrophe = quoted.str.contains("'", regex=False)
+    return quoted.where(has_apostrophe, "'" + quoted + "'").where(~has_apostrophe, '"' + quoted + '"')
+
+
+def generate_tracks(rows: int, seed: int = 0, start_id: int = 0, pool: tuple = None) -> pd.DataFrame:
+    """
+    Generates `rows` synthetic raw tracks.
+
+    :param rows:     Number of tracks
+    :param seed:     Random seed; the same seed, rows and pool give the same tracks
+    :param start_id: Offset of the generated rows, used to draw a different chunk of the same dataset
+    :param pool:     Artist names and IDs from artist_pool (defaults to one artist per 20 tracks)
+    """
+    rng = np.random.default_rng([seed, start_id])
+    names, ids = pool if pool is not None else artist_pool(np.random.default_rng(seed), max(rows // 20, 1))
+
+    # One to three artists per track, drawn with Zipf popularity
+    artist_count = rng.choice([1, 2, 3], size=rows, p=[0.8, 0.15, 0.05])
+    picks = (rng.zipf(1.3, size=(rows, 3)) - 1) % len(names)
+    artists = _list_strings(names[picks[:, 0]])
+    artist_ids = pd.Series(ids[picks[:, 0]])
+    for i in (1, 2):
+        more = artist_count > i
+        artists = artists.where(~more, artists + ", " + _list_strings(names[picks[:, i]]))
+        artist_ids = artist_ids.where(~more, artist_ids + "', '" + ids[picks[:, i]])
+
+    # Release years skew to recent decades; some tracks only have a year or a year-month
+    year = np.clip(np.round(2020 - rng.gamma(2.0, 11.0, size=rows)), 1920, 2020).astype(int)
+    month = rng.integers(1, 13, size=rows)
+    day = rng.integers(1, 29, size=rows)
+    precision = rng.random(size=rows)
+    year_str = pd.Series(year).astype(str)
+    month_str = pd.Series(month).astype(str).str.zfill(2)
+    release_date = year_str.where(
+        precision < 0.15, (year_str + "-" + month_str).where(
+            precision < 0.2, year_str + "-" + month_str + "-" + pd.Series(day).astype(str).str.zfill(2)
+        )
+    )
+    unknown_year = rng.random(size=rows) < 0.0005
+    year = np.where(unknown_year, 0, year)
+    release_date = release_date.where(~unknown_year, "0000")
+
+    name = (_titles(rng, rows, 4) + SUFFIXES[rng.integers(0, len(SUFFIXES), size=rows)]).where(
+        rng.random(size=rows) >= 0.0002, None
+    )
+
+    return pd.DataFrame({
+        "id": _ids(rng, rows),
+        "name": name,
+        "album": _titles(rng, rows, 3),
+        "album_id": _ids(rng, rows),
+        "artists": "[" + artists + "]",
+        "artist_ids": "['" + artist_ids + "']",
+        "track_number": rng.integers(1, 21, size=rows),
+        "disc_number": np.where(rng.random(size=rows) < 0.95, 1, 2),
+        # Written as True/False like the export, not as CSV booleans
+        "explicit": np.where(rng.random(size=rows) < 0.1, "True", "False"),
+        "danceability": rng.beta(5, 4, size=rows),
+        "energy": rng.beta(2, 1.5, size=rows),
+        "key": rng.integers(0, 12, size=rows),
+        "loudness": np.clip(rng.normal(-10, 5, size=rows), -60, 5),
+        "mode": (rng.random(size=rows) < 0.7).astype(int),
+        "speechiness": rng.beta(1, 12, size=rows),
+        "acousticness": rng.beta(0.6, 0.9, size=rows),
+        "instrumentalness": rng.beta(0.2, 1.5, size=rows),
+        "liveness": rng.beta(1.5, 7, size=rows),
+        "valence": rng.beta(2, 2, size=rows),
+        "tempo": np.clip(rng.normal(120, 30, size=rows), 0, 250),
+        "duration_ms": np.clip(rng.gamma(6, 40000, size=rows), 1000, 6_000_000).astype(int),
+        "time_signature": rng.choice([3, 4, 5], size=rows, p=[0.1, 0.85, 0.05]),
+        "year": year,
+        "release_date": release_date,
+    }, columns=COLUMNS)
+
+
+def write_tracks_csv(path: str, rows: int, seed: int = 0, chunk_rows: int = 1_000_000) -> None:
+    """Writes `rows` synthetic tracks to a CSV, one chunk at a time, with Arrow's CSV writer."""
+    pool = artist_pool(np.random.default_rng(seed), max(rows // 20, 1))
+    tmp_path = f"{path}.tmp"
+    writer = schema = None
+    for start in range(0, rows, chunk_rows):
+        chunk = pa.Table.from_pandas(generate_tracks(min(chunk_rows, rows - start), seed, start, pool), preserve_index=False)
+        if writer is None:
+            schema = chunk.schema
+            writer = pv.CSVWriter(tmp_path, schema)
+        writer.write_table(chunk.cast(schema))
+    if writer is not None:
+        writer.close()
+    os.replace(tmp_path, path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Number of tracks (e.g., 1000000, 10000000, 100000000)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000, help="Tracks generated and written per chunk")
+    parser.add_argument("--output", default="tracks_features.csv")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    write_tracks_csv(args.output, args.rows, args.seed, args.chunk_rows)
+    print(f"Wrote {args.rows} tracks to {args.output} in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,131 @@
+"""
+Compares the file size and scan times of the Parquet layouts of csv-to-parquet.py.
+
+Converts one cleaned CSV with every layout of LAYOUTS (and the analytics layout at other
+row-group sizes), then reports for each file its size, write time and row groups, and for
+typical reads:
+
+- decade_aggregate: averages by decade over every row (column projection only)
+- decade_filter:    one decade (pruned by row-group statistics once sorted by decade)
+- artist_lookup:    one artist's tracks (statistics, and Bloom filters where written)
+- song_lookup:      one track by song_id (Bloom filters only; song_id is not sorted)
+
+the median DuckDB latency and the row groups left after pyarrow's statistics-based pruning:
+
+    python benchmarks/parquet_layout.py --csv cleaned_tracks_features.csv
+    python benchmarks/parquet_layout.py --rows 2000000 --row-group-sizes 16384 262144
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import duckdb
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# common puts the dashboard modules on sys.path, so it is imported first
+from common import emit, load_script  # isort: skip
+from generate_tracks import write_tracks_csv
+
+QUERIES = {
+    "decade_aggregate": "SELECT decade, AVG(danceability), AVG(energy), COUNT(*) FROM '{path}' GROUP BY decade",
+    "decade_filter": "SELECT AVG(energy), COUNT(*) FROM '{path}' WHERE decade = $decade",
+    "artist_lookup": "SELECT name, decade, valence FROM '{path}' WHERE primary_artist = $artist",
+    "song_lookup": "SELECT * FROM '{path}' WHERE song_id = $song_id",
+}
+
+
+def lookup_values(path: str) -> dict:
+    """Picks a mid-sized decade, an artist with a handful of tracks and a track to look up."""
+    table = pq.read_table(path, columns=["decade", "primary_artist", "song_id"])
+    decades = table["decade"].drop_null().value_counts().to_pylist()
+    decade = sorted(decades, key=lambda d: d["counts"])[len(decades) // 2]["values"]
+    artists = sorted(table["primary_artist"].drop_null().value_counts().to_pylist(), key=lambda a: -a["counts"])
+    artist = artists[min(len(artists) - 1, 100)]["values"]
+    song_id = table["song_id"][table.num_rows // 2].as_py()
+    return {"decade": decade, "artist": artist, "song_id": song_id}
+
+
+def row_groups_read(path: str, params: dict) -> dict:
+    # Row groups pyarrow still has to read after pruning by min/max statistics
+    filters = {
+        "decade_aggregate": None,
+        "decade_filter": pc.field("decade") == params["decade"],
+        "artist_lookup": pc.field("primary_artist") == params["artist"],
+        "song_lookup": pc.field("song_id") == params["song_id"],
+    }
+    fragment = next(iter(ds.dataset(path).get_fragments()))
+    return {
+        name: len(fragment.split_by_row_group(expression)) if expression is not None else fragment.num_row_groups
+        for name, expression in filters.items()
+    }
+
+
+def scan_seconds(path: str, params: dict, repeat: int) -> dict:
+    con = duckdb.connect()
+    results = {}
+    for name, sql in QUERIES.items():
+        sql = sql.format(path=path)
+        bound = {key: params[key] for key in params if f"${key}" in sql}
+        seconds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            con.execute(sql, bound).fetchall()
+            seconds.append(time.perf_counter() - start)
+        results[name] = statistics.median(seconds)
+    return results
+
+
+def main() -> None:
+    converter = load_script("csv-to-parquet")
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="Cleaned tracks CSV (output of clean_tracks.py)")
+    source.add_argument("--rows", type=int, help="Generate and clean this many synthetic tracks instead")
+    parser.add_argument("--row-group-sizes", type=int, nargs="*", default=[32 * 1024, 256 * 1024],
+                        help="Other row-group sizes to try with the analytics layout")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query; the median is reported")
+    parser.add_argument("--workdir", help="Directory for the generated files (defaults to a temporary directory)")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="parquet_layout_")
+    os.makedirs(workdir, exist_ok=True)
+    csv_path = args.csv
+    if csv_path is None:
+        raw_path = os.path.join(workdir, "tracks_features.csv")
+        csv_path = os.path.join(workdir, "cleaned_tracks_features.csv")
+        write_tracks_csv(raw_path, args.rows)
+        load_script("clean_tracks").clean_tracks_csv(raw_path, csv_path)
+
+    layouts = dict(converter.LAYOUTS)
+    for size in args.row_group_sizes:
+        layouts[f"analytics_{size}"] = converter.ANALYTICS_LAYOUT._replace(row_group_size=size)
+
+    results = {}
+    params = None
+    for name, layout in layouts.items():
+        path = os.path.join(workdir, f"{name}.parquet")
+        start = time.perf_counter()
+        converter.convert_csv_to_parquet(csv_path, path, layout=layout)
+        write_seconds = time.perf_counter() - start
+
+        params = params or lookup_values(path)
+        results[name] = {
+            "layout": layout._asdict(),
+            "write_seconds": write_seconds,
+            "file_bytes": os.path.getsize(path),
+            "row_groups": pq.ParquetFile(path).num_row_groups,
+            "row_groups_read": row_groups_read(path, params),
+            "scan_seconds": scan_seconds(path, params, args.repeat),
+        }
+
+    emit({"csv": csv_path, "lookups": params, "layouts": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Times every pipeline stage on synthetic Spotify-shaped data at several scales.
+
+For each --rows scale, a `tracks_features.csv` is generated with generate_tracks.py in a
+process of its own (and reused by later runs), then every stage runs in a freshly spawned
+process that reports its wall time, its peak RSS (VmHWM) and its RSS after the imports:
+
+- clean:     clean_tracks_csv on the raw CSV, in chunks of CLEAN_CHUNK_ROWS rows
+- convert:   convert_csv_to_parquet on the cleaned CSV
+- validate:  validate_tracks_parquet on the Parquet file
+- upload:    upload_to_gcs of the Parquet file to a local GCS emulator (STORAGE_EMULATOR_HOST)
+- load:      load_parquet_from_gcs_to_bq from the emulator bucket (BIGQUERY_EMULATOR_HOST)
+- dashboard: building the local DuckDB engine and running every dashboard query on it
+
+Stages whose emulator is not configured are reported as skipped:
+
+    STORAGE_EMULATOR_HOST=http://localhost:9023 python benchmarks/pipeline_benchmark.py \\
+        --rows 1000000 10000000 --output results.json
+
+Pass a previous results file as --baseline to report the time and memory ratios of every
+stage against it.
+"""
+import argparse
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+# common puts the dashboard modules on sys.path, so it is imported first
+from common import emit, load_script, rss_bytes  # isort: skip
+from generate_tracks import write_tracks_csv
+
+STAGES = ("clean", "convert", "validate", "upload", "load", "dashboard")
+PROJECT_ID = "data-engineering-spotify"
+BUCKET_NAME = "spotify-benchmark"
+DATASET_ID = "spotify_benchmark"
+
+# The clean stage reads the raw CSV with pandas, so it is cleaned in chunks to reach the larger scales
+CLEAN_CHUNK_ROWS = 250_000
+
+
+def clean_stage(raw_csv: str, cleaned_csv: str) -> dict:
+    load_script("clean_tracks").clean_tracks_csv(raw_csv, cleaned_csv, chunk_rows=CLEAN_CHUNK_ROWS)
+    return {"input_bytes": os.path.getsize(raw_csv), "output_bytes": os.path.getsize(cleaned_csv)}
+
+
+def convert_stage(cleaned_csv: str, parquet_file: str) -> dict:
+    import pyarrow.parquet as pq
+
+    load_script("csv-to-parquet").convert_csv_to_parquet(cleaned_csv, parquet_file)
+    return {
+        "input_bytes": os.path.getsize(cleaned_csv),
+        "output_bytes": os.path.getsize(parquet_file),
+        "rows": pq.ParquetFile(parquet_file).metadata.num_rows,
+    }
+
+
+def validate_stage(parquet_file: str) -> dict:
+    # Synthetic track names repeat, so their song_ids are not unique
+    report = load_script("validate_tracks").validate_tracks_parquet(parquet_file)
+    return {key: report[key] for key in ("rows", "column_chunks_read", "column_chunks_skipped", "duplicate_song_ids")}
+
+
+def upload_stage(parquet_file: str, blob_name: str, parallel: bool) -> dict:
+    from google.api_core.exceptions import Conflict
+    from google.cloud import storage
+
+    try:
+        storage.Client(project=PROJECT_ID).create_bucket(BUCKET_NAME)
+    except Conflict:
+        pass
+
+    start = time.perf_counter()
+    load_script("csv-to-parquet").upload_to_gcs(BUCKET_NAME, parquet_file, blob_name, PROJECT_ID, parallel=parallel)
+    seconds = time.perf_counter() - start
+    size = os.path.getsize(parquet_file)
+    return {"bytes": size, "mb_per_second": size / (1024 * 1024) / seconds}
+
+
+def load_stage(blob_name: str, table_id: str) -> dict:
+    parquet_to_bq = load_script("parquet-to-bq")
+    parquet_to_bq._bigquery_client(PROJECT_ID).create_dataset(DATASET_ID, exists_ok=True)
+    job = parquet_to_bq.load_parquet_from_gcs_to_bq(
+        PROJECT_ID, DATASET_ID, table_id, f"gs://{BUCKET_NAME}/{blob_name}"
+    )
+    return {"output_rows": job.output_rows}
+
+
+def dashboard_stage(parquet_file: str) -> dict:
+    from backends import DuckDBBackend
+    from queries import dashboard_queries, panel_params
+
+    start = time.perf_counter()
+    backend = DuckDBBackend(parquet_file)
+    engine_seconds = time.perf_counter() - start
+
+    params = panel_params(["1960s", "1970s"])
+    queries = {}
+    for name, sql in dashboard_queries(backend.dataset).items():
+        start = time.perf_counter()
+        rows = len(backend.query(sql, params))
+        queries[name] = {"seconds": time.perf_counter() - start, "rows": rows}
+    return {"engine_seconds": engine_seconds, "queries": queries}
+
+
+STAGE_FUNCTIONS = {
+    "clean": clean_stage,
+    "convert": convert_stage,
+    "validate": validate_stage,
+    "upload": upload_stage,
+    "load": load_stage,
+    "dashboard": dashboard_stage,
+}
+
+
+def _measure(stage: str, kwargs: dict) -> dict:
+    baseline = rss_bytes("VmRSS")
+    start = time.perf_counter()
+    details = STAGE_FUNCTIONS[stage](**kwargs)
+    return {
+        "seconds": time.perf_counter() - start,
+        "peak_rss_bytes": rss_bytes("VmHWM"),
+        "baseline_rss_bytes": baseline,
+        **details,
+    }
+
+
+def _in_fresh_process(function, *args):
+    # A spawned process starts from a new interpreter, and its VmHWM only covers its own memory
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(function, *args).result()
+
+
+def run_stage(stage: str, **kwargs) -> dict:
+    """Runs a stage in a freshly spawned process, so its peak RSS is not inflated by earlier stages."""
+    return _in_fresh_process(_measure, stage, kwargs)
+
+
+def benchmark_scale(rows: int, workdir: str, stages: list, seed: int, parallel_upload: bool) -> dict:
+    raw_csv = os.path.join(workdir, f"tracks_features_{rows}_{seed}.csv")
+    cleaned_csv = os.path.join(workdir, f"cleaned_tracks_features_{rows}.csv")
+    parquet_file = os.path.join(workdir, f"cleaned_tracks_features_{rows}.parquet")
+    blob_name = f"benchmark/cleaned_tracks_features_{rows}.parquet"
+
+    result = {"rows": rows, "stages": {}}
+    if not os.path.exists(raw_csv):
+        start = time.perf_counter()
+        # Generated in its own process, so that the benchmark process stays small
+        _in_fresh_process(write_tracks_csv, raw_csv, rows, seed)
+        result["generate_seconds"] = time.perf_counter() - start
+    result["raw_bytes"] = os.path.getsize(raw_csv)
+
+    emulators = {"upload": "STORAGE_EMULATOR_HOST", "load": "BIGQUERY_EMULATOR_HOST"}
+    stage_args = {
+        "clean": {"raw_csv": raw_csv, "cleaned_csv": cleaned_csv},
+        "convert": {"cleaned_csv": cleaned_csv, "parquet_file": parquet_file},
+        "validate": {"parquet_file": parquet_file},
+        "upload": {"parquet_file": parquet_file, "blob_name": blob_name, "parallel": parallel_upload},
+        "load": {"blob_name": blob_name, "table_id": f"cleaned_tracks_features_{rows}"},
+        "dashboard": {"parquet_file": parquet_file},
+    }
+    for stage in STAGES:
+        if stage not in stages:
+            continue
+        if stage in emulators and not os.environ.get(emulators[stage]):
+            result["stages"][stage] = {"skipped": f"{emulators[stage]} is not set"}
+            continue
+        print(f"[{rows} rows] {stage}...", file=sys.stderr)
+        result["stages"][stage] = run_stage(stage, **stage_args[stage])
+    return result
+
+
+def compare(results: dict, baseline: dict) -> dict:
+    """Returns the time and peak RSS ratio of every stage measured in both runs (> 1 is a regression)."""
+    baseline_scales = {scale["rows"]: scale for scale in baseline["scales"]}
+    ratios = {}
+    for scale in results["scales"]:
+        previous = baseline_scales.get(scale["rows"])
+        if previous is None:
+            continue
+        for stage, measured in scale["stages"].items():
+            before = previous["stages"].get(stage, {})
+            if "seconds" in measured and "seconds" in before:
+                ratios[f"{scale['rows']}/{stage}"] = {
+                    "seconds_ratio": measured["seconds"] / before["seconds"],
+                    "peak_rss_ratio": measured["peak_rss_bytes"] / before["peak_rss_bytes"],
+                }
+    return ratios
+
+
+def main(argv: Optional[list] = None) -> None:
+    import json
+
+    import duckdb
+    import pandas as pd
+    import pyarrow as pa
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000], help="Scales to run (e.g., 1000000 10000000 100000000)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--workdir", default="benchmark_data", help="Directory for the generated and intermediate files")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--parallel-upload", action="store_true", help="Use the parallel composite upload")
+    parser.add_argument("--baseline", help="Previous results file to compare against")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pandas": pd.__version__,
+            "pyarrow": pa.__version__,
+            "duckdb": duckdb.__version__,
+        },
+        "scales": [
+            benchmark_scale(rows, args.workdir, args.stages, args.seed, args.parallel_upload) for rows in args.rows
+        ],
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            results["regressions"] = compare(results, json.load(f))
+
+    emit(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Compares the similarity index of the tracks like this panel with brute-force search.
+
+Builds the index from spotify_music_analysis on the local DuckDB engine, over a cleaned
+Parquet file or a synthetic catalog of --rows tracks (1.2M by default, the size of the
+Kaggle export), then reports the build time, index size and load time, and for random
+tracks of the catalog:
+
+- the single-query latency (median and p95) and the batched time per query of the index
+  at every --nprobe
+- the same for search_exact, which scores every track
+- the recall@k of the index: the share of the exact k nearest tracks it returns
+
+    python benchmarks/similarity_benchmark.py --rows 1200000 --output similarity.json
+    python benchmarks/similarity_benchmark.py --parquet cleaned_tracks_features.parquet --nprobe 8 16
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+# common puts the dashboard modules on sys.path, so it is imported first
+from common import emit, load_script  # isort: skip
+from backends import DuckDBBackend
+from generate_tracks import write_tracks_csv
+from queries import similarity_query
+from similarity import SimilarityIndex
+
+
+def synthetic_parquet(workdir: str, rows: int) -> str:
+    # Runs the pipeline on generated tracks, reusing the output of earlier runs
+    parquet_path = os.path.join(workdir, f"cleaned_tracks_features_{rows}.parquet")
+    if not os.path.exists(parquet_path):
+        raw_path = os.path.join(workdir, f"tracks_features_{rows}.csv")
+        csv_path = os.path.join(workdir, f"cleaned_tracks_features_{rows}.csv")
+        write_tracks_csv(raw_path, rows)
+        load_script("clean_tracks").clean_tracks_csv(raw_path, csv_path)
+        load_script("csv-to-parquet").convert_csv_to_parquet(csv_path, parquet_path)
+    return parquet_path
+
+
+def latencies(search, queries: np.ndarray) -> dict:
+    # One query at a time, as the panel searches, then all of them in one call
+    seconds = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        seconds.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    _, positions = search(queries)
+    batched = (time.perf_counter() - start) / len(queries)
+    return {
+        "single_ms_p50": float(np.percentile(seconds, 50) * 1000),
+        "single_ms_p95": float(np.percentile(seconds, 95) * 1000),
+        "batched_ms_per_query": batched * 1000,
+    }, positions
+
+
+def recall(positions: np.ndarray, exact_positions: np.ndarray) -> float:
+    return float(np.mean([
+        len(set(found) & set(exact)) / len(exact) for found, exact in zip(positions, exact_positions)
+    ]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--parquet", help="Cleaned tracks Parquet file or partitioned directory")
+    source.add_argument("--rows", type=int, default=1_200_000, help="Generate a synthetic catalog of this many tracks")
+    parser.add_argument("--queries", type=int, default=500, help="Random tracks to search for")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32, 64], help="Lists scanned per query")
+    parser.add_argument("--workdir", help="Directory for the generated files (defaults to a temporary directory)")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="similarity_")
+    os.makedirs(workdir, exist_ok=True)
+    parquet_path = args.parquet or synthetic_parquet(workdir, args.rows)
+
+    backend = DuckDBBackend(parquet_path)
+    start = time.perf_counter()
+    tracks_df = backend.query(similarity_query(backend.dataset))
+    query_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = SimilarityIndex.build(tracks_df)
+    build_seconds = time.perf_counter() - start
+    del tracks_df
+
+    index_path = os.path.join(workdir, "similarity_index")
+    index.save(index_path)
+    start = time.perf_counter()
+    index = SimilarityIndex.load(index_path)
+    load_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    queries = np.asarray(index.vectors[rng.choice(len(index), args.queries, replace=False)])
+
+    exact, exact_positions = latencies(lambda q: index.search_exact(q, args.k), queries)
+    results = {
+        "tracks": len(index),
+        "lists": index.metadata["lists"],
+        "query_seconds": query_seconds,
+        "build_seconds": build_seconds,
+        "load_seconds": load_seconds,
+        "index_bytes": sum(entry.stat().st_size for entry in os.scandir(index_path)),
+        "vector_bytes": index.vectors.nbytes,
+        "k": args.k,
+        "exact": exact,
+        "index": {},
+    }
+    for nprobe in args.nprobe:
+        measured, positions = latencies(lambda q: index.search(q, args.k, nprobe), queries)
+        measured["recall"] = recall(positions, exact_positions)
+        measured["speedup_single"] = exact["single_ms_p50"] / measured["single_ms_p50"]
+        results["index"][nprobe] = measured
+
+    emit(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Compares the single-stream and parallel composite uploads of upload_to_gcs.
+
+Meant to run against a local fake-GCS emulator, for example:
+
+    docker run -d -p 4443:4443 fsouza/fake-gcs-server -scheme http
+    STORAGE_EMULATOR_HOST=http://localhost:4443 python benchmarks/upload_benchmark.py --size-mb 256
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from google.api_core.exceptions import Conflict
+from google.cloud import storage
+
+from common import emit, load_script
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--file", help="File to upload (defaults to a random file of --size-mb)")
+    parser.add_argument("--size-mb", type=int, default=128)
+    parser.add_argument("--bucket", default="spotify-benchmark")
+    parser.add_argument("--project", default="data-engineering-spotify")
+    parser.add_argument("--part-size-mb", type=int, default=8)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    csv_to_parquet = load_script("csv-to-parquet")
+
+    try:
+        storage.Client(project=args.project).create_bucket(args.bucket)
+    except Conflict:
+        pass
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = args.file
+        if not source:
+            source = os.path.join(tmp_dir, "payload.bin")
+            with open(source, "wb") as f:
+                for _ in range(args.size_mb):
+                    f.write(os.urandom(1024 * 1024))
+        size_mb = os.path.getsize(source) / (1024 * 1024)
+
+        def timed(**kwargs) -> dict:
+            runs = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                csv_to_parquet.upload_to_gcs(
+                    bucket_name=args.bucket,
+                    source_file_path=source,
+                    destination_blob_name="benchmark/payload.bin",
+                    project_id=args.project,
+                    **kwargs
+                )
+                runs.append(time.perf_counter() - start)
+            best = min(runs)
+            return {"seconds": runs, "best_seconds": best, "mb_per_second": size_mb / best}
+
+        results = {
+            "storage_emulator_host": os.environ.get("STORAGE_EMULATOR_HOST"),
+            "size_mb": size_mb,
+            "single_stream": timed(chunk_size_mb=5),
+            "parallel": {
+                str(workers): timed(parallel=True, part_size_mb=args.part_size_mb, max_workers=workers)
+                for workers in args.workers
+            }
+        }
+
+    emit(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
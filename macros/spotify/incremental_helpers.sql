@@ -0,0 +1,79 @@
+{#
+    Ids of the source partitions that changed since the target was built.
+
+    A source partition is selected when it is newer than the matching target partition, or when
+    the target has no such partition yet. Both tables must be partitioned on the same integer
+    ranges (one partition per year), so their partition ids line up, including the special
+    '__UNPARTITIONED__' (values outside the range) and '__NULL__' partitions.
+#}
+{% macro changed_partition_ids(source_relation, target_relation) %}
+    SELECT src.partition_id
+    FROM `{{ source_relation.database }}.{{ source_relation.schema }}.INFORMATION_SCHEMA.PARTITIONS` AS src
+    LEFT JOIN `{{ target_relation.database }}.{{ target_relation.schema }}.INFORMATION_SCHEMA.PARTITIONS` AS tgt
+        ON tgt.table_name = '{{ target_relation.identifier }}'
+        AND tgt.partition_id = src.partition_id
+    WHERE src.table_name = '{{ source_relation.identifier }}'
+        AND (tgt.partition_id IS NULL OR src.last_modified_time > tgt.last_modified_time)
+{% endmacro %}
+
+{#
+    Table the pre-hook snapshots the changed partition ids into, next to the target.
+
+    The ids are computed once per run, before the pre-hook's DELETE modifies the target's '__NULL__'
+    partition, and the DELETE and the model's filter both read this fixed set. Recomputing them in
+    the filter would no longer select the '__NULL__' partition once the DELETE made it newer than
+    the source's. A {% set %} in the model cannot be used instead: hooks are rendered in their own
+    context, after the model is compiled.
+#}
+{% macro changed_partitions_relation(target_relation) %}
+    {{ return(api.Relation.create(
+        database=target_relation.database,
+        schema=target_relation.schema,
+        identifier=target_relation.identifier ~ '__changed_partitions'
+    )) }}
+{% endmacro %}
+
+{#
+    Limits an incremental run to the rows of the source partitions that changed, as snapshotted by
+    snapshot_changed_partitions.
+
+    Numbered partitions select their value. The '__UNPARTITIONED__' and '__NULL__' partitions have
+    no value, so when one of them changed every row outside [range_start, range_end) or every row
+    without a value is reprocessed.
+#}
+{% macro changed_source_partitions(partition_column, target_relation, range_start=1900, range_end=2100) %}
+    {% set changed %}SELECT partition_id FROM {{ changed_partitions_relation(target_relation) }}{% endset %}
+    (
+        {{ partition_column }} IN (SELECT SAFE_CAST(partition_id AS INT64) FROM ({{ changed }}))
+        OR (
+            ({{ partition_column }} < {{ range_start }} OR {{ partition_column }} >= {{ range_end }})
+            AND '__UNPARTITIONED__' IN ({{ changed }})
+        )
+        OR ({{ partition_column }} IS NULL AND '__NULL__' IN ({{ changed }}))
+    )
+{% endmacro %}
+
+{#
+    Pre-hook of an incremental run: snapshots the changed partition ids, then deletes the target rows
+    without a partition value when the source's '__NULL__' partition changed.
+
+    insert_overwrite replaces the partitions of the new rows by value, which never matches NULL, so
+    the reprocessed rows would otherwise be appended next to the previous ones. Renders nothing on a
+    first run or a full refresh.
+#}
+{% macro snapshot_changed_partitions(target_column, source_relation, target_relation) %}
+    {% if is_incremental() %}
+    {% set changed_relation = changed_partitions_relation(target_relation) %}
+    CREATE OR REPLACE TABLE {{ changed_relation }} AS
+    {{ changed_partition_ids(source_relation, target_relation) }};
+
+    DELETE FROM {{ target_relation }}
+    WHERE {{ target_column }} IS NULL
+        AND '__NULL__' IN (SELECT partition_id FROM {{ changed_relation }})
+    {% endif %}
+{% endmacro %}
+
+{# Post-hook: drops the snapshot of snapshot_changed_partitions once the run has used it. #}
+{% macro drop_changed_partitions(target_relation) %}
+    DROP TABLE IF EXISTS {{ changed_partitions_relation(target_relation) }}
+{% endmacro %}
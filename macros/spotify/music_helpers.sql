@@ -23,3 +23,7 @@
         ELSE 'Unknown'
     END
 {% endmacro %}
+
+{% macro get_sample_bucket(id_column, buckets=10000) %}
+    ABS(MOD(FARM_FINGERPRINT({{ id_column }}), {{ buckets }}))
+{% endmacro %}
@@ -0,0 +1,18 @@
+{{
+  config(
+    materialized = 'table',
+    cluster_by = ['decade'],
+    description = 'Track counts and audio feature sums per decade and primary artist backing the artist panels'
+  )
+}}
+
+SELECT
+    decade,
+    primary_artist,
+    COUNT(*) AS track_count,
+    SUM(danceability) AS sum_danceability,
+    SUM(energy) AS sum_energy,
+    SUM(valence) AS sum_valence
+FROM {{ ref('spotify_music_analysis') }}
+WHERE decade IS NOT NULL
+GROUP BY decade, primary_artist
@@ -0,0 +1,18 @@
+{{
+  config(
+    materialized = 'table',
+    description = 'Per-decade audio feature sums and track counts backing the decade trends panel'
+  )
+}}
+
+-- sums and counts instead of averages, so any set of decades can be recombined exactly
+SELECT
+    decade,
+    COUNT(*) AS track_count,
+    SUM(danceability) AS sum_danceability,
+    SUM(energy) AS sum_energy,
+    SUM(valence) AS sum_valence,
+    SUM(acousticness) AS sum_acousticness
+FROM {{ ref('spotify_music_analysis') }}
+WHERE decade IS NOT NULL
+GROUP BY decade
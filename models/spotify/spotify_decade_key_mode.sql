@@ -0,0 +1,16 @@
+{{
+  config(
+    materialized = 'table',
+    description = 'Track counts and valence sums per decade, key and mode backing the musical key panels'
+  )
+}}
+
+SELECT
+    decade,
+    key_description,
+    modality_description,
+    COUNT(*) AS track_count,
+    SUM(valence) AS sum_valence
+FROM {{ ref('spotify_music_analysis') }}
+WHERE decade IS NOT NULL
+GROUP BY decade, key_description, modality_description
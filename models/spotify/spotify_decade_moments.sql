@@ -0,0 +1,36 @@
+{{
+  config(
+    materialized = 'table',
+    description = 'Per-decade sums and cross-product sums of the audio features backing the exact correlation matrix'
+  )
+}}
+
+-- Keep in sync with CORR_FEATURES in visualization/queries.py
+{% set features = ['danceability', 'energy', 'acousticness', 'valence', 'tempo_scaled'] %}
+
+WITH tracks AS (
+    SELECT
+        decade,
+        danceability,
+        energy,
+        acousticness,
+        valence,
+        tempo / 200 AS tempo_scaled
+    FROM {{ ref('spotify_music_analysis') }}
+    WHERE decade IS NOT NULL
+)
+
+SELECT
+    decade,
+    COUNT(*) AS track_count,
+    {%- for x in features %}
+    SUM({{ x }}) AS sum_{{ x }},
+    {%- endfor %}
+    {%- for x in features %}
+    {%- set outer_loop = loop %}
+    {%- for y in features[loop.index0:] %}
+    SUM({{ x }} * {{ y }}) AS sum_{{ x }}_x_{{ y }}{{ ',' if not (outer_loop.last and loop.last) }}
+    {%- endfor %}
+    {%- endfor %}
+FROM tracks
+GROUP BY decade
@@ -0,0 +1,14 @@
+{{
+  config(
+    materialized = 'table',
+    description = 'Track counts per decade and mood backing the mood distribution panel'
+  )
+}}
+
+SELECT
+    decade,
+    mood,
+    COUNT(*) AS track_count
+FROM {{ ref('spotify_music_analysis') }}
+WHERE decade IS NOT NULL
+GROUP BY decade, mood
@@ -1,6 +1,15 @@
 {{
   config(
-    materialized = 'table',
+    materialized = 'incremental',
+    incremental_strategy = 'insert_overwrite',
+    partition_by = {
+      'field': 'release_year',
+      'data_type': 'int64',
+      'range': {'start': 1900, 'end': 2100, 'interval': 1}
+    },
+    cluster_by = ['decade', 'primary_artist', 'mood'],
+    pre_hook = "{{ snapshot_changed_partitions('release_year', source('spotify', 'cleaned_tracks_features'), this) }}",
+    post_hook = "{{ drop_changed_partitions(this) }}",
     description = 'Enriched Spotify tracks with musical key descriptions, decade categorization, and mood analysis'
   )
 }}
@@ -12,6 +21,8 @@ SELECT
     artists,
     explicit,
     song_id,
+    -- stable pseudo-random bucket (0-9999) for deterministic sampling
+    {{ get_sample_bucket('song_id') }} AS sample_bucket,
     -- audio features
     danceability,
     energy,
@@ -37,4 +48,9 @@ SELECT
         WHEN valence < 0.5 THEN 'Sad'
         ELSE 'Ambivalent'
     END AS mood
-FROM {{ source('spotify', 'cleaned_tracks_features') }}
\ No newline at end of file
+FROM {{ source('spotify', 'cleaned_tracks_features') }}
+{% if is_incremental() %}
+-- only reprocess the release years whose source partition changed, as snapshotted by the pre-hook before it
+-- removed the previous rows without a release year; insert_overwrite replaces exactly those
+WHERE {{ changed_source_partitions('year', this, 1900, 2100) }}
+{% endif %}
\ No newline at end of file
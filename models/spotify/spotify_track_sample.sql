@@ -0,0 +1,25 @@
+{{
+  config(
+    materialized = 'table',
+    cluster_by = ['decade'],
+    description = 'Deterministic per-decade sample of tracks backing the feature scatter plot'
+  )
+}}
+
+-- Keeps the tracks with the lowest sample buckets of each decade. The lowest n buckets of any set
+-- of decades are among the lowest n of each decade, so a sample of up to sample_per_decade tracks
+-- read from this table equals the same sample taken from spotify_music_analysis.
+SELECT
+    song_id,
+    sample_bucket,
+    decade,
+    release_year,
+    danceability,
+    energy,
+    acousticness,
+    valence,
+    tempo,
+    mood
+FROM {{ ref('spotify_music_analysis') }}
+WHERE decade IS NOT NULL
+QUALIFY ROW_NUMBER() OVER (PARTITION BY decade ORDER BY sample_bucket, song_id) <= {{ var('sample_per_decade') }}
@@ -0,0 +1,159 @@
+import argparse
+import os
+from typing import Optional
+
+import pandas as pd
+
+from tracing import current_span, traced
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:
+    # Public from pandas 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+# Columns from the raw export that are not used downstream
+DROP_COLUMNS = ['id', 'album_id', 'artist_ids', 'track_number', 'disc_number', 'time_signature']
+
+# Audio features rounded to 2 decimal places
+AUDIO_FEATURES = ['danceability', 'energy', 'loudness', 'speechiness',
+                  'acousticness', 'instrumentalness', 'liveness', 'valence']
+
+# Rows missing any of these are dropped
+CRITICAL_COLUMNS = ['name', 'album', 'artists', 'danceability', 'energy']
+
+
+def clean_tracks(df: pd.DataFrame, date_format: Optional[str] = None) -> pd.DataFrame:
+    """
+    Cleans the raw Spotify `tracks_features` data.
+
+    Produces the same output as the cleaning steps in exploratory_analysis/spotify.ipynb,
+    but every transform is a vectorized `.str` or arithmetic operation instead of a
+    row-wise `.apply`.
+
+    :param df:          Raw tracks data as read from tracks_features.csv
+    :param date_format: Format of the release dates; None infers it from the first one, as the notebook does
+    :return:            Cleaned tracks data, ready to be written to cleaned_tracks_features.csv
+    """
+    # Step 1: Drop unnecessary columns
+    df_clean = df.drop(DROP_COLUMNS, axis=1)
+
+    # Step 2: Clean up artists column - remove brackets and quotes
+    df_clean['artists'] = (
+        df_clean['artists'].str.strip("[]'\"")
+        .str.replace("'", "", regex=False)
+        .str.replace('"', "", regex=False)
+    )
+
+    # Step 3: Extract primary artist (first entry of a comma-separated list)
+    artists = df_clean['artists']
+    has_comma = artists.str.contains(',', regex=False, na=False)
+    df_clean['primary_artist'] = artists.where(
+        ~has_comma, artists[has_comma].str.split(',', n=1).str[0].str.strip()
+    )
+
+    # Step 4: Round numerical audio features to 2 decimal places
+    df_clean[AUDIO_FEATURES] = df_clean[AUDIO_FEATURES].round(2)
+
+    # Step 5: Convert tempo to integer
+    df_clean['tempo'] = df_clean['tempo'].astype(int)
+
+    # Step 6: Replace duration in milliseconds with duration in seconds
+    df_clean['duration_s'] = (df_clean['duration_ms'] / 1000).astype(int)
+    df_clean = df_clean.drop('duration_ms', axis=1)
+
+    # Step 7: Parse the release date and extract its components
+    df_clean['release_date'] = pd.to_datetime(df_clean['release_date'], format=date_format, errors='coerce')
+    df_clean['release_year'] = df_clean['release_date'].dt.year
+    df_clean['release_month'] = df_clean['release_date'].dt.month
+    df_clean['release_day'] = df_clean['release_date'].dt.day
+
+    # Step 8: Convert year to string for consistency; missing years become 'nan' as in pandas 2,
+    # where astype(str) did not keep them missing
+    df_clean['year'] = df_clean['year'].astype(str).fillna('nan')
+
+    # Step 9: Create a decade column (e.g., '1990s') from years that are plain numbers
+    year = df_clean['year']
+    is_number = year.str.replace('.', '', n=1, regex=False).str.isdigit()
+    year_start = (pd.to_numeric(year.where(is_number)) // 10 * 10).astype('Int64')
+    df_clean['decade'] = (year_start.astype(str) + 's').where(is_number, None)
+
+    # Step 10: Handle missing values
+    df_clean = df_clean.dropna(subset=CRITICAL_COLUMNS)
+    df_clean = df_clean.fillna({
+        'mode': 0,
+        'key': -1,
+        'explicit': False
+    })
+
+    # Step 11: Create a unique song identifier
+    df_clean['song_id'] = (
+        df_clean['primary_artist'].astype(str) + '-' + df_clean['name'].astype(str)
+    ).str.lower().str.replace(' ', '_', regex=False)
+
+    return df_clean
+
+
+def release_date_format(release_dates: pd.Series) -> Optional[str]:
+    """
+    Returns the format pandas infers for a release date column, from its first date.
+
+    'mixed' (each date parsed on its own) when the first date has no single format, and None
+    when every date is missing.
+    """
+    first = release_dates.dropna()
+    if first.empty:
+        return None
+    return guess_datetime_format(str(first.iloc[0])) or "mixed"
+
+
+@traced
+def clean_tracks_csv(raw_csv_path: str, cleaned_csv_path: str, chunk_rows: Optional[int] = None) -> None:
+    """
+    Reads the raw tracks CSV, cleans it and writes the cleaned CSV.
+
+    Every step works row by row, so the file can be cleaned in chunks of `chunk_rows` rows to bound
+    memory by the chunk rather than by the file. The release dates of every chunk are parsed with
+    the format of the first date of the file, as when the whole file is cleaned at once. pandas
+    infers the other types of each chunk on its own: a key, mode or year column with missing values
+    in some chunks only is written as floats (e.g., '5.0') in those chunks, which csv-to-parquet.py
+    reads as the same pinned integers.
+
+    :param raw_csv_path:     Path of the raw export (e.g., 'tracks_features.csv')
+    :param cleaned_csv_path: Path of the cleaned output (e.g., 'cleaned_tracks_features.csv')
+    :param chunk_rows:       Number of rows cleaned at a time; None cleans the whole file at once
+    """
+    rows_read = rows_written = 0
+    date_format = None
+    if chunk_rows:
+        # A chunk of bare years would otherwise be read as integers
+        chunks = pd.read_csv(raw_csv_path, chunksize=chunk_rows, dtype={'release_date': str})
+    else:
+        chunks = [pd.read_csv(raw_csv_path)]
+    for index, df in enumerate(chunks):
+        if chunk_rows and date_format is None:
+            date_format = release_date_format(df['release_date'])
+        df_clean = clean_tracks(df, date_format)
+        df_clean.to_csv(cleaned_csv_path, index=False, mode="w" if index == 0 else "a", header=index == 0)
+        rows_read += len(df)
+        rows_written += len(df_clean)
+    current_span().set(
+        input=raw_csv_path,
+        output=cleaned_csv_path,
+        chunk_rows=chunk_rows,
+        rows_read=rows_read,
+        rows_written=rows_written,
+        bytes_read=os.path.getsize(raw_csv_path),
+        bytes_written=os.path.getsize(cleaned_csv_path)
+    )
+    print(f"Cleaned {rows_read} rows from {raw_csv_path} into {rows_written} rows in {cleaned_csv_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean the raw Spotify tracks_features export.")
+    parser.add_argument("raw_csv", nargs="?", default="tracks_features.csv")
+    parser.add_argument("cleaned_csv", nargs="?", default="cleaned_tracks_features.csv")
+    parser.add_argument("--chunk-rows", type=int, help="Clean this many rows at a time (e.g., 1000000)")
+    args = parser.parse_args()
+
+    clean_tracks_csv(args.raw_csv, args.cleaned_csv, chunk_rows=args.chunk_rows)
@@ -1,21 +1,826 @@
+import argparse
+import datetime
+import glob
+import inspect
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from urllib.parse import quote
+
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+import google.auth
+import requests
+from google.api_core import exceptions as api_exceptions
+from google.api_core.retry import Retry
+from google.auth import exceptions as auth_exceptions
+from google.auth.credentials import AnonymousCredentials
+from google.auth.transport.requests import AuthorizedSession
 from google.cloud import storage
+from google.cloud.storage.exceptions import InvalidResponse
+
+from clean_tracks import clean_tracks_csv
+from pipeline_manifest import DEFAULT_MANIFEST_PATH, PipelineManifest
+from tracing import Span, current_span, traced
+from tracks_schema import TRACKS_ARROW_SCHEMA
+from validate_tracks import DataQualityError, validate_tracks_parquet
+
+
+class ParquetLayout(NamedTuple):
+    """
+    Physical layout of the Parquet files written by the converters.
+
+    :param sort_by:              Columns the rows are sorted by, so every row group covers a narrow range
+                                 of them and readers skip row groups by their min/max statistics
+    :param row_group_size:       Maximum number of rows per row group
+    :param dictionary_columns:   Columns written with dictionary encoding; None encodes every column
+                                 until its dictionary outgrows a page (the pyarrow default)
+    :param bloom_filter_columns: Columns with a Bloom filter per row group, for equality lookups;
+                                 only written when the installed pyarrow supports it
+    :param write_page_index:     Write column and offset indexes, so readers can skip pages as well
+    """
+    sort_by: Tuple[str, ...] = ()
+    row_group_size: int = 128 * 1024
+    dictionary_columns: Optional[Tuple[str, ...]] = None
+    bloom_filter_columns: Tuple[str, ...] = ()
+    write_page_index: bool = False
+
+
+# pyarrow's writer defaults
+DEFAULT_LAYOUT = ParquetLayout()
+
+# Laid out for the dashboard and BigQuery external tables: sorted by the columns queries filter
+# and group by, dictionary-encoded where values repeat (categories and the audio features, which
+# clean_tracks rounds to 2 decimals), and Bloom filters on the track and artist lookup keys
+ANALYTICS_LAYOUT = ParquetLayout(
+    sort_by=("decade", "primary_artist"),
+    row_group_size=64 * 1024,
+    dictionary_columns=(
+        "decade", "primary_artist", "artists", "album", "explicit", "key", "mode", "year", "release_year",
+        "release_month", "release_day", "tempo", "danceability", "energy", "speechiness", "acousticness",
+        "instrumentalness", "liveness", "valence",
+    ),
+    bloom_filter_columns=("song_id", "primary_artist"),
+    write_page_index=True,
+)
+
+LAYOUTS = {"default": DEFAULT_LAYOUT, "analytics": ANALYTICS_LAYOUT}
+
+# The CSV reader parses a fixed number of blocks (about 32) ahead of the consumer, so its memory is
+# bounded by the block size: 16MB blocks buffer the first 500MB of the file, 1MB blocks about 40MB
+DEFAULT_BLOCK_SIZE_MB = 1
+
+# Column types are inferred from this much of the start of the file, independently of the block size
+SCHEMA_SAMPLE_BYTES = 16 * 1024 * 1024
+
+_WRITE_OPTIONS = inspect.signature(pq.write_table).parameters
+
+
+def _writer_options(layout: ParquetLayout, schema: pa.Schema) -> dict:
+    # ParquetWriter / write_table options of a layout, restricted to the columns present in `schema`
+    # and to what the installed pyarrow supports
+    options = {"write_statistics": True, "write_page_index": layout.write_page_index}
+    if layout.dictionary_columns is not None:
+        options["use_dictionary"] = [col for col in layout.dictionary_columns if col in schema.names]
+    bloom_columns = [col for col in layout.bloom_filter_columns if col in schema.names]
+    if bloom_columns and "bloom_filter_options" in _WRITE_OPTIONS:
+        # Sized for one row group; the default (1M distinct values) would dwarf small row groups
+        options["bloom_filter_options"] = {
+            col: {"ndv": layout.row_group_size, "fpp": 0.05} for col in bloom_columns
+        }
+    sort_columns = [col for col in layout.sort_by if col in schema.names]
+    if sort_columns and "sorting_columns" in _WRITE_OPTIONS:
+        # Records the sort order in the file metadata for readers that use it
+        options["sorting_columns"] = pq.SortingColumn.from_ordering(
+            schema, [(col, "ascending") for col in sort_columns], null_placement="at_end"
+        )
+    return options
+
+
+def _infer_column_types(
+        csv_file_path: str,
+        column_types: Optional[Dict[str, pa.DataType]] = None
+) -> Dict[str, pa.DataType]:
+    """
+    Infers the Arrow type of every column of a CSV file from its first SCHEMA_SAMPLE_BYTES.
+
+    Only the sample is read, as a single block, so the readers that stream the file can use small
+    blocks without inferring the types from a few thousand rows. Columns that are empty in the
+    sample are read as strings, since a null-typed column fails on the first value.
+    """
+    with open(csv_file_path, "rb") as f:
+        sample = f.read(SCHEMA_SAMPLE_BYTES)
+        if f.read(1):
+            # Drop the row cut off at the end of the sample
+            sample = sample[:sample.rfind(b"\n") + 1] or sample
+    reader = pv.open_csv(
+        pa.BufferReader(sample),
+        read_options=pv.ReadOptions(block_size=max(len(sample), 1), use_threads=False),
+        convert_options=pv.ConvertOptions(column_types=column_types or {})
+    )
+    try:
+        return {
+            field.name: pa.string() if pa.types.is_null(field.type) else field.type
+            for field in reader.schema
+        }
+    finally:
+        reader.close()
+
+
+def _read_types(pinned_schema: Optional[pa.Schema]) -> Dict[str, pa.DataType]:
+    """
+    Types the CSV reader reads the pinned columns with, before _cast_to_pinned casts them.
+
+    Integers are read as floats, since pandas writes an integer column with missing values as
+    floats (e.g., '5.0'), and dates as strings, so that a value that does not parse becomes null
+    instead of failing the read.
+    """
+    read_types = {}
+    for field in pinned_schema or []:
+        if pa.types.is_integer(field.type):
+            read_types[field.name] = pa.float64()
+        elif pa.types.is_date(field.type):
+            read_types[field.name] = pa.string()
+        else:
+            read_types[field.name] = field.type
+    return read_types
+
+
+def _parse_dates(column: pa.Array) -> pa.Array:
+    # 'YYYY-MM-DD' prefixes (a time of day is dropped); anything else, or a date outside BigQuery's
+    # DATE range (e.g., Spotify's '0-01-01' for an unknown date), becomes null
+    dates = pc.strptime(
+        pc.utf8_slice_codeunits(column, 0, 10), format="%Y-%m-%d", unit="s", error_is_null=True
+    ).cast(pa.date32())
+    in_range = pc.and_(
+        pc.greater_equal(dates, pa.scalar(datetime.date(1, 1, 1), pa.date32())),
+        pc.less_equal(dates, pa.scalar(datetime.date(9999, 12, 31), pa.date32()))
+    )
+    return pc.if_else(in_range, dates, pa.scalar(None, pa.date32()))
+
+
+def _cast_to_pinned(data, pinned_schema: Optional[pa.Schema]):
+    """Casts the columns of a record batch or table that `pinned_schema` pins to their pinned types."""
+    if pinned_schema is None:
+        return data
+    fields = []
+    columns = []
+    for field, column in zip(data.schema, data.columns):
+        if field.name in pinned_schema.names:
+            pinned_type = pinned_schema.field(field.name).type
+            is_text = pa.types.is_string(column.type) or pa.types.is_large_string(column.type)
+            if pa.types.is_date(pinned_type) and is_text:
+                column = _parse_dates(column)
+            else:
+                # Fails on a fractional value in an integer column rather than truncating it
+                column = column.cast(pinned_type)
+            field = field.with_type(pinned_type)
+        fields.append(field)
+        columns.append(column)
+    return type(data).from_arrays(columns, schema=pa.schema(fields))
+
+
+class _PinnedReader:
+    """Wraps a CSV streaming reader, casting every batch to the pinned types."""
+
+    def __init__(self, reader: pv.CSVStreamingReader, pinned_schema: Optional[pa.Schema]):
+        self._reader = reader
+        self._pinned_schema = pinned_schema
+        self.schema = _cast_to_pinned(reader.schema.empty_table(), pinned_schema).schema
+
+    def __iter__(self):
+        for batch in self._reader:
+            yield _cast_to_pinned(batch, self._pinned_schema)
+
+
+def _open_pinned_csv(
+        csv_file_path: str,
+        read_options: pv.ReadOptions,
+        column_types: Dict[str, pa.DataType],
+        pinned_schema: Optional[pa.Schema]
+) -> _PinnedReader:
+    # `column_types` are the resolved read types (see _infer_column_types and _read_types)
+    reader = pv.open_csv(
+        csv_file_path,
+        read_options=read_options,
+        convert_options=pv.ConvertOptions(column_types=column_types)
+    )
+    return _PinnedReader(reader, pinned_schema)
+
+
+def _write_batches(
+        reader: _PinnedReader,
+        parquet_file_path: str,
+        layout: ParquetLayout,
+        row_group_size: int,
+        compression: str
+) -> int:
+    """Writes the batches of `reader` in their original order; returns the number of rows written."""
+    # The schema is fixed by the reader after the first block; every batch is written with it.
+    schema = reader.schema
+    pending = []
+    pending_rows = 0
+    total_rows = 0
+
+    options = _writer_options(layout, schema)
+    with pq.ParquetWriter(parquet_file_path, schema, compression=compression, **options) as writer:
+        for batch in reader:
+            pending.append(batch)
+            pending_rows += batch.num_rows
+
+            # Buffer batches and only flush whole row groups; the remainder is carried over.
+            if pending_rows >= row_group_size:
+                table = pa.Table.from_batches(pending, schema=schema)
+                full_rows = pending_rows - pending_rows % row_group_size
+                writer.write_table(table.slice(0, full_rows), row_group_size=row_group_size)
+                total_rows += full_rows
+                pending = table.slice(full_rows).to_batches()
+                pending_rows -= full_rows
+
+        if pending:
+            table = pa.Table.from_batches(pending, schema=schema)
+            writer.write_table(table, row_group_size=row_group_size)
+            total_rows += table.num_rows
+
+    return total_rows
 
 
-def convert_csv_to_parquet(csv_file_path: str, parquet_file_path: str) -> None:
-    df = pd.read_csv(csv_file_path)
-    df.to_parquet(parquet_file_path, engine='pyarrow', index=False)
-    print(f"Converted {csv_file_path} to {parquet_file_path}")
+def _write_sorted(
+        reader: _PinnedReader,
+        parquet_file_path: str,
+        layout: ParquetLayout,
+        row_group_size: int,
+        compression: str
+) -> int:
+    """
+    Writes the batches of `reader` sorted by layout.sort_by without loading the whole file.
 
+    Rows are first spilled to one temporary Parquet file per value of the leading sort column
+    (e.g., one per decade). The spill files are then read back one at a time in sorted order,
+    sorted by the remaining columns and appended, so peak memory is bounded by the rows of the
+    largest value rather than by the file. A row group never spans two values of the leading
+    column, so a filter on it prunes exactly.
+
+    :return: Number of rows written
+    """
+    schema = reader.schema
+    lead = layout.sort_by[0]
+    spill_dir = tempfile.mkdtemp(prefix=".sort-", dir=os.path.dirname(os.path.abspath(parquet_file_path)))
+    try:
+        spills = {}
+        try:
+            for batch in reader:
+                table = pa.Table.from_batches([batch])
+                for value in pc.unique(table[lead]).to_pylist():
+                    if value not in spills:
+                        path = os.path.join(spill_dir, f"{len(spills):05d}.parquet")
+                        spills[value] = (path, pq.ParquetWriter(path, schema, compression="none"))
+                    mask = pc.is_null(table[lead]) if value is None else pc.equal(table[lead], value)
+                    spills[value][1].write_table(table.filter(mask))
+        finally:
+            for _, writer in spills.values():
+                writer.close()
+
+        total_rows = 0
+        options = _writer_options(layout, schema)
+        with pq.ParquetWriter(parquet_file_path, schema, compression=compression, **options) as writer:
+            # Nulls sort last, like pyarrow's sort_by
+            for value in sorted(spills, key=lambda v: (v is None, v)):
+                table = pq.read_table(spills[value][0], schema=schema)
+                if len(layout.sort_by) > 1:
+                    table = table.sort_by([(col, "ascending") for col in layout.sort_by[1:]])
+                writer.write_table(table, row_group_size=row_group_size)
+                total_rows += table.num_rows
+        return total_rows
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+@traced
+def convert_csv_to_parquet(
+        csv_file_path: str,
+        parquet_file_path: str,
+        streaming: bool = True,
+        block_size_mb: int = DEFAULT_BLOCK_SIZE_MB,
+        row_group_size: Optional[int] = None,
+        compression: str = "snappy",
+        column_types: Optional[Dict[str, pa.DataType]] = None,
+        layout: ParquetLayout = DEFAULT_LAYOUT,
+        pinned_schema: Optional[pa.Schema] = TRACKS_ARROW_SCHEMA
+) -> None:
+    """
+    Converts a CSV file to a single Parquet file.
+
+    In streaming mode the CSV is read in record batches of roughly `block_size_mb` and
+    written incrementally through a ParquetWriter as they arrive, so peak memory is bounded
+    by the block size (times the reader's readahead) and the row-group size rather than by
+    the size of the input file. A layout that sorts the rows (e.g., ANALYTICS_LAYOUT) holds
+    the rows of the largest value of its leading sort column in memory instead, which grows
+    with the input.
+
+    :param csv_file_path:     Path of the CSV file to read
+    :param parquet_file_path: Path of the Parquet file to write
+    :param streaming:         Read and write in batches; set to False to load the whole file with pandas
+    :param block_size_mb:     Size of each CSV read block (in MB); the column types are inferred from the
+                              first SCHEMA_SAMPLE_BYTES whatever the block size
+    :param row_group_size:    Maximum number of rows per Parquet row group (defaults to the layout's)
+    :param compression:       Parquet compression codec (e.g., 'snappy', 'zstd', 'gzip', 'none')
+    :param column_types:      Optional explicit Arrow types for columns whose inferred type is not stable
+    :param layout:            Sort order, encodings and indexes of the file (e.g., ANALYTICS_LAYOUT)
+    :param pinned_schema:     Types the columns it names are written with, whatever the CSV looks like
+                              (defaults to the BigQuery schema of the cleaned tracks); None infers them all
+    """
+    row_group_size = row_group_size or layout.row_group_size
+
+    if not streaming:
+        df = pd.read_csv(csv_file_path)
+        if layout.sort_by:
+            df = df.sort_values(list(layout.sort_by), na_position="last", kind="stable")
+        if pinned_schema is not None:
+            # Parsed like the streaming reader's strings; pandas reads an all-empty column as floats
+            dates = [field.name for field in pinned_schema if pa.types.is_date(field.type) and field.name in df]
+            df[dates] = df[dates].astype("string")
+        table = _cast_to_pinned(pa.Table.from_pandas(df, preserve_index=False), pinned_schema)
+        pq.write_table(
+            table,
+            parquet_file_path,
+            compression=compression,
+            row_group_size=row_group_size,
+            **_writer_options(layout, table.schema)
+        )
+        current_span().set(
+            input=csv_file_path,
+            output=parquet_file_path,
+            streaming=False,
+            rows_written=len(df),
+            bytes_read=os.path.getsize(csv_file_path),
+            bytes_written=os.path.getsize(parquet_file_path)
+        )
+        print(f"Converted {csv_file_path} to {parquet_file_path}")
+        return
+
+    reader = _open_pinned_csv(
+        csv_file_path,
+        pv.ReadOptions(block_size=block_size_mb * 1024 * 1024),
+        _infer_column_types(csv_file_path, {**_read_types(pinned_schema), **(column_types or {})}),
+        pinned_schema
+    )
+
+    if layout.sort_by:
+        total_rows = _write_sorted(reader, parquet_file_path, layout, row_group_size, compression)
+    else:
+        total_rows = _write_batches(reader, parquet_file_path, layout, row_group_size, compression)
+
+    current_span().set(
+        input=csv_file_path,
+        output=parquet_file_path,
+        streaming=True,
+        sort_by=list(layout.sort_by),
+        rows_written=total_rows,
+        row_groups=pq.ParquetFile(parquet_file_path).num_row_groups,
+        bytes_read=os.path.getsize(csv_file_path),
+        bytes_written=os.path.getsize(parquet_file_path)
+    )
+    print(f"Converted {csv_file_path} to {parquet_file_path} ({total_rows} rows)")
+
+
+def _partition_path(output_dir: str, partition_cols: Sequence[str], key: dict) -> str:
+    # Hive-style directory names, e.g. decade=1990s/; nulls use Hive's default partition name.
+    parts = [
+        f"{col}={'__HIVE_DEFAULT_PARTITION__' if key[col] is None else quote(str(key[col]), safe='')}"
+        for col in partition_cols
+    ]
+    return os.path.join(output_dir, *parts)
+
+
+def _convert_shard_to_partitions(
+        shard_index: int,
+        csv_file_path: str,
+        output_dir: str,
+        partition_cols: Sequence[str],
+        column_types: Dict[str, pa.DataType],
+        block_size_mb: int,
+        row_group_size: int,
+        compression: str,
+        layout: ParquetLayout,
+        pinned_schema: Optional[pa.Schema]
+) -> Dict[str, int]:
+    """
+    Streams one CSV shard into one Parquet file per partition value.
+
+    Runs in a worker process. Files are named after the shard index, so repeated runs over
+    the same shards always produce the same layout.
+    """
+    reader = _open_pinned_csv(
+        csv_file_path,
+        # Each worker is single-threaded; parallelism comes from the process pool.
+        pv.ReadOptions(block_size=block_size_mb * 1024 * 1024, use_threads=False),
+        column_types,
+        pinned_schema
+    )
+    file_schema = reader.schema
+    for col in partition_cols:
+        file_schema = file_schema.remove(file_schema.get_field_index(col))
+    options = _writer_options(layout, file_schema)
+
+    writers = {}
+    pending = {}
+    rows_written = {}
+
+    def flush(path: str, final: bool = False) -> None:
+        tables = pending.pop(path, [])
+        if not tables:
+            return
+        table = pa.concat_tables(tables)
+        full_rows = table.num_rows if final else table.num_rows - table.num_rows % row_group_size
+        if full_rows:
+            writers[path].write_table(table.slice(0, full_rows), row_group_size=row_group_size)
+            rows_written[path] += full_rows
+        if full_rows < table.num_rows:
+            pending[path] = [table.slice(full_rows)]
+
+    for batch in reader:
+        table = pa.Table.from_batches([batch])
+        keys = table.select(partition_cols).group_by(list(partition_cols)).aggregate([]).to_pylist()
+
+        for key in keys:
+            mask = None
+            for col in partition_cols:
+                value = key[col]
+                condition = pc.is_null(table[col]) if value is None else pc.equal(table[col], value)
+                mask = condition if mask is None else pc.and_(mask, condition)
+
+            path = os.path.join(
+                _partition_path(output_dir, partition_cols, key),
+                f"part-{shard_index:05d}.parquet"
+            )
+            if path not in writers:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                writers[path] = pq.ParquetWriter(path, file_schema, compression=compression, **options)
+                rows_written[path] = 0
+
+            pending.setdefault(path, []).append(table.filter(mask).drop_columns(list(partition_cols)))
+            if sum(t.num_rows for t in pending[path]) >= row_group_size:
+                flush(path)
+
+    for path, writer in writers.items():
+        flush(path, final=True)
+        writer.close()
+
+    return rows_written
+
+
+@traced
+def convert_csv_shards_to_parquet(
+        csv_file_paths: List[str],
+        output_dir: str,
+        partition_cols: Sequence[str] = ("decade",),
+        max_workers: Optional[int] = None,
+        block_size_mb: int = DEFAULT_BLOCK_SIZE_MB,
+        row_group_size: int = 128 * 1024,
+        compression: str = "snappy",
+        column_types: Optional[Dict[str, pa.DataType]] = None,
+        overwrite: bool = False,
+        layout: ParquetLayout = DEFAULT_LAYOUT,
+        pinned_schema: Optional[pa.Schema] = TRACKS_ARROW_SCHEMA
+) -> None:
+    """
+    Converts many CSV shards to a Hive-style partitioned Parquet dataset using a process pool.
+
+    Every shard is streamed by its own worker process and written as one file per partition,
+    e.g. `output_dir/decade=1990s/part-00003.parquet`. The schema is resolved once from the
+    first shard and enforced on all shards, so every file in the dataset has the same schema.
+    Shards are processed in sorted order and files are named after the shard index, which
+    keeps the output deterministic regardless of worker scheduling.
+
+    Splitting a single CSV by byte ranges is not supported, since quoted fields (track and
+    album names) may contain newlines; large single files should use convert_csv_to_parquet.
+
+    :param csv_file_paths: Paths of the (cleaned) CSV shards to convert
+    :param output_dir:     Root directory of the partitioned Parquet dataset
+    :param partition_cols: Columns to partition by (e.g., ('decade',) or ('year',))
+    :param max_workers:    Number of worker processes (defaults to the number of CPUs)
+    :param block_size_mb:  Size of each CSV read block (in MB)
+    :param row_group_size: Maximum number of rows per Parquet row group
+    :param compression:    Parquet compression codec (e.g., 'snappy', 'zstd', 'gzip', 'none')
+    :param column_types:   Optional explicit Arrow types; other columns are inferred from the first shard
+    :param overwrite:      Remove an existing non-empty output_dir instead of raising
+    :param layout:         Encodings and indexes of the files; its sort order is not applied, since rows
+                           are written in shard order as they stream (the files are already split by partition)
+    :param pinned_schema:  Types the columns it names are written with (defaults to the BigQuery schema of
+                           the cleaned tracks); None infers them all from the first shard
+    """
+    csv_file_paths = sorted(csv_file_paths)
+    if not csv_file_paths:
+        raise ValueError("No CSV shards to convert")
+
+    if os.path.isdir(output_dir) and os.listdir(output_dir):
+        if not overwrite:
+            raise FileExistsError(f"{output_dir} is not empty; pass overwrite=True to replace it")
+        shutil.rmtree(output_dir)
+
+    # Resolve one schema up front so that no shard can infer a different one.
+    resolved_types = _infer_column_types(csv_file_paths[0], {**_read_types(pinned_schema), **(column_types or {})})
+
+    missing = [col for col in partition_cols if col not in resolved_types]
+    if missing:
+        raise ValueError(f"Partition columns not found in CSV: {missing}")
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                _convert_shard_to_partitions,
+                shard_index,
+                csv_file_path,
+                output_dir,
+                tuple(partition_cols),
+                resolved_types,
+                block_size_mb,
+                row_group_size,
+                compression,
+                layout._replace(sort_by=()),
+                pinned_schema
+            )
+            for shard_index, csv_file_path in enumerate(csv_file_paths)
+        ]
+        results = [future.result() for future in futures]
+
+    total_rows = sum(sum(result.values()) for result in results)
+    total_files = sum(len(result) for result in results)
+    # The workers' peak RSS is reported as the span's peak_child_rss_bytes
+    current_span().set(
+        output=output_dir,
+        shards=len(csv_file_paths),
+        rows_written=total_rows,
+        files_written=total_files,
+        bytes_read=sum(os.path.getsize(path) for path in csv_file_paths),
+        bytes_written=sum(
+            os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(output_dir) for name in files
+        )
+    )
+    print(f"Converted {len(csv_file_paths)} CSV shards to {output_dir} "
+          f"({total_rows} rows in {total_files} files)")
 
+
+# GCS compose accepts at most 32 source objects per request.
+MAX_COMPOSE_PARTS = 32
+
+
+def _storage_client(project_id: str, max_workers: int = 1) -> storage.Client:
+    """
+    Creates a storage client whose HTTP connection pool can serve `max_workers` threads.
+
+    The client is given its own authorized session, with a connection pool of `max_workers`
+    connections instead of requests' default of 10. storage.Client takes no pool size, so the
+    session is passed through its `_http` argument, which google-cloud-core documents as the
+    transport of every client but marks as private; it is supported by google-cloud-storage
+    1.x to 3.x (tested with 3.17). Honors STORAGE_EMULATOR_HOST, so the same code runs against
+    a local fake-GCS emulator with anonymous credentials.
+    """
+    if max_workers <= 1:
+        return storage.Client(project=project_id)
+
+    if os.environ.get("STORAGE_EMULATOR_HOST"):
+        credentials = AnonymousCredentials()
+    else:
+        credentials, _ = google.auth.default(scopes=storage.Client.SCOPE)
+    session = AuthorizedSession(credentials)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return storage.Client(project=project_id, credentials=credentials, _http=session)
+
+
+# HTTP status codes of transient storage errors: request timeout, throttling and server errors
+_TRANSIENT_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+
+def _is_transient_error(error: Exception) -> bool:
+    """Returns whether a storage request failed transiently (the errors the library's DEFAULT_RETRY retries)."""
+    if isinstance(error, (ConnectionError, requests.exceptions.ConnectionError,
+                          requests.exceptions.ChunkedEncodingError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(error, api_exceptions.GoogleAPICallError):
+        return error.code in _TRANSIENT_STATUS_CODES
+    if isinstance(error, InvalidResponse):
+        return error.response.status_code in _TRANSIENT_STATUS_CODES
+    if isinstance(error, auth_exceptions.TransportError) and error.args:
+        return isinstance(error.args[0], Exception) and _is_transient_error(error.args[0])
+    return False
+
+
+def _traced_retry(stage: Span) -> Retry:
+    """
+    Returns the retry policy of the upload requests, counting every retried request on the stage's span.
+
+    It retries unconditionally, so it is only given to requests that carry a generation
+    precondition (if_generation_match): a retried request then never overwrites a newer object.
+    """
+    return Retry(predicate=_is_transient_error, on_error=lambda error: stage.increment("retries"))
+
+
+def _current_generation(bucket: storage.Bucket, blob_name: str) -> int:
+    # Generation precondition of an upload that replaces `blob_name`: 0 if it does not exist yet
+    blob = bucket.get_blob(blob_name)
+    return blob.generation if blob is not None else 0
+
+
+class _ChunkTimer:
+    """
+    Wraps the file of a resumable upload and records the throughput of every chunk on a span.
+
+    The upload reads one chunk and sends it before reading the next, so the time from one read
+    to the next is the time it took to send the chunk. A failed chunk is read again after the
+    upload seeks back, so its event also includes the time spent on the retry.
+    """
+
+    def __init__(self, file_obj, stage: Span):
+        self._file = file_obj
+        self._stage = stage
+        self._chunk = None
+
+    def read(self, size: int = -1) -> bytes:
+        self.finish_chunk()
+        offset = self._file.tell()
+        data = self._file.read(size)
+        if data:
+            self._chunk = (offset, len(data), time.perf_counter())
+        return data
+
+    def finish_chunk(self) -> None:
+        if self._chunk is None:
+            return
+        offset, size, start = self._chunk
+        seconds = time.perf_counter() - start
+        self._stage.add_event("chunk", offset=offset, bytes=size, seconds=seconds,
+                              mb_per_second=size / (1024 * 1024) / seconds)
+        self._chunk = None
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+def _write_checkpoint(checkpoint_path: str, checkpoint: dict) -> None:
+    # Write to a temporary file first so an interrupted write never corrupts the checkpoint.
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def _parallel_composite_upload(
+        client: storage.Client,
+        bucket_name: str,
+        source_file_path: str,
+        destination_blob_name: str,
+        part_size_mb: int,
+        max_workers: int,
+        timeout: int,
+        checkpoint_path: Optional[str]
+) -> storage.Blob:
+    """
+    Uploads a file as parts in parallel and composes them into the destination object.
+
+    Uploaded parts are recorded in a local JSON checkpoint; when the upload is restarted for
+    the same file and destination, parts that are still present in the bucket are skipped.
+    Every part is sent with a generation precondition (0 for a new part, the current
+    generation for a part that is sent again), so its upload is idempotent and transient
+    errors are retried.
+    """
+    bucket = client.bucket(bucket_name)
+    file_stat = os.stat(source_file_path)
+    file_size = file_stat.st_size
+    # Part uploads run on worker threads, which do not see the caller's current span
+    stage = current_span()
+    retry = _traced_retry(stage)
+
+    # Grow the parts if needed so that a single compose request can assemble the object.
+    part_size = max(part_size_mb * 1024 * 1024, math.ceil(file_size / MAX_COMPOSE_PARTS))
+    num_parts = max(1, math.ceil(file_size / part_size))
+    parts_prefix = f"{destination_blob_name}.parts/"
+
+    checkpoint_path = checkpoint_path or f"{source_file_path}.upload-checkpoint.json"
+    checkpoint = {
+        "destination": f"gs://{bucket_name}/{destination_blob_name}",
+        "size": file_size,
+        "mtime_ns": file_stat.st_mtime_ns,
+        "part_size": part_size,
+        "parts": {}
+    }
+    # Parts left in the bucket, by an earlier run of this upload or of another file
+    existing = {b.name: b.generation for b in client.list_blobs(bucket, prefix=parts_prefix)}
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as f:
+            previous = json.load(f)
+        if all(previous.get(k) == checkpoint[k] for k in ("destination", "size", "mtime_ns", "part_size")):
+            # Only trust parts whose generation still matches what is in the bucket.
+            checkpoint["parts"] = {
+                index: part for index, part in previous["parts"].items()
+                if existing.get(part["name"]) == part["generation"]
+            }
+    lock = threading.Lock()
+
+    def upload_part(index: int) -> None:
+        start = time.perf_counter()
+        offset = index * part_size
+        with open(source_file_path, "rb") as f:
+            f.seek(offset)
+            data = f.read(min(part_size, file_size - offset))
+
+        part_blob = bucket.blob(f"{parts_prefix}{index:05d}")
+        part_blob.upload_from_string(data, content_type="application/octet-stream", timeout=timeout,
+                                     if_generation_match=existing.get(part_blob.name, 0), retry=retry)
+        seconds = time.perf_counter() - start
+        stage.add_event("part", index=index, bytes=len(data), seconds=seconds,
+                        mb_per_second=len(data) / (1024 * 1024) / seconds)
+
+        with lock:
+            checkpoint["parts"][str(index)] = {"name": part_blob.name, "generation": part_blob.generation}
+            _write_checkpoint(checkpoint_path, checkpoint)
+
+    remaining = [index for index in range(num_parts) if str(index) not in checkpoint["parts"]]
+    stage.set(parts=num_parts, parts_resumed=num_parts - len(remaining))
+    if len(remaining) < num_parts:
+        print(f"Resuming upload of {source_file_path}: {num_parts - len(remaining)}/{num_parts} parts already uploaded")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for future in [executor.submit(upload_part, index) for index in remaining]:
+            future.result()
+
+    part_blobs = [bucket.blob(checkpoint["parts"][str(index)]["name"]) for index in range(num_parts)]
+    destination = bucket.blob(destination_blob_name)
+    destination.content_type = "application/octet-stream"
+    destination.compose(part_blobs, timeout=timeout)
+
+    bucket.delete_blobs(part_blobs, timeout=timeout)
+    os.remove(checkpoint_path)
+    return destination
+
+
+@traced
 def upload_to_gcs(
         bucket_name: str,
         source_file_path: str,
         destination_blob_name: str,
         project_id: str,
         chunk_size_mb: int = 5,
-        timeout: int = 300
-) -> None:
+        timeout: int = 300,
+        parallel: bool = False,
+        part_size_mb: int = 32,
+        max_workers: int = 8,
+        checkpoint_path: Optional[str] = None
+) -> storage.Blob:
+    """
+    Uploads a local file to GCS.
+
+    By default the file is sent as a single resumable stream in `chunk_size_mb` chunks. In
+    parallel mode the file is split into parts of at least `part_size_mb` that are uploaded
+    concurrently and composed on the server; progress is checkpointed locally so that an
+    interrupted upload resumes with the missing parts only.
+
+    :param bucket_name:           Name of the target GCS bucket
+    :param source_file_path:      Path of the local file to upload
+    :param destination_blob_name: Object name in the bucket
+    :param project_id:            GCP project ID
+    :param chunk_size_mb:         Chunk size (in MB) of the single-stream upload; must be a multiple of 256 KB
+    :param timeout:               Timeout (in seconds) of each upload request
+    :param parallel:              Use a parallel composite upload
+    :param part_size_mb:          Minimum part size (in MB) of the parallel upload
+    :param max_workers:           Number of concurrent part uploads
+    :param checkpoint_path:       Checkpoint file (defaults to '<source_file_path>.upload-checkpoint.json')
+    :return:                      The uploaded blob, with its generation and hashes
+    """
+    stage = current_span()
+    file_size = os.path.getsize(source_file_path)
+    stage.set(
+        input=source_file_path,
+        output=f"gs://{bucket_name}/{destination_blob_name}",
+        parallel=parallel,
+        bytes_uploaded=file_size,
+        retries=0
+    )
+    start = time.perf_counter()
+
+    if parallel:
+        client = _storage_client(project_id, max_workers)
+        blob = _parallel_composite_upload(
+            client, bucket_name, source_file_path, destination_blob_name,
+            part_size_mb, max_workers, timeout, checkpoint_path
+        )
+        stage.set(mb_per_second=file_size / (1024 * 1024) / (time.perf_counter() - start))
+        print(f"Uploaded {source_file_path} to gs://{bucket_name}/{destination_blob_name} (parallel composite)")
+        return blob
+
     client = storage.Client(project=project_id)
     bucket = client.bucket(bucket_name)
     blob = bucket.blob(destination_blob_name)
@@ -23,28 +828,247 @@ def upload_to_gcs(
     # Set a custom chunk size (in bytes); must be a multiple of 256 KB.
     blob.chunk_size = chunk_size_mb * 1024 * 1024
 
-    # Upload the file using the specified timeout (in seconds).
-    blob.upload_from_filename(source_file_path, timeout=timeout)
+    # Upload the file using the specified timeout (in seconds), timing every chunk.
+    with open(source_file_path, "rb") as f:
+        chunks = _ChunkTimer(f, stage)
+        blob.upload_from_file(chunks, size=file_size, timeout=timeout,
+                              if_generation_match=_current_generation(bucket, destination_blob_name),
+                              retry=_traced_retry(stage))
+        chunks.finish_chunk()
 
+    stage.set(mb_per_second=file_size / (1024 * 1024) / (time.perf_counter() - start))
     print(f"Uploaded {source_file_path} to gs://{bucket_name}/{destination_blob_name}")
+    return blob
+
+
+@traced
+def upload_directory_to_gcs(
+        bucket_name: str,
+        source_dir: str,
+        destination_prefix: str,
+        project_id: str,
+        max_workers: int = 8,
+        timeout: int = 300,
+        relative_paths: Optional[List[str]] = None
+) -> Dict[str, int]:
+    """
+    Uploads every file under `source_dir` (e.g., a partitioned Parquet dataset) concurrently.
+
+    Relative paths are kept, so `decade=1990s/part-00000.parquet` is uploaded to
+    `<destination_prefix>/decade=1990s/part-00000.parquet`. All uploads share one client
+    with a connection pool sized to `max_workers`.
+
+    :param relative_paths: Only upload these files (relative to source_dir); defaults to all files
+    :return:               Generation of each uploaded object, keyed by relative path
+    """
+    client = _storage_client(project_id, max_workers)
+    bucket = client.bucket(bucket_name)
+
+    if relative_paths is None:
+        relative_paths = [
+            os.path.relpath(os.path.join(root, name), source_dir)
+            for root, _, files in os.walk(source_dir)
+            for name in files
+        ]
+    relative_paths = sorted(relative_paths)
+
+    # Uploads run on worker threads, which do not see the caller's current span
+    stage = current_span()
+    stage.set(input=source_dir, output=f"gs://{bucket_name}/{destination_prefix}", files=len(relative_paths), retries=0)
+    retry = _traced_retry(stage)
+    start = time.perf_counter()
+    # Generation preconditions of the uploads, from one listing of the prefix
+    current = {b.name: b.generation for b in client.list_blobs(bucket, prefix=f"{destination_prefix.rstrip('/')}/")}
+
+    def upload_file(relative_path: str) -> int:
+        file_start = time.perf_counter()
+        path = os.path.join(source_dir, relative_path)
+        blob = bucket.blob(_blob_name(destination_prefix, relative_path))
+        blob.upload_from_filename(path, timeout=timeout, if_generation_match=current.get(blob.name, 0), retry=retry)
+        stage.add_event("file", path=relative_path, bytes=os.path.getsize(path), seconds=time.perf_counter() - file_start)
+        return blob.generation
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        generations = dict(zip(relative_paths, executor.map(upload_file, relative_paths)))
+
+    total_bytes = sum(os.path.getsize(os.path.join(source_dir, path)) for path in relative_paths)
+    stage.set(bytes_uploaded=total_bytes, mb_per_second=total_bytes / (1024 * 1024) / (time.perf_counter() - start))
+
+    print(f"Uploaded {len(generations)} files from {source_dir} to gs://{bucket_name}/{destination_prefix}")
+    return generations
+
+
+def _blob_name(destination_prefix: str, relative_path: str) -> str:
+    return "/".join([destination_prefix.rstrip("/"), *relative_path.split(os.sep)])
+
+
+def _gcs_generations(project_id: str, bucket_name: str, prefix: str) -> Dict[str, int]:
+    # One listing request returns the current generation of every object under the prefix.
+    client = storage.Client(project=project_id)
+    return {blob.name: blob.generation for blob in client.list_blobs(bucket_name, prefix=prefix)}
+
+
+def _validate_output(manifest: PipelineManifest, path: str, max_duplicate_song_ids: Optional[int], force: bool) -> None:
+    # Stops the pipeline before the upload (and so the BigQuery load) when the Parquet output fails validation
+    files = manifest.fingerprint_tree(path) if os.path.isdir(path) else {path: manifest.fingerprint(path)}
+    validate_inputs = {"files": files, "max_duplicate_song_ids": max_duplicate_song_ids}
+    if not force and manifest.is_unchanged("validate", path, validate_inputs):
+        print(f"Skipping validation: {path} is unchanged")
+        return
+    try:
+        report = validate_tracks_parquet(path, max_duplicate_song_ids)
+    except DataQualityError as error:
+        sys.exit(f"{error}\nNothing was uploaded.")
+    manifest.record("validate", path, validate_inputs, {
+        "rows": report["rows"],
+        "duplicate_song_ids": report["duplicate_song_ids"]
+    })
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert Spotify tracks CSV data to Parquet and upload it to GCS.")
+    parser.add_argument("--shards", help="Glob of cleaned CSV shards to convert in parallel (e.g., 'drop/*.csv')")
+    parser.add_argument("--output-dir", default="cleaned_tracks_features", help="Partitioned output directory")
+    parser.add_argument("--partition-by", nargs="+", default=["decade"], help="Hive partition columns")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (defaults to CPU count)")
+    parser.add_argument("--parallel-upload", action="store_true", help="Upload with a resumable parallel composite upload")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="default",
+                        help="Parquet layout: 'default' streams in CSV order with pyarrow's defaults, 'analytics' "
+                             "sorts and indexes for row-group pruning (holds the largest decade in memory)")
+    parser.add_argument("--max-duplicate-song-ids", type=int, default=None,
+                        help="Stop before the upload when more duplicate song_ids are found (by default they are only reported)")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH, help="Manifest used to skip unchanged stages")
+    parser.add_argument("--force", action="store_true", help="Rerun every stage even if its inputs are unchanged")
+    args = parser.parse_args()
+
+    raw_csv_file = "tracks_features.csv"
     csv_file = "cleaned_tracks_features.csv"
     parquet_file = "cleaned_tracks_features.parquet"
 
     bucket_name = "spotify-data-engineering-spotify"
     project_id = "data-engineering-spotify"
 
-    # 1) Convert CSV to Parquet
-    convert_csv_to_parquet(csv_file, parquet_file)
+    manifest = PipelineManifest(args.manifest)
 
-    # 2) Upload Parquet to GCS with custom chunk size and increased timeout
-    upload_to_gcs(
-        bucket_name=bucket_name,
-        source_file_path=parquet_file,
-        destination_blob_name="cleaned_tracks_features.parquet",
-        project_id=project_id,
-        chunk_size_mb=5,  # smaller chunks can help avoid timeouts on slower networks
-        timeout=300  # 5-minute total upload timeout
-    )
+    if args.shards:
+        # Convert a drop of cleaned CSV shards into a partitioned dataset, one process per shard
+        shards = sorted(glob.glob(args.shards))
+        convert_inputs = {
+            "shards": {shard: manifest.fingerprint(shard) for shard in shards},
+            "partition_by": args.partition_by,
+            "layout": args.layout
+        }
+        if args.force or not manifest.is_unchanged("convert", args.output_dir, convert_inputs):
+            convert_csv_shards_to_parquet(
+                shards,
+                args.output_dir,
+                partition_cols=args.partition_by,
+                max_workers=args.workers,
+                overwrite=True,
+                layout=LAYOUTS[args.layout]
+            )
+            files = {
+                os.path.join(args.output_dir, path): sha256
+                for path, sha256 in manifest.fingerprint_tree(args.output_dir).items()
+            }
+            manifest.record("convert", args.output_dir, convert_inputs, {"files": files})
+        else:
+            print(f"Skipping conversion: shards of {args.output_dir} are unchanged")
+
+        # Check the dataset before any of it is uploaded
+        _validate_output(manifest, args.output_dir, args.max_duplicate_song_ids, args.force)
+
+        # Upload only the partition files whose content changed, concurrently
+        destination_prefix = os.path.basename(os.path.normpath(args.output_dir))
+        upload_key = f"gs://{bucket_name}/{destination_prefix}/"
+        local_files = manifest.fingerprint_tree(args.output_dir)
+        previous = manifest.get("upload", upload_key)
+        previous_files = previous["inputs"]["files"] if previous else {}
+        previous_generations = previous["outputs"]["generations"] if previous else {}
+        remote = {
+            os.path.relpath(name, destination_prefix): generation
+            for name, generation in _gcs_generations(project_id, bucket_name, f"{destination_prefix}/").items()
+        }
+
+        changed = [
+            path for path, sha256 in local_files.items()
+            if args.force
+            or previous_files.get(path) != sha256
+            or remote.get(path) is None
+            or remote.get(path) != previous_generations.get(path)
+        ]
+        generations = {path: remote[path] for path in local_files if path not in changed}
+        if changed:
+            generations.update(upload_directory_to_gcs(
+                bucket_name=bucket_name,
+                source_dir=args.output_dir,
+                destination_prefix=destination_prefix,
+                project_id=project_id,
+                relative_paths=changed
+            ))
+        else:
+            print(f"Skipping upload: all {len(local_files)} files in {upload_key} are unchanged")
+
+        # Remove objects of partitions that no longer exist locally
+        stale = [path for path in remote if path not in local_files]
+        if stale:
+            bucket = storage.Client(project=project_id).bucket(bucket_name)
+            bucket.delete_blobs([bucket.blob(_blob_name(destination_prefix, path)) for path in stale])
+            print(f"Deleted {len(stale)} stale objects from {upload_key}")
+
+        manifest.record("upload", upload_key, {"files": local_files}, {"generations": generations})
+    else:
+        # 1) Clean the raw export
+        clean_inputs = {"raw_csv": manifest.fingerprint(raw_csv_file)}
+        if args.force or not manifest.is_unchanged("clean", csv_file, clean_inputs):
+            clean_tracks_csv(raw_csv_file, csv_file)
+            manifest.record("clean", csv_file, clean_inputs, {"files": {csv_file: manifest.fingerprint(csv_file)}})
+        else:
+            print(f"Skipping cleaning: {raw_csv_file} is unchanged")
+
+        # 2) Convert CSV to Parquet, streaming in batches to keep memory flat
+        convert_inputs = {"csv": manifest.fingerprint(csv_file), "layout": args.layout}
+        if args.force or not manifest.is_unchanged("convert", parquet_file, convert_inputs):
+            convert_csv_to_parquet(
+                csv_file,
+                parquet_file,
+                block_size_mb=DEFAULT_BLOCK_SIZE_MB,  # size of each CSV read batch; bounds the reader's memory
+                compression="snappy",
+                layout=LAYOUTS[args.layout]  # sort order, row-group size, encodings and indexes
+            )
+            manifest.record("convert", parquet_file, convert_inputs,
+                            {"files": {parquet_file: manifest.fingerprint(parquet_file)}})
+        else:
+            print(f"Skipping conversion: {csv_file} is unchanged")
+
+        # 3) Validate the Parquet output in one pass, so a bad batch never reaches GCS or BigQuery
+        _validate_output(manifest, parquet_file, args.max_duplicate_song_ids, args.force)
+
+        # 4) Upload Parquet to GCS with custom chunk size and increased timeout
+        destination_blob_name = "cleaned_tracks_features.parquet"
+        upload_key = f"gs://{bucket_name}/{destination_blob_name}"
+        upload_inputs = {"parquet": manifest.fingerprint(parquet_file)}
+        previous = manifest.get("upload", upload_key)
+        unchanged = (
+            not args.force
+            and manifest.is_unchanged("upload", upload_key, upload_inputs)
+            and _gcs_generations(project_id, bucket_name, destination_blob_name).get(destination_blob_name)
+            == previous["outputs"]["generation"]
+        )
+        if not unchanged:
+            blob = upload_to_gcs(
+                bucket_name=bucket_name,
+                source_file_path=parquet_file,
+                destination_blob_name=destination_blob_name,
+                project_id=project_id,
+                chunk_size_mb=5,  # smaller chunks can help avoid timeouts on slower networks
+                timeout=300,  # 5-minute total upload timeout
+                parallel=args.parallel_upload
+            )
+            manifest.record("upload", upload_key, upload_inputs, {
+                "generation": blob.generation,
+                "md5_hash": blob.md5_hash,  # not set for composite objects
+                "crc32c": blob.crc32c
+            })
+        else:
+            print(f"Skipping upload: {upload_key} is up to date")
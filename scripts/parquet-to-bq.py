@@ -1,47 +1,207 @@
+import argparse
+import os
+from typing import List, Optional, Union
+
+from google.api_core.client_options import ClientOptions
+from google.api_core.exceptions import NotFound
+from google.auth.credentials import AnonymousCredentials
 from google.cloud import bigquery
 
+from pipeline_manifest import DEFAULT_MANIFEST_PATH, PipelineManifest
+from tracing import current_span, traced
+from tracks_schema import TRACKS_COLUMN_TYPES
+
+# Pinned schema of the cleaned tracks Parquet output (see tracks_schema.py and convert_csv_to_parquet)
+TRACKS_SCHEMA = [bigquery.SchemaField(name, bq_type) for name, bq_type in TRACKS_COLUMN_TYPES.items()]
+
+# The raw table is partitioned by release year, one partition per year (e.g., decorator 'table$1999')
+TRACKS_RANGE_PARTITIONING = bigquery.RangePartitioning(
+    field="year",
+    range_=bigquery.PartitionRange(start=1900, end=2100, interval=1)
+)
+
+LOAD_MODES = ("truncate", "append", "replace_partition")
+
+# Suffix of the table a full load is staged in while an existing table is migrated to TRACKS_RANGE_PARTITIONING
+MIGRATION_SUFFIX = "__partitioned"
+
+
+def _bigquery_client(project_id: str) -> bigquery.Client:
+    """
+    Creates a BigQuery client.
+
+    When BIGQUERY_EMULATOR_HOST is set (e.g., 'http://localhost:9050'), the client talks to
+    that local BigQuery stand-in with anonymous credentials instead of the real service.
+    """
+    emulator_host = os.environ.get("BIGQUERY_EMULATOR_HOST")
+    if emulator_host:
+        return bigquery.Client(
+            project=project_id,
+            client_options=ClientOptions(api_endpoint=emulator_host),
+            credentials=AnonymousCredentials()
+        )
+    return bigquery.Client(project=project_id)
+
+
+def _needs_partitioning_migration(client: bigquery.Client, full_table_id: str) -> bool:
+    """
+    Whether the table exists with another partitioning than TRACKS_RANGE_PARTITIONING.
+
+    A load job cannot change the partitioning of an existing table, so a table created before it was
+    partitioned by year (or with other ranges) has to be rebuilt once, by migrate_to_partitioned_table.
+    """
+    try:
+        table = client.get_table(full_table_id)
+    except NotFound:
+        return False
+    return table.range_partitioning != TRACKS_RANGE_PARTITIONING
+
+
+def migrate_to_partitioned_table(client: bigquery.Client, staging_table_id: str, full_table_id: str) -> None:
+    """
+    Swaps a fully loaded, partitioned staging table in for the table it replaces.
+
+    The old table is only dropped once the staging table is complete, so a failed load leaves it
+    untouched. The copy keeps the staging table's partitioning and is a metadata operation.
+    """
+    client.delete_table(full_table_id)
+    client.copy_table(
+        staging_table_id,
+        full_table_id,
+        job_config=bigquery.CopyJobConfig(write_disposition=bigquery.WriteDisposition.WRITE_EMPTY)
+    ).result()
+    client.delete_table(staging_table_id)
+    print(f"Migrated {full_table_id} to a table partitioned by {TRACKS_RANGE_PARTITIONING.field}.")
+
 
+@traced
 def load_parquet_from_gcs_to_bq(
         project_id: str,
         dataset_id: str,
         table_id: str,
-        gcs_uri: str
-) -> None:
+        gcs_uri: Union[str, List[str]],
+        mode: str = "truncate",
+        partition: Optional[Union[int, str]] = None,
+        schema: Optional[List[bigquery.SchemaField]] = TRACKS_SCHEMA,
+        hive_partition_uri_prefix: Optional[str] = None
+) -> bigquery.LoadJob:
     """
-    Loads a Parquet file from GCS into a BigQuery table.
+    Loads Parquet files from GCS into a BigQuery table partitioned by year.
+
+    Modes:
+      - 'truncate':          replace the whole table
+      - 'append':            append the files (e.g., new partitions of a daily delta) to the table
+      - 'replace_partition': replace a single year partition via the 'table$<partition>' decorator;
+                             the files must only contain rows of that year
+
+    A table that exists with another partitioning (e.g., one created before the table was partitioned
+    by year) is migrated once by a 'truncate' load: the files are loaded into a new partitioned table,
+    '<table_id>__partitioned', which then replaces the old one. The other modes refuse to load into it.
 
     :param project_id: GCP project ID where the table resides (e.g., 'data-engineering-spotify')
     :param dataset_id: BigQuery dataset name (e.g., 'spotify')
     :param table_id:   Name of the target table in BigQuery (e.g., 'cleaned_tracks_features')
-    :param gcs_uri:    GCS URI of the Parquet file to load (e.g., 'gs://spotify-data-engineering-spotify/cleaned_tracks_features.parquet')
+    :param gcs_uri:    GCS URI(s) of the Parquet files to load in one job (e.g., 'gs://spotify-data-engineering-spotify/cleaned_tracks_features.parquet')
+    :param mode:       One of 'truncate', 'append' or 'replace_partition'
+    :param partition:  Partition to replace in 'replace_partition' mode (e.g., 1999)
+    :param schema:     Explicit table schema; pass None to let BigQuery autodetect it
+    :param hive_partition_uri_prefix: Prefix of a Hive-partitioned dataset (e.g., 'gs://bucket/cleaned_tracks_features/');
+                       partition key columns are read from the paths and must not be part of `schema`
+    :return:           The completed load job
     """
-    client = bigquery.Client(project=project_id)
+    if mode not in LOAD_MODES:
+        raise ValueError(f"Unknown load mode {mode!r}; expected one of {LOAD_MODES}")
+    if (mode == "replace_partition") != (partition is not None):
+        raise ValueError("A partition must be given in 'replace_partition' mode, and only in that mode")
+
+    client = _bigquery_client(project_id)
 
     # Full table ID in standard SQL format: project.dataset.table
     full_table_id = f"{project_id}.{dataset_id}.{table_id}"
 
+    migrate = _needs_partitioning_migration(client, full_table_id)
+    if migrate and mode != "truncate":
+        raise ValueError(
+            f"{full_table_id} is not partitioned by {TRACKS_RANGE_PARTITIONING.field}; "
+            "run a 'truncate' load once to migrate it"
+        )
+    load_table_id = f"{full_table_id}{MIGRATION_SUFFIX}" if migrate else full_table_id
+    destination = f"{full_table_id}${partition}" if partition is not None else load_table_id
+
     # Configure the load job
     job_config = bigquery.LoadJobConfig(
         source_format=bigquery.SourceFormat.PARQUET,
-        autodetect=True,  # Let BigQuery autodetect schema; or set your own schema if needed
-        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE
-        # WRITE_TRUNCATE will overwrite the table; use WRITE_APPEND to add to it
+        range_partitioning=TRACKS_RANGE_PARTITIONING,
+        # WRITE_TRUNCATE on a partition decorator only overwrites that partition
+        write_disposition=(
+            bigquery.WriteDisposition.WRITE_APPEND if mode == "append"
+            else bigquery.WriteDisposition.WRITE_TRUNCATE
+        )
     )
+    if schema is not None:
+        job_config.schema = schema
+    else:
+        job_config.autodetect = True
+
+    if hive_partition_uri_prefix:
+        hive_partitioning = bigquery.HivePartitioningOptions()
+        hive_partitioning.mode = "AUTO"
+        hive_partitioning.source_uri_prefix = hive_partition_uri_prefix
+        job_config.hive_partitioning = hive_partitioning
+        if schema is not None:
+            partition_keys = {
+                segment.split("=", 1)[0]
+                for uri in ([gcs_uri] if isinstance(gcs_uri, str) else gcs_uri)
+                for segment in uri[len(hive_partition_uri_prefix):].split("/")
+                if "=" in segment
+            }
+            job_config.schema = [field for field in schema if field.name not in partition_keys]
 
     load_job = client.load_table_from_uri(
         gcs_uri,
-        full_table_id,
+        destination,
         job_config=job_config
     )
 
-    print(f"Starting job to load data from {gcs_uri} into {full_table_id}...")
+    print(f"Starting {mode} job to load data from {gcs_uri} into {destination}...")
     load_job.result()  # Wait for job to finish
+    if migrate:
+        migrate_to_partitioned_table(client, load_table_id, full_table_id)
+
+    current_span().set(
+        input=gcs_uri,
+        output=destination,
+        mode=mode,
+        migrated=migrate,
+        job_id=load_job.job_id,
+        input_files=load_job.input_files,
+        bytes_read=load_job.input_file_bytes,
+        rows_written=load_job.output_rows,
+        bytes_written=load_job.output_bytes
+    )
 
     table = client.get_table(full_table_id)
-    print(f"Loaded {table.num_rows} rows into {full_table_id}.")
+    print(f"Loaded {load_job.output_rows} rows into {destination} ({table.num_rows} rows in {full_table_id}).")
+    return load_job
+
+
+def _table_modified(project_id: str, full_table_id: str) -> Optional[str]:
+    try:
+        return _bigquery_client(project_id).get_table(full_table_id).modified.isoformat()
+    except NotFound:
+        return None
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the Spotify tracks Parquet file from GCS into BigQuery.")
+    parser.add_argument("--uris", nargs="+", help="GCS URIs to load in one job (defaults to the cleaned tracks file)")
+    parser.add_argument("--mode", choices=LOAD_MODES, default="truncate", help="How the files are written to the table")
+    parser.add_argument("--partition", help="Year partition to replace in 'replace_partition' mode")
+    parser.add_argument("--hive-prefix", help="URI prefix of a Hive-partitioned dataset (e.g., gs://bucket/cleaned_tracks_features/)")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH, help="Manifest used to skip unchanged loads")
+    parser.add_argument("--force", action="store_true", help="Reload even if the uploaded object is unchanged")
+    args = parser.parse_args()
+
     # GCP / BigQuery details
     PROJECT_ID = "data-engineering-spotify"
     DATASET_ID = "spotify"
@@ -50,14 +210,47 @@ if __name__ == "__main__":
     # GCS info
     BUCKET_NAME = "spotify-data-engineering-spotify"
     PARQUET_FILE = "cleaned_tracks_features.parquet"
-    GCS_URI = f"gs://{BUCKET_NAME}/{PARQUET_FILE}"
+    GCS_URIS = args.uris or [f"gs://{BUCKET_NAME}/{PARQUET_FILE}"]
 
     # Make sure you've set your Google Application Credentials
     # e.g., export GOOGLE_APPLICATION_CREDENTIALS="/path/to/service_account.json"
 
-    load_parquet_from_gcs_to_bq(
-        project_id=PROJECT_ID,
-        dataset_id=DATASET_ID,
-        table_id=TABLE_ID,
-        gcs_uri=GCS_URI
+    # Skip the load when the uploaded objects are the ones already loaded and the table was not modified since
+    manifest = PipelineManifest(args.manifest)
+    full_table_id = f"{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}"
+    if args.mode == "append":
+        # Appends are tracked per set of files, since other appends modify the table in between
+        load_key = f"{full_table_id} <- {' '.join(sorted(GCS_URIS))}"
+    else:
+        load_key = f"{full_table_id}${args.partition}" if args.partition else full_table_id
+    uploads = {uri: manifest.get("upload", uri) for uri in GCS_URIS}
+    load_inputs = {
+        "mode": args.mode,
+        "uploads": {uri: upload["outputs"] if upload else None for uri, upload in uploads.items()}
+    }
+    previous = manifest.get("load", load_key)
+    unchanged = (
+        not args.force
+        and all(upload is not None for upload in uploads.values())
+        and manifest.is_unchanged("load", load_key, load_inputs)
+        and (args.mode == "append"
+             or _table_modified(PROJECT_ID, full_table_id) == previous["outputs"]["table_modified"])
     )
+
+    if unchanged:
+        print(f"Skipping load: {load_key} already contains {', '.join(GCS_URIS)} (job {previous['outputs']['job_id']})")
+    else:
+        job = load_parquet_from_gcs_to_bq(
+            project_id=PROJECT_ID,
+            dataset_id=DATASET_ID,
+            table_id=TABLE_ID,
+            gcs_uri=GCS_URIS,
+            mode=args.mode,
+            partition=args.partition,
+            hive_partition_uri_prefix=args.hive_prefix
+        )
+        manifest.record("load", load_key, load_inputs, {
+            "job_id": job.job_id,
+            "output_rows": job.output_rows,
+            "table_modified": _table_modified(PROJECT_ID, full_table_id)
+        })
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+DEFAULT_MANIFEST_PATH = "pipeline_manifest.json"
+
+
+class PipelineManifest:
+    """
+    Records what each pipeline stage consumed and produced, so unchanged stages can be skipped.
+
+    Every stage entry is keyed by (stage, key) and stores the stage inputs (content hashes,
+    object generations, ...) and its outputs. A stage is unchanged when its inputs match the
+    recorded ones and its local outputs are still on disk with the recorded content.
+
+    File hashes are cached by size and mtime, so a file that has not been touched is never
+    re-read; a touched file is re-hashed and still counts as unchanged if its content is.
+    """
+
+    def __init__(self, path: str = DEFAULT_MANIFEST_PATH):
+        self.path = path
+        self.data = {"files": {}, "stages": {}}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.data = json.load(f)
+
+    def save(self) -> None:
+        # Write to a temporary file first so an interrupted write never corrupts the manifest.
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def fingerprint(self, path: str) -> Optional[str]:
+        """
+        Returns the SHA-256 of a file, or None if it does not exist.
+
+        The hash is only recomputed when the file's size or mtime changed since it was last hashed.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        key = os.path.abspath(path)
+        cached = self.data["files"].get(key)
+        if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+            return cached["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(8 * 1024 * 1024), b""):
+                digest.update(block)
+
+        self.data["files"][key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+        return digest.hexdigest()
+
+    def fingerprint_tree(self, root: str) -> Dict[str, str]:
+        """Returns the SHA-256 of every file under `root`, keyed by relative path."""
+        return {
+            os.path.relpath(os.path.join(dir_path, name), root): self.fingerprint(os.path.join(dir_path, name))
+            for dir_path, _, files in sorted(os.walk(root))
+            for name in sorted(files)
+        }
+
+    def get(self, stage: str, key: str) -> Optional[dict]:
+        """Returns the recorded entry ({'inputs': ..., 'outputs': ...}) of a stage, if any."""
+        return self.data["stages"].get(stage, {}).get(key)
+
+    def is_unchanged(self, stage: str, key: str, inputs: dict) -> bool:
+        """
+        Checks whether a stage can be skipped.
+
+        :param stage:  Stage name (e.g., 'clean', 'convert', 'upload', 'load')
+        :param key:    Identifies the stage instance, usually its output path, URI or table
+        :param inputs: Current inputs of the stage; must equal the recorded inputs
+        """
+        entry = self.get(stage, key)
+        if entry is None or entry["inputs"] != inputs:
+            return False
+
+        # Local outputs must still be present with the content that was produced.
+        local_outputs = entry["outputs"].get("files", {})
+        return all(self.fingerprint(path) == sha256 for path, sha256 in local_outputs.items())
+
+    def record(self, stage: str, key: str, inputs: dict, outputs: dict) -> None:
+        """
+        Records a completed stage and saves the manifest.
+
+        Local output files should be listed under outputs['files'] as {path: sha256}.
+        """
+        self.data["stages"].setdefault(stage, {})[key] = {"inputs": inputs, "outputs": outputs}
+        self.save()
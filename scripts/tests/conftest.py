@@ -0,0 +1,32 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+# The pipeline scripts import each other by name, as when they are run from scripts/
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+
+def _load_script(file_name: str):
+    # The hyphenated scripts are named for the command line and are not importable as regular modules
+    spec = importlib.util.spec_from_file_location(
+        file_name[:-len(".py")].replace("-", "_"), os.path.join(SCRIPTS_DIR, file_name)
+    )
+    module = importlib.util.module_from_spec(spec)
+    # Registered, so the process pool workers of the converter can unpickle its functions
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def csv_to_parquet():
+    return _load_script("csv-to-parquet.py")
+
+
+@pytest.fixture(scope="session")
+def parquet_to_bq():
+    return _load_script("parquet-to-bq.py")
@@ -0,0 +1,132 @@
+"""Parity of clean_tracks with the cleaning steps of exploratory_analysis/spotify.ipynb."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from clean_tracks import AUDIO_FEATURES, clean_tracks, clean_tracks_csv
+
+
+def notebook_clean_tracks(df: pd.DataFrame) -> pd.DataFrame:
+    # The notebook's cells, in order, with their row-wise apply/lambda steps
+    df_clean = df.drop(['id', 'album_id', 'artist_ids', 'track_number', 'disc_number', 'time_signature'], axis=1)
+    df_clean['artists'] = df_clean['artists'].apply(
+        lambda x: x.strip("[]'\"").replace("'", "").replace('"', '') if isinstance(x, str) else x
+    )
+    df_clean['primary_artist'] = df_clean['artists'].apply(
+        lambda x: x.split(',')[0].strip() if isinstance(x, str) and ',' in x else x
+    )
+    for feature in AUDIO_FEATURES:
+        df_clean[feature] = df_clean[feature].round(2)
+    df_clean["tempo"] = df_clean["tempo"].astype(int)
+    df_clean["duration_s"] = (df_clean["duration_ms"] / 1000).astype(int)
+    df_clean = df_clean.drop("duration_ms", axis=1)
+    df_clean['release_date'] = pd.to_datetime(df_clean['release_date'], errors='coerce')
+    df_clean['release_year'] = df_clean['release_date'].dt.year
+    df_clean['release_month'] = df_clean['release_date'].dt.month
+    df_clean['release_day'] = df_clean['release_date'].dt.day
+    df_clean['year'] = df_clean['year'].astype(str)
+    df_clean['decade'] = df_clean['year'].apply(
+        lambda x: str(int(float(x)) // 10 * 10) + 's' if x.replace('.', '', 1).isdigit() else None
+    )
+    critical_columns = ['name', 'album', 'artists', 'danceability', 'energy']
+    df_clean = df_clean.dropna(subset=critical_columns)
+    df_clean = df_clean.fillna({
+        'mode': 0,
+        'key': -1,
+        'explicit': False
+    })
+    df_clean['song_id'] = df_clean.apply(
+        lambda row: f"{row['primary_artist']}-{row['name']}".lower().replace(' ', '_'), axis=1
+    )
+    return df_clean
+
+
+# The notebook's decade step fails on missing years from pandas 3, where astype(str) keeps them missing
+PANDAS_KEEPS_MISSING_STRINGS = int(pd.__version__.split(".")[0]) >= 3
+
+
+def raw_tracks() -> pd.DataFrame:
+    # A small raw export: single and multi-artist lists, quotes inside names, missing artists,
+    # years and release dates, and rows that lose a critical column
+    artists = [
+        "['The Beatles']",
+        "['Simon & Garfunkel', 'Paul Simon']",
+        "[\"Guns N' Roses\"]",
+        "['A', 'B', 'C']",
+        np.nan,
+        "['Solo Artist']",
+        "['Tom Jones', \"Shakin' Stevens\"]",
+        "['Band, The']",
+    ]
+    n = len(artists)
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "id": [f"id{i}" for i in range(n)],
+        "name": ["Hey Jude", "Mrs. Robinson", "Paradise City", "Song", "No Artist", np.nan, "It's Me", "Title"],
+        "album": ["Album"] * n,
+        "album_id": [f"album{i}" for i in range(n)],
+        "artists": artists,
+        "artist_ids": ["['x']"] * n,
+        "track_number": np.arange(1, n + 1),
+        "disc_number": [1] * n,
+        "explicit": [False, True, np.nan, False, False, True, np.nan, False],
+        "danceability": rng.random(n),
+        "energy": [*rng.random(n - 1), np.nan],
+        "key": [0, 5, np.nan, 11, 2, 3, 7, np.nan],
+        "loudness": rng.uniform(-60, 0, n),
+        "mode": [1, 0, 1, np.nan, 1, 0, 1, 1],
+        "speechiness": rng.random(n),
+        "acousticness": rng.random(n),
+        "instrumentalness": rng.random(n),
+        "liveness": rng.random(n),
+        "valence": rng.random(n),
+        "tempo": rng.uniform(60, 200, n),
+        "duration_ms": rng.integers(60_000, 600_000, n),
+        "time_signature": [4] * n,
+        "year": [1968, 1968, np.nan, 2005, 1999, 2010, 0, 1987],
+        "release_date": ["1968-08-26", "1968", "1987-07-21", "2005-03", None, "2010-01-01", "0000", "not a date"],
+    })
+
+
+def assert_matches_notebook(raw: pd.DataFrame) -> None:
+    expected = notebook_clean_tracks(raw.copy())
+    actual = clean_tracks(raw.copy())
+
+    pd.testing.assert_frame_equal(actual, expected)
+    # The cleaned CSV, what the pipeline uploads, is byte-identical
+    assert actual.to_csv(index=False) == expected.to_csv(index=False)
+
+
+def test_clean_tracks_matches_notebook():
+    raw = raw_tracks()
+    assert_matches_notebook(raw[raw["year"].notna()])
+
+
+@pytest.mark.skipif(PANDAS_KEEPS_MISSING_STRINGS, reason="the notebook's decade step fails on missing years")
+def test_clean_tracks_matches_notebook_with_missing_years():
+    assert_matches_notebook(raw_tracks())
+
+
+def test_clean_tracks_artists_and_decades():
+    df = clean_tracks(raw_tracks()).set_index("name")
+
+    assert df.loc["Mrs. Robinson", "artists"] == "Simon & Garfunkel, Paul Simon"
+    assert df.loc["Mrs. Robinson", "primary_artist"] == "Simon & Garfunkel"
+    assert df.loc["Paradise City", "artists"] == "Guns N Roses"
+    # A missing year has no decade
+    assert df.loc["Paradise City", "year"] == "nan" and pd.isna(df.loc["Paradise City", "decade"])
+    assert df.loc["Hey Jude", "decade"] == "1960s"
+    assert df.loc["It's Me", "decade"] == "0s"
+    # Rows without artists, a name or energy are dropped
+    assert set(df.index) == {"Hey Jude", "Mrs. Robinson", "Paradise City", "Song", "It's Me"}
+
+
+def test_clean_tracks_csv_in_chunks(tmp_path):
+    raw_csv = tmp_path / "tracks_features.csv"
+    raw_tracks().to_csv(raw_csv, index=False)
+    clean_tracks_csv(str(raw_csv), str(tmp_path / "whole.csv"))
+    clean_tracks_csv(str(raw_csv), str(tmp_path / "chunked.csv"), chunk_rows=3)
+
+    # Chunks without missing keys or years write them as integers ('5' rather than '5.0'),
+    # which read back as the same values
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "chunked.csv"), pd.read_csv(tmp_path / "whole.csv"))
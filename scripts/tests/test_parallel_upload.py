@@ -0,0 +1,145 @@
+"""Parallel composite upload of csv-to-parquet.py against a fake-GCS emulator (STORAGE_EMULATOR_HOST)."""
+import functools
+import json
+import os
+import uuid
+
+import pytest
+import requests
+from google.cloud import storage
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get("STORAGE_EMULATOR_HOST"), reason="needs a fake-GCS emulator at STORAGE_EMULATOR_HOST"
+)
+
+PROJECT_ID = "test-project"
+PART_SIZE_MB = 1
+
+
+@pytest.fixture
+def bucket():
+    client = storage.Client(project=PROJECT_ID)
+    return client.create_bucket(f"upload-test-{uuid.uuid4().hex[:12]}")
+
+
+@pytest.fixture
+def source_file(tmp_path):
+    # Three parts, the last one short
+    path = tmp_path / "tracks.parquet"
+    path.write_bytes(os.urandom(2 * PART_SIZE_MB * 1024 * 1024 + 12345))
+    return str(path)
+
+
+@pytest.fixture
+def trace_file(tmp_path, monkeypatch):
+    path = tmp_path / "trace.jsonl"
+    monkeypatch.setenv("SPOTIFY_TRACE_FILE", str(path))
+
+    def upload_span() -> dict:
+        spans = [json.loads(line) for line in path.read_text().splitlines()]
+        return [s for s in spans if s["name"] == "upload_to_gcs"][-1]["attributes"]
+    return upload_span
+
+
+def upload(csv_to_parquet, bucket, source_file: str):
+    return csv_to_parquet.upload_to_gcs(
+        bucket.name, source_file, "tracks.parquet", PROJECT_ID,
+        parallel=True, part_size_mb=PART_SIZE_MB, max_workers=2
+    )
+
+
+def assert_uploaded(bucket, source_file: str) -> None:
+    with open(source_file, "rb") as f:
+        assert bucket.blob("tracks.parquet").download_as_bytes() == f.read()
+    # The parts and the checkpoint are removed once the object is composed
+    assert [blob.name for blob in bucket.list_blobs()] == ["tracks.parquet"]
+    assert not os.path.exists(f"{source_file}.upload-checkpoint.json")
+
+
+def test_parallel_upload_composes_parts(csv_to_parquet, bucket, source_file, trace_file):
+    upload(csv_to_parquet, bucket, source_file)
+
+    assert_uploaded(bucket, source_file)
+    attributes = trace_file()
+    assert attributes["parts"] == 3 and attributes["parts_resumed"] == 0 and attributes["retries"] == 0
+
+
+def test_parallel_upload_resumes_from_checkpoint(csv_to_parquet, bucket, source_file, trace_file, monkeypatch):
+    upload_from_string = storage.Blob.upload_from_string
+    interrupted_parts = {"tracks.parquet.parts/00001"}
+    uploaded = []
+
+    @functools.wraps(upload_from_string)
+    def upload_or_fail(blob, *args, **kwargs):
+        if blob.name in interrupted_parts:
+            raise RuntimeError("interrupted")
+        uploaded.append(blob.name)
+        return upload_from_string(blob, *args, **kwargs)
+
+    monkeypatch.setattr(storage.Blob, "upload_from_string", upload_or_fail)
+    with pytest.raises(RuntimeError):
+        upload(csv_to_parquet, bucket, source_file)
+    with open(f"{source_file}.upload-checkpoint.json") as f:
+        assert sorted(json.load(f)["parts"]) == ["0", "2"]
+
+    # Only the missing part is sent again
+    interrupted_parts.clear()
+    uploaded.clear()
+    upload(csv_to_parquet, bucket, source_file)
+
+    assert uploaded == ["tracks.parquet.parts/00001"]
+    assert trace_file()["parts_resumed"] == 2
+    assert_uploaded(bucket, source_file)
+
+
+def test_parallel_upload_replaces_stale_parts(csv_to_parquet, bucket, source_file):
+    # A part left behind by the upload of another file, without a checkpoint, is overwritten
+    bucket.blob("tracks.parquet.parts/00000").upload_from_string(b"stale")
+
+    upload(csv_to_parquet, bucket, source_file)
+
+    assert_uploaded(bucket, source_file)
+
+
+def test_parallel_upload_retries_transient_errors(csv_to_parquet, bucket, source_file, trace_file, monkeypatch):
+    send = requests.adapters.HTTPAdapter.send
+    failed = []
+
+    def unavailable_once(adapter, request, *args, **kwargs):
+        # The first part upload is answered with a 503, as by an overloaded server
+        if "/upload/" in request.url and not failed:
+            failed.append(request.url)
+            response = requests.Response()
+            response.status_code = 503
+            response.request = request
+            response.url = request.url
+            response._content = b'{"error": {"code": 503, "message": "Service Unavailable"}}'
+            response.headers["Content-Type"] = "application/json"
+            return response
+        return send(adapter, request, *args, **kwargs)
+
+    monkeypatch.setattr(requests.adapters.HTTPAdapter, "send", unavailable_once)
+    upload(csv_to_parquet, bucket, source_file)
+
+    assert failed
+    assert trace_file()["retries"] == 1
+    assert_uploaded(bucket, source_file)
+
+
+def test_uploads_replace_existing_objects(csv_to_parquet, bucket, source_file, tmp_path):
+    # The single-stream and directory uploads send the generation they replace as their precondition
+    csv_to_parquet.upload_to_gcs(bucket.name, source_file, "tracks.parquet", PROJECT_ID, chunk_size_mb=1)
+    csv_to_parquet.upload_to_gcs(bucket.name, source_file, "tracks.parquet", PROJECT_ID, chunk_size_mb=1)
+    with open(source_file, "rb") as f:
+        assert bucket.blob("tracks.parquet").download_as_bytes() == f.read()
+
+    partition = tmp_path / "dataset" / "decade=1990s"
+    partition.mkdir(parents=True)
+    (partition / "part-00000.parquet").write_bytes(b"first")
+    csv_to_parquet.upload_directory_to_gcs(bucket.name, str(tmp_path / "dataset"), "dataset", PROJECT_ID)
+    (partition / "part-00000.parquet").write_bytes(b"second")
+    generations = csv_to_parquet.upload_directory_to_gcs(bucket.name, str(tmp_path / "dataset"), "dataset", PROJECT_ID)
+
+    blob, = bucket.list_blobs(prefix="dataset/")
+    assert generations == {os.path.join("decade=1990s", "part-00000.parquet"): blob.generation}
+    assert blob.download_as_bytes() == b"second"
@@ -0,0 +1,69 @@
+"""The Parquet files of csv-to-parquet.py load into the BigQuery schema pinned by parquet-to-bq.py."""
+import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from clean_tracks import clean_tracks
+from test_clean_tracks import raw_tracks
+
+# Parquet type a BigQuery load accepts for each column type of the table
+LOADABLE_TYPES = {
+    "STRING": pa.string(),
+    "BOOLEAN": pa.bool_(),
+    "FLOAT64": pa.float64(),
+    "INT64": pa.int64(),
+    "DATE": pa.date32(),
+}
+
+
+@pytest.fixture
+def cleaned_csv(tmp_path):
+    raw = raw_tracks()
+    # Keys are written as floats ('5.0'), since the raw column has missing values; Mrs. Robinson's
+    # release date is empty, Song's is out of BigQuery's DATE range and It's Me's does not parse
+    df = clean_tracks(raw[raw["year"].notna()])
+    df["release_date"] = df["release_date"].dt.strftime("%Y-%m-%d").astype(object)
+    df.loc[df["name"] == "Song", "release_date"] = "0-01-01"
+    df.loc[df["name"] == "It's Me", "release_date"] = "not a date"
+    path = tmp_path / "cleaned_tracks_features.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+@pytest.mark.parametrize("layout", ["default", "analytics"])
+def test_converted_file_matches_bigquery_schema(csv_to_parquet, parquet_to_bq, cleaned_csv, tmp_path, streaming,
+                                                layout):
+    parquet_file = str(tmp_path / "tracks.parquet")
+    csv_to_parquet.convert_csv_to_parquet(
+        cleaned_csv, parquet_file, streaming=streaming, layout=csv_to_parquet.LAYOUTS[layout]
+    )
+
+    expected = pa.schema([(field.name, LOADABLE_TYPES[field.field_type]) for field in parquet_to_bq.TRACKS_SCHEMA])
+    schema = pq.read_schema(parquet_file)
+    assert {name: schema.field(name).type for name in schema.names} == {
+        name: expected.field(name).type for name in expected.names
+    }
+
+    # Loading with the table's schema needs no cast
+    table = pq.read_table(parquet_file, schema=expected).to_pandas().set_index("name")
+    assert table.loc["Mrs. Robinson", "key"] == 5
+    assert table.loc["Song", "key"] == 11
+    assert table.loc["Hey Jude", "release_date"] == datetime.date(1968, 8, 26)
+    for name in ["Mrs. Robinson", "Song", "It's Me"]:
+        assert pd.isna(table.loc[name, "release_date"])
+
+
+def test_converted_dataset_matches_bigquery_schema(csv_to_parquet, parquet_to_bq, cleaned_csv, tmp_path):
+    output_dir = str(tmp_path / "tracks")
+    csv_to_parquet.convert_csv_shards_to_parquet([cleaned_csv], output_dir, max_workers=1)
+
+    table = pq.read_table(output_dir)
+    types = {field.name: field.field_type for field in parquet_to_bq.TRACKS_SCHEMA}
+    for field in table.schema:
+        if field.name != "decade":
+            # The partition column is read back from the directory names
+            assert field.type == LOADABLE_TYPES[types[field.name]], field.name
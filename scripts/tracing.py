@@ -0,0 +1,178 @@
+"""
+Structured tracing of the pipeline stages.
+
+Every stage runs in a span that records its wall time, the peak RSS of the process (and of its
+worker processes) and whatever the stage measures: rows, bytes read and written, retries, ...
+Finished spans are written as JSON lines to the file named by SPOTIFY_TRACE_FILE ('-' writes to
+stderr), one object per span. The fields follow OpenTelemetry spans (trace_id, span_id,
+parent_span_id, start and end times in Unix nanoseconds, attributes, events, status), so the
+lines can be shipped to any tracing backend. Without SPOTIFY_TRACE_FILE spans cost a couple of
+clock reads and are not written.
+
+Setting SPOTIFY_PROFILE_DIR also runs every root span under cProfile and writes its profile to
+`<dir>/<span name>-<span id>.prof` (read it with `python -m pstats` or snakeviz). cProfile only
+sees the thread that opened the span, not worker threads or processes.
+"""
+import contextvars
+import cProfile
+import functools
+import json
+import os
+import resource
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_export_lock = threading.Lock()
+
+
+class Span:
+    """A timed pipeline stage; attributes and events may be added from any thread."""
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, **attributes: Any):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent.span_id if parent else None
+        self.attributes = dict(attributes)
+        self.events = []
+        self.status = {"code": "OK"}
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano = None
+        self._lock = threading.Lock()
+
+    def set(self, **attributes: Any) -> None:
+        with self._lock:
+            self.attributes.update(attributes)
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        """Adds to a counter attribute (e.g., retries), starting from 0."""
+        with self._lock:
+            self.attributes[name] = self.attributes.get(name, 0) + amount
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        """Records a timestamped event inside the span (e.g., one uploaded chunk)."""
+        with self._lock:
+            self.events.append({"name": name, "time_unix_nano": time.time_ns(), "attributes": attributes})
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        """Ends the span now, marking it as failed if an error is given."""
+        if error is not None:
+            self.status = {"code": "ERROR", "message": f"{type(error).__name__}: {error}"}
+        self.end_time_unix_nano = time.time_ns()
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano,
+            "duration_ms": (self.end_time_unix_nano - self.start_time_unix_nano) / 1e6,
+            "attributes": self.attributes,
+            "events": self.events,
+            "status": self.status,
+        }
+
+
+def current_span() -> Optional[Span]:
+    """Returns the innermost open span of the calling thread, if any."""
+    return _current_span.get()
+
+
+def _reset_peak_rss() -> None:
+    # On Linux, writing 5 to clear_refs resets the process's peak RSS (VmHWM), so a root span
+    # reports its own peak rather than the peak of an earlier stage
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss() -> dict:
+    """Returns the peak RSS of this process and of its largest finished child process (e.g., a shard worker)."""
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS; it is not reset by clear_refs, VmHWM is
+    scale = 1 if sys.platform == "darwin" else 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    try:
+        with open("/proc/self/status") as f:
+            peak = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmHWM:"))
+    except (OSError, StopIteration):
+        pass
+    return {
+        "peak_rss_bytes": peak,
+        "peak_child_rss_bytes": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+    }
+
+
+def export(span: Span) -> None:
+    """Writes a finished span as one JSON line to SPOTIFY_TRACE_FILE, if it is set."""
+    path = os.environ.get("SPOTIFY_TRACE_FILE")
+    if not path:
+        return
+    line = json.dumps(span.to_dict(), default=str) + "\n"
+    with _export_lock:
+        if path == "-":
+            sys.stderr.write(line)
+        else:
+            with open(path, "a") as f:
+                f.write(line)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """
+    Runs the enclosed block as a span, nested under the calling thread's current span.
+
+    The span is marked as failed if the block raises, and is written out either way.
+
+    :param name:       Span name, usually the stage function (e.g., 'convert_csv_to_parquet')
+    :param attributes: Initial attributes (e.g., input and output paths)
+    """
+    parent = _current_span.get()
+    current = Span(name, parent, **attributes)
+    token = _current_span.set(current)
+
+    profile_dir = os.environ.get("SPOTIFY_PROFILE_DIR")
+    profiler = None
+    if parent is None:
+        _reset_peak_rss()
+        if profile_dir:
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        current.end(error)
+        _current_span.reset(token)
+
+        current.set(**_peak_rss())
+
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(profile_dir, exist_ok=True)
+            profile_path = os.path.join(profile_dir, f"{name}-{current.span_id}.prof")
+            profiler.dump_stats(profile_path)
+            current.set(profile_path=profile_path)
+
+        export(current)
+
+
+def traced(function: Callable) -> Callable:
+    """Runs every call of `function` in a span named after it; the function adds its measurements through current_span()."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with span(function.__name__):
+            return function(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,47 @@
+"""
+Pinned schema of the cleaned tracks, shared by the Parquet converter and the BigQuery load.
+
+The BigQuery types are the source of truth: parquet-to-bq.py loads the table with them, and
+csv-to-parquet.py writes the Parquet columns with the matching Arrow types, so a load job never
+meets a column whose type was inferred differently from a sample of the CSV.
+"""
+import pyarrow as pa
+
+# BigQuery type of every column of the cleaned tracks (see clean_tracks.py), in file order
+TRACKS_COLUMN_TYPES = {
+    "name": "STRING",
+    "album": "STRING",
+    "artists": "STRING",
+    "explicit": "BOOLEAN",
+    "danceability": "FLOAT64",
+    "energy": "FLOAT64",
+    "key": "INT64",
+    "loudness": "FLOAT64",
+    "mode": "INT64",
+    "speechiness": "FLOAT64",
+    "acousticness": "FLOAT64",
+    "instrumentalness": "FLOAT64",
+    "liveness": "FLOAT64",
+    "valence": "FLOAT64",
+    "tempo": "INT64",
+    "year": "INT64",
+    "release_date": "DATE",
+    "primary_artist": "STRING",
+    "duration_s": "INT64",
+    "release_year": "FLOAT64",
+    "release_month": "FLOAT64",
+    "release_day": "FLOAT64",
+    "decade": "STRING",
+    "song_id": "STRING",
+}
+
+# Parquet (Arrow) type a BigQuery load reads into each BigQuery type
+ARROW_TYPES = {
+    "STRING": pa.string(),
+    "BOOLEAN": pa.bool_(),
+    "FLOAT64": pa.float64(),
+    "INT64": pa.int64(),
+    "DATE": pa.date32(),
+}
+
+TRACKS_ARROW_SCHEMA = pa.schema([(name, ARROW_TYPES[bq_type]) for name, bq_type in TRACKS_COLUMN_TYPES.items()])
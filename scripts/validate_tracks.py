@@ -0,0 +1,281 @@
+import argparse
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from tracing import current_span, traced
+
+# Mirrors the not_null tests of models/spotify/schema.yml (release_year is loaded from `year`),
+# plus the identifiers every downstream model relies on
+NOT_NULL_COLUMNS = ['name', 'album', 'artists', 'song_id', 'danceability', 'energy', 'key', 'loudness', 'mode',
+                    'speechiness', 'acousticness', 'instrumentalness', 'liveness', 'valence', 'tempo',
+                    'duration_s', 'year']
+
+# Inclusive bounds of the audio features measured on a 0.0 to 1.0 scale
+VALUE_RANGES = {
+    column: (0.0, 1.0)
+    for column in ['danceability', 'energy', 'speechiness', 'acousticness', 'instrumentalness', 'liveness', 'valence']
+}
+
+# Integer codes the key and modality descriptions are derived from (see macros/spotify/music_helpers.sql);
+# clean_tracks.py fills a missing key with -1
+ACCEPTED_VALUES = {
+    'key': set(range(-1, 12)),
+    'mode': {0, 1},
+}
+
+# Named decades (e.g., '1990s'); the export's year 0 tracks fall in '0s', and tracks without
+# a numeric year have no decade
+DECADE_PATTERN = r"^([1-9]\d{2})?0s$"
+
+# Value used by Hive-style partitioning for null partition keys
+HIVE_NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+EXAMPLES_PER_CHECK = 5
+
+
+class DataQualityError(ValueError):
+    """Raised by validate_tracks_parquet when a check fails; `report` holds the full results."""
+
+    def __init__(self, report: dict):
+        self.report = report
+        lines = [
+            f"  {check}: {failure['rows']} rows (e.g., {failure['examples']})"
+            for check, failure in report["failures"].items()
+        ]
+        super().__init__(f"Data quality checks failed for {report['path']}:\n" + "\n".join(lines))
+
+
+def _parquet_files(path: str) -> List[Tuple[str, Dict[str, str]]]:
+    # (file path, Hive partition values) of a single file or of every file of a partitioned dataset
+    if os.path.isfile(path):
+        return [(path, {})]
+    files = []
+    for dir_path, _, names in sorted(os.walk(path)):
+        partition = dict(
+            segment.split("=", 1) for segment in os.path.relpath(dir_path, path).split(os.sep) if "=" in segment
+        )
+        files.extend((os.path.join(dir_path, name), partition) for name in sorted(names) if name.endswith(".parquet"))
+    return files
+
+
+def _statistics(row_group: pq.RowGroupMetaData, index: Dict[str, int], column: str) -> Optional[pq.Statistics]:
+    statistics = row_group.column(index[column]).statistics
+    return statistics if statistics is not None and statistics.has_min_max else None
+
+
+def _proven_not_null(row_group: pq.RowGroupMetaData, index: Dict[str, int], column: str) -> bool:
+    statistics = row_group.column(index[column]).statistics
+    return statistics is not None and statistics.has_null_count and statistics.null_count == 0
+
+
+def _proven_in_range(row_group: pq.RowGroupMetaData, index: Dict[str, int], column: str) -> bool:
+    low, high = VALUE_RANGES[column]
+    statistics = _statistics(row_group, index, column)
+    return statistics is not None and low <= statistics.min and statistics.max <= high
+
+
+def _proven_accepted(row_group: pq.RowGroupMetaData, index: Dict[str, int], column: str, type_: pa.DataType) -> bool:
+    # Every integer between the min and the max is accepted; the accepted sets are small ranges
+    accepted = ACCEPTED_VALUES[column]
+    statistics = _statistics(row_group, index, column)
+    return (
+        statistics is not None
+        and pa.types.is_integer(type_)
+        and min(accepted) <= statistics.min
+        and statistics.max <= max(accepted)
+        and all(value in accepted for value in range(statistics.min, statistics.max + 1))
+    )
+
+
+def _proven_decade(row_group: pq.RowGroupMetaData, index: Dict[str, int]) -> bool:
+    # Row groups sorted by decade (the 'analytics' layout) hold a single decade
+    statistics = _statistics(row_group, index, "decade")
+    return (
+        statistics is not None
+        and statistics.min == statistics.max
+        and pc.match_substring_regex(pa.scalar(statistics.min), DECADE_PATTERN).as_py()
+    )
+
+
+def _bad_decades(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    # Decades are read dictionary-encoded, so the pattern is usually matched once per distinct value
+    chunks = []
+    for chunk in column.chunks:
+        if pa.types.is_dictionary(chunk.type):
+            if pc.all(pc.match_substring_regex(chunk.dictionary, DECADE_PATTERN)).as_py() is not False:
+                continue
+            chunk = chunk.dictionary_decode()
+        chunks.append(chunk.filter(pc.invert(pc.match_substring_regex(chunk, DECADE_PATTERN))))
+    return pa.chunked_array(chunks, type=pa.string())
+
+
+def _hash_ids(values: pa.ChunkedArray) -> np.ndarray:
+    return pd.util.hash_array(values.drop_null().to_numpy(zero_copy_only=False).astype(object), categorize=False)
+
+
+def _duplicate_examples(files: List[Tuple[str, Dict[str, str]]], duplicates: np.ndarray) -> list:
+    # Only hashes are kept during the pass, so the ids are looked up again (song_id only) on failure
+    examples = []
+    duplicates = duplicates[:EXAMPLES_PER_CHECK]
+    for file_path, _ in files:
+        ids = pq.read_table(file_path, columns=["song_id"])["song_id"].drop_null()
+        matches = ids.filter(pa.array(np.isin(_hash_ids(ids), duplicates)))
+        examples.extend(value for value in matches.unique().to_pylist() if value not in examples)
+        if len(examples) >= len(duplicates):
+            break
+    return examples
+
+
+@traced
+def validate_tracks_parquet(path: str, max_duplicate_song_ids: Optional[int] = None) -> dict:
+    """
+    Checks the Parquet output of convert_csv_to_parquet before it is uploaded and loaded.
+
+    Runs the checks of models/spotify/schema.yml and a few more in one streaming pass over
+    the row groups, so a bad batch is caught locally instead of after a full load:
+
+    - nulls in NOT_NULL_COLUMNS
+    - audio features outside 0.0 to 1.0
+    - key and mode codes outside ACCEPTED_VALUES
+    - decades not named like '1990s' (missing decades and the '0s' of year 0 are allowed)
+    - duplicate song_ids, only when max_duplicate_song_ids is set; song_id is derived from the
+      artists and name, so the same song on several albums shares one and duplicates are
+      otherwise only counted in the report
+
+    A column chunk is only read when its Parquet statistics cannot already prove a check
+    (e.g., a null count of 0, or a min and max within range). song_id is always read: its
+    64-bit hashes are kept (8 bytes per row) and sorted once at the end to count duplicates.
+
+    :param path:                   Parquet file, or root directory of a Hive-partitioned dataset; partition
+                                   values are only checked for nulls and the decade format
+    :param max_duplicate_song_ids: Duplicate song_ids (rows beyond the first of each id) that are tolerated;
+                                   None (the default) only reports them
+    :return:                       The report: rows, row groups, column chunks read and skipped, duplicates
+                                   and the failed checks ({check: {'rows': ..., 'examples': [...]}})
+    :raises DataQualityError:      If any check fails
+    """
+    files = _parquet_files(path)
+    if not files:
+        raise FileNotFoundError(f"No Parquet files found at {path}")
+
+    failures = {}
+
+    def fail(check: str, rows: int, examples: list) -> None:
+        if rows:
+            failure = failures.setdefault(check, {"rows": 0, "examples": []})
+            failure["rows"] += rows
+            failure["examples"].extend(examples[:EXAMPLES_PER_CHECK - len(failure["examples"])])
+
+    rows = row_groups = chunks_read = chunks_skipped = 0
+    hashes = []
+    for file_path, partition in files:
+        metadata = pq.read_metadata(file_path)
+        index = {metadata.schema.column(i).name: i for i in range(metadata.num_columns)}
+        read_dictionary = ["decade"] if "decade" in index else None
+        parquet_file = pq.ParquetFile(file_path, metadata=metadata, read_dictionary=read_dictionary)
+        schema = parquet_file.schema_arrow
+        rows += metadata.num_rows
+        row_groups += metadata.num_row_groups
+
+        # Partition columns are not stored in the files; their value is the same for every row of the file
+        for column, value in partition.items():
+            if column in NOT_NULL_COLUMNS and value == HIVE_NULL_PARTITION:
+                fail(f"not_null:{column}", metadata.num_rows, [file_path])
+            if column == "decade" and value != HIVE_NULL_PARTITION:
+                fail("format:decade", metadata.num_rows * len(_bad_decades(pa.chunked_array([[value]]))), [value])
+
+        checked = set(NOT_NULL_COLUMNS) | set(VALUE_RANGES) | set(ACCEPTED_VALUES) | {"decade"}
+        for column in sorted(checked - set(index) - set(partition)):
+            fail(f"schema:{column}", metadata.num_rows, [file_path])
+        if "song_id" not in index:
+            continue
+
+        for i in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i)
+            checks = [("unique", "song_id")]
+            checks += [("not_null", column) for column in NOT_NULL_COLUMNS
+                       if column in index and not _proven_not_null(row_group, index, column)]
+            checks += [("range", column) for column in VALUE_RANGES
+                       if column in index and not _proven_in_range(row_group, index, column)]
+            checks += [("accepted_values", column) for column in ACCEPTED_VALUES
+                       if column in index and not _proven_accepted(row_group, index, column, schema.field(column).type)]
+            if "decade" in index and not _proven_decade(row_group, index):
+                checks.append(("format", "decade"))
+
+            columns = sorted({column for _, column in checks})
+            considered = checked & set(index)
+            chunks_read += len(columns)
+            chunks_skipped += len(considered - set(columns))
+            table = parquet_file.read_row_group(i, columns=columns)
+
+            for check, column in checks:
+                values = table[column]
+                if check == "unique":
+                    hashes.append(_hash_ids(values))
+                elif check == "not_null":
+                    fail(f"not_null:{column}", values.null_count, [f"{file_path} row group {i}"])
+                elif check == "range":
+                    low, high = VALUE_RANGES[column]
+                    bad = values.filter(pc.or_(pc.less(values, low), pc.greater(values, high)))
+                    fail(f"range:{column}", len(bad), bad.slice(0, EXAMPLES_PER_CHECK).to_pylist())
+                elif check == "accepted_values":
+                    value_set = pa.array(sorted(ACCEPTED_VALUES[column])).cast(values.type)
+                    bad = values.drop_null().filter(pc.invert(pc.is_in(values.drop_null(), value_set=value_set)))
+                    fail(f"accepted_values:{column}", len(bad), bad.slice(0, EXAMPLES_PER_CHECK).to_pylist())
+                else:
+                    bad = _bad_decades(values.drop_null())
+                    fail("format:decade", len(bad), bad.slice(0, EXAMPLES_PER_CHECK).to_pylist())
+
+    hashes = np.sort(np.concatenate(hashes)) if hashes else np.empty(0, dtype=np.uint64)
+    duplicate_song_ids = int(np.count_nonzero(hashes[1:] == hashes[:-1]))
+    if max_duplicate_song_ids is not None and duplicate_song_ids > max_duplicate_song_ids:
+        duplicates = np.unique(hashes[1:][hashes[1:] == hashes[:-1]])
+        fail("unique:song_id", duplicate_song_ids, _duplicate_examples(files, duplicates))
+
+    report = {
+        "path": path,
+        "files": len(files),
+        "rows": rows,
+        "row_groups": row_groups,
+        "column_chunks_read": chunks_read,
+        "column_chunks_skipped": chunks_skipped,
+        "duplicate_song_ids": duplicate_song_ids,
+        "failures": failures,
+    }
+    current_span().set(
+        input=path,
+        rows_read=rows,
+        row_groups=row_groups,
+        column_chunks_read=chunks_read,
+        column_chunks_skipped=chunks_skipped,
+        duplicate_song_ids=duplicate_song_ids,
+        failed_checks=sorted(failures)
+    )
+    if failures:
+        raise DataQualityError(report)
+
+    print(f"Validated {rows} rows in {row_groups} row groups of {path} "
+          f"({chunks_skipped} of {chunks_read + chunks_skipped} column chunks proven by statistics, "
+          f"{duplicate_song_ids} duplicate song_ids)")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate the cleaned tracks Parquet output before loading it.")
+    parser.add_argument("path", nargs="?", default="cleaned_tracks_features.parquet",
+                        help="Parquet file or partitioned dataset directory")
+    parser.add_argument("--max-duplicate-song-ids", type=int, default=None,
+                        help="Fail when more duplicate song_ids are found (by default they are only reported)")
+    args = parser.parse_args()
+
+    try:
+        validate_tracks_parquet(args.path, args.max_duplicate_song_ids)
+    except DataQualityError as error:
+        sys.exit(str(error))
@@ -0,0 +1,14 @@
+-- The tracks without a release year are the source's after every incremental run: none deleted by the
+-- pre-hook without being reprocessed, and none appended next to the previous ones
+SELECT source_rows, model_rows
+FROM (
+    SELECT COUNT(*) AS source_rows
+    FROM {{ source('spotify', 'cleaned_tracks_features') }}
+    WHERE year IS NULL
+)
+CROSS JOIN (
+    SELECT COUNT(*) AS model_rows
+    FROM {{ ref('spotify_music_analysis') }}
+    WHERE release_year IS NULL
+)
+WHERE source_rows != model_rows
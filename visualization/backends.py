@@ -0,0 +1,393 @@
+"""Query engines the dashboard can run its SQL on."""
+import glob
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, NamedTuple, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+from queries import DASHBOARD_DATASET, DEFAULT_SAMPLE_SIZE, moment_columns
+
+if TYPE_CHECKING:
+    # The engines' clients are imported by the backend that uses them
+    import duckdb
+
+# Query spans are written by the pipeline's tracing module, so both traces share one format and one file
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+if SCRIPTS_DIR not in sys.path:
+    sys.path.append(SCRIPTS_DIR)
+
+from tracing import Span, export  # isort: skip
+
+# Mirrors models/spotify/spotify_music_analysis.sql and the music_helpers macros
+LOCAL_ANALYSIS_SQL = """
+CREATE VIEW spotify.spotify_music_analysis AS
+SELECT
+    name,
+    album,
+    artists,
+    explicit,
+    song_id,
+    -- DuckDB has no FARM_FINGERPRINT; its own hash gives different, equally stable buckets
+    hash(song_id) % 10000 AS sample_bucket,
+    danceability,
+    energy,
+    CASE key
+        WHEN 0 THEN 'C'
+        WHEN 1 THEN 'C#/Db'
+        WHEN 2 THEN 'D'
+        WHEN 3 THEN 'D#/Eb'
+        WHEN 4 THEN 'E'
+        WHEN 5 THEN 'F'
+        WHEN 6 THEN 'F#/Gb'
+        WHEN 7 THEN 'G'
+        WHEN 8 THEN 'G#/Ab'
+        WHEN 9 THEN 'A'
+        WHEN 10 THEN 'A#/Bb'
+        WHEN 11 THEN 'B'
+        ELSE 'Unknown'
+    END AS key_description,
+    loudness,
+    CASE mode
+        WHEN 0 THEN 'Minor'
+        WHEN 1 THEN 'Major'
+        ELSE 'Unknown'
+    END AS modality_description,
+    speechiness,
+    acousticness,
+    instrumentalness,
+    liveness,
+    valence,
+    tempo,
+    duration_s,
+    year AS release_year,
+    release_date,
+    primary_artist,
+    decade,
+    CASE
+        WHEN valence > 0.5 THEN 'Happy'
+        WHEN valence < 0.5 THEN 'Sad'
+        ELSE 'Ambivalent'
+    END AS mood
+FROM spotify.cleaned_tracks_features
+"""
+
+# Mirrors the rollup models in models/spotify/; materialized once when the engine starts
+LOCAL_ROLLUP_SQL = [
+    """
+    CREATE TABLE spotify.spotify_decade_features AS
+    SELECT decade, COUNT(*) AS track_count, SUM(danceability) AS sum_danceability, SUM(energy) AS sum_energy,
+           SUM(valence) AS sum_valence, SUM(acousticness) AS sum_acousticness
+    FROM spotify.spotify_music_analysis
+    WHERE decade IS NOT NULL
+    GROUP BY decade
+    """,
+    """
+    CREATE TABLE spotify.spotify_decade_mood AS
+    SELECT decade, mood, COUNT(*) AS track_count
+    FROM spotify.spotify_music_analysis
+    WHERE decade IS NOT NULL
+    GROUP BY decade, mood
+    """,
+    """
+    CREATE TABLE spotify.spotify_decade_key_mode AS
+    SELECT decade, key_description, modality_description, COUNT(*) AS track_count, SUM(valence) AS sum_valence
+    FROM spotify.spotify_music_analysis
+    WHERE decade IS NOT NULL
+    GROUP BY decade, key_description, modality_description
+    """,
+    """
+    CREATE TABLE spotify.spotify_decade_artist AS
+    SELECT decade, primary_artist, COUNT(*) AS track_count, SUM(danceability) AS sum_danceability,
+           SUM(energy) AS sum_energy, SUM(valence) AS sum_valence
+    FROM spotify.spotify_music_analysis
+    WHERE decade IS NOT NULL
+    GROUP BY decade, primary_artist
+    """,
+    f"""
+    CREATE TABLE spotify.spotify_track_sample AS
+    SELECT song_id, sample_bucket, decade, release_year, danceability, energy, acousticness, valence, tempo, mood
+    FROM spotify.spotify_music_analysis
+    WHERE decade IS NOT NULL
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY decade ORDER BY sample_bucket, song_id) <= {DEFAULT_SAMPLE_SIZE}
+    """,
+    f"""
+    CREATE TABLE spotify.spotify_decade_moments AS
+    SELECT decade, COUNT(*) AS track_count, {", ".join(f"SUM({expr}) AS {column}" for column, expr in moment_columns().items())}
+    FROM (
+        SELECT decade, danceability, energy, acousticness, valence, tempo / 200 AS tempo_scaled
+        FROM spotify.spotify_music_analysis
+        WHERE decade IS NOT NULL
+    )
+    GROUP BY decade
+    """,
+]
+
+
+# Low-cardinality string columns of the dashboard frames, held as pandas categoricals
+CATEGORY_COLUMNS = ("decade", "mood", "key_description", "modality_description")
+
+
+def compact_frame(table: pa.Table) -> pd.DataFrame:
+    """
+    Converts a query result to a compact DataFrame.
+
+    Columns of CATEGORY_COLUMNS are dictionary-encoded into categoricals with sorted categories,
+    so sorting by them stays alphabetical. Float columns are downcast to float32, except the
+    sum_ columns of the rollups: they are inputs to further arithmetic (averages, correlations)
+    and keep full precision. Integer decimals become int64. The conversions happen in Arrow,
+    before the frame is built.
+    """
+    columns = []
+    for field, column in zip(table.schema, table.columns):
+        if field.name in CATEGORY_COLUMNS and pa.types.is_string(field.type):
+            column = column.dictionary_encode()
+        elif pa.types.is_float64(field.type) and not field.name.startswith("sum_"):
+            column = column.cast(pa.float32())
+        elif pa.types.is_decimal(field.type):
+            # DuckDB sums integers as HUGEINT, which Arrow returns as decimals
+            column = column.cast(pa.int64() if field.type.scale == 0 else pa.float64())
+        columns.append(column)
+    df = pa.table(columns, names=table.column_names).to_pandas()
+
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].cat.reorder_categories(sorted(df[column].cat.categories))
+    return df
+
+
+class BigQueryBackend:
+    """Runs dashboard queries on BigQuery against the dbt models."""
+
+    name = "BigQuery"
+
+    def __init__(
+            self,
+            project_id: str = "data-engineering-spotify",
+            dataset: str = DASHBOARD_DATASET,
+            metadata_ttl: float = 60
+    ):
+        from google.cloud import bigquery
+
+        self.client = bigquery.Client(project=project_id)
+        self.dataset = dataset
+        self.metadata_ttl = metadata_ttl
+        self._modified = {}
+        self._modified_lock = threading.Lock()
+
+    def query_arrow(
+            self,
+            sql: str,
+            params: Optional[Dict[str, Any]] = None,
+            attributes: Optional[Dict[str, Any]] = None
+    ) -> pa.Table:
+        """
+        Runs a query with its @name parameters bound to `params` (lists bind as ARRAY<STRING>).
+
+        Results are streamed as Arrow record batches through the BigQuery Storage Read API when
+        google-cloud-bigquery-storage is installed, and read through the REST API otherwise. The
+        job's statistics (bytes billed and processed, slot-ms, BigQuery cache hit) are added to
+        `attributes` when it is given.
+        """
+        from google.cloud import bigquery
+
+        job_config = bigquery.QueryJobConfig(query_parameters=bigquery_parameters(sql, params))
+        job = self.client.query(sql, job_config=job_config)
+        table = job.to_arrow()
+        if attributes is not None:
+            attributes.update(
+                job_id=job.job_id,
+                bytes_billed=job.total_bytes_billed,
+                bytes_processed=job.total_bytes_processed,
+                slot_ms=job.slot_millis,
+                bigquery_cache_hit=job.cache_hit
+            )
+        return table
+
+    def query(
+            self,
+            sql: str,
+            params: Optional[Dict[str, Any]] = None,
+            attributes: Optional[Dict[str, Any]] = None
+    ) -> pd.DataFrame:
+        return compact_frame(self.query_arrow(sql, params, attributes))
+
+    def _table_modified(self, table: str) -> str:
+        # Table metadata is re-read at most every `metadata_ttl` seconds
+        with self._modified_lock:
+            cached = self._modified.get(table)
+            if cached and time.monotonic() - cached[0] < self.metadata_ttl:
+                return cached[1]
+        modified = self.client.get_table(f"{self.dataset}.{table}").modified.isoformat()
+        with self._modified_lock:
+            self._modified[table] = (time.monotonic(), modified)
+        return modified
+
+    def source_version(self, sql: str) -> str:
+        """Returns the last-modified times of the tables a query reads, so cached results expire on a rebuild."""
+        return ",".join(
+            f"{table}@{self._table_modified(table)}" for table in referenced_tables(sql, self.dataset)
+        )
+
+
+class DuckDBBackend:
+    """
+    Runs dashboard queries locally with DuckDB over the Parquet output of convert_csv_to_parquet.
+
+    The analysis model is a view over the Parquet file (or Hive-partitioned directory) and the
+    rollup models are materialized in memory when the engine starts, so panel queries need no
+    network access.
+    """
+
+    name = "local DuckDB"
+    dataset = "spotify"
+
+    def __init__(self, parquet_path: str):
+        import duckdb
+
+        if os.path.isdir(parquet_path):
+            source = f"read_parquet('{os.path.join(parquet_path, '**', '*.parquet')}', hive_partitioning = true)"
+            files = glob.glob(os.path.join(parquet_path, "**", "*.parquet"), recursive=True)
+        elif os.path.exists(parquet_path):
+            source = f"read_parquet('{parquet_path}')"
+            files = [parquet_path]
+        else:
+            raise FileNotFoundError(f"Parquet data not found at {parquet_path}")
+
+        # The rollups are built once from the files present now, so their state is the version
+        self.version = f"{os.path.abspath(parquet_path)}@{len(files)}:{max((os.stat(f).st_mtime_ns for f in files), default=0)}"
+
+        self.con = duckdb.connect()
+        self.con.execute("CREATE SCHEMA spotify")
+        self.con.execute(f"CREATE VIEW spotify.cleaned_tracks_features AS SELECT * FROM {source}")
+        self.con.execute(LOCAL_ANALYSIS_SQL)
+        for sql in LOCAL_ROLLUP_SQL:
+            self.con.execute(sql)
+
+    def execute(self, sql: str, params: Optional[Dict[str, Any]] = None) -> "duckdb.DuckDBPyConnection":
+        """Runs a dashboard query written for BigQuery on a new cursor and returns the cursor to fetch from."""
+        # BigQuery quotes `project.dataset.table` paths with backticks; DuckDB uses plain schema.table
+        sql = sql.replace("`", "")
+        # BigQuery binds @name parameters and tests array membership with IN UNNEST(...); DuckDB binds
+        # $name parameters and needs a subquery to unnest a list
+        sql = re.sub(r"IN UNNEST\((@\w+)\)", r"IN (SELECT UNNEST(\1))", sql)
+        params = bound_params(sql, params)
+        sql = re.sub(r"@(\w+)", r"$\1", sql)
+        return self.con.cursor().execute(sql, params)
+
+    def query_arrow(
+            self,
+            sql: str,
+            params: Optional[Dict[str, Any]] = None,
+            attributes: Optional[Dict[str, Any]] = None
+    ) -> pa.Table:
+        # Local queries are not billed, so there are no job statistics to add to `attributes`
+        return self.execute(sql, params).fetch_arrow_table()
+
+    def query(
+            self,
+            sql: str,
+            params: Optional[Dict[str, Any]] = None,
+            attributes: Optional[Dict[str, Any]] = None
+    ) -> pd.DataFrame:
+        return compact_frame(self.query_arrow(sql, params, attributes))
+
+    def source_version(self, sql: str) -> str:
+        return self.version
+
+
+def referenced_tables(sql: str, dataset: str) -> List[str]:
+    """Returns the tables of `dataset` a query reads (e.g., ['spotify_decade_features'])."""
+    return sorted(set(re.findall(rf"{re.escape(dataset)}\.(\w+)", sql)))
+
+
+def bound_params(sql: str, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Returns the parameters a query references as @name; engines reject unused named parameters."""
+    names = set(re.findall(r"@(\w+)", sql))
+    return {name: value for name, value in (params or {}).items() if name in names}
+
+
+def bigquery_parameters(sql: str, params: Optional[Dict[str, Any]]) -> list:
+    """Converts the parameters a query references to BigQuery query parameters."""
+    from google.cloud import bigquery
+
+    return [
+        bigquery.ArrayQueryParameter(name, "STRING", list(value)) if isinstance(value, (list, tuple))
+        else bigquery.ScalarQueryParameter(name, "INT64" if isinstance(value, int) else "STRING", value)
+        for name, value in bound_params(sql, params).items()
+    ]
+
+
+def create_backend():
+    """
+    Creates the query engine selected by the SPOTIFY_DASHBOARD_BACKEND environment variable.
+
+    - 'bigquery' (default): BigQuery with application default credentials
+    - 'local':              DuckDB over SPOTIFY_PARQUET_PATH (default 'cleaned_tracks_features.parquet')
+    """
+    backend = os.environ.get("SPOTIFY_DASHBOARD_BACKEND", "bigquery").lower()
+    if backend == "local":
+        return DuckDBBackend(os.environ.get("SPOTIFY_PARQUET_PATH", "cleaned_tracks_features.parquet"))
+    if backend == "bigquery":
+        return BigQueryBackend()
+    raise ValueError(f"Unknown SPOTIFY_DASHBOARD_BACKEND {backend!r}; expected 'bigquery' or 'local'")
+
+
+class QueryResult(NamedTuple):
+    """Outcome of one panel query; failed queries carry the error and an empty frame."""
+    df: pd.DataFrame
+    seconds: float
+    error: Optional[Exception] = None
+    # What the query recorded about itself (result cache hit, bytes billed, ...)
+    attributes: Dict[str, Any] = {}
+
+
+def run_queries(
+        run: Callable[[Any, Dict[str, Any]], pd.DataFrame],
+        queries: Dict[str, Any],
+        max_workers: Optional[int] = None
+) -> Dict[str, QueryResult]:
+    """
+    Runs independent queries concurrently and gathers their results.
+
+    A failing query does not cancel the others: its result holds the error and an empty frame,
+    so the caller can still render every panel whose query succeeded. Every query is traced as
+    a `dashboard.<name>` span (see scripts/tracing.py), nested under one `dashboard.queries` span.
+
+    :param run:         Function executing one query as run(query, attributes); it may add what it
+                        measures (e.g., cache hit, bytes billed) to `attributes`
+    :param queries:     Queries to run (usually SQL strings), keyed by panel name
+    :param max_workers: Maximum concurrent queries (defaults to one thread per query)
+    :return:            Result of each query, keyed by panel name
+    """
+    parent = Span("dashboard.queries", queries=len(queries))
+
+    def timed(name: str, query: Any) -> QueryResult:
+        attributes = {}
+        query_span = Span(f"dashboard.{name}", parent)
+        start = time.perf_counter()
+        try:
+            result = QueryResult(run(query, attributes), time.perf_counter() - start, attributes=attributes)
+        except Exception as e:
+            result = QueryResult(pd.DataFrame(), time.perf_counter() - start, e, attributes)
+        query_span.set(**attributes, rows=len(result.df), memory_bytes=int(result.df.memory_usage(deep=True).sum()))
+        query_span.end(result.error)
+        export(query_span)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers or max(len(queries), 1)) as executor:
+        futures = {name: executor.submit(timed, name, query) for name, query in queries.items()}
+        results = {name: future.result() for name, future in futures.items()}
+
+    parent.set(
+        failed=sum(result.error is not None for result in results.values()),
+        cache_hits=sum(bool(result.attributes.get("cache_hit")) for result in results.values()),
+    )
+    parent.end()
+    export(parent)
+    return results
@@ -0,0 +1,105 @@
+"""Derives the aggregate dashboard panels from the per-decade rollups, without a query per selection."""
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from queries import CORR_FEATURES, moment_columns
+
+
+def _select(rollup: pd.DataFrame, decades: List[str]) -> pd.DataFrame:
+    # An empty selection keeps every decade, like DECADES_FILTER
+    rollup = rollup[rollup["decade"].notna()]
+    rollup = rollup[rollup["decade"].isin(decades)] if decades else rollup
+    # Categorical columns (see compact_frame) only keep the categories of the selected rows
+    return rollup.assign(**{
+        column: rollup[column].cat.remove_unused_categories() for column in rollup.select_dtypes("category")
+    })
+
+
+def features_panel(rollup: pd.DataFrame, decades: List[str]) -> pd.DataFrame:
+    # Averages are recombined from per-decade sums and counts, as in features_query, and held as
+    # float32 like every other non-sum float column (see compact_frame)
+    df = _select(rollup, decades).groupby("decade", as_index=False, observed=True).sum(numeric_only=True)
+    for feature in ["danceability", "energy", "valence", "acousticness"]:
+        df[f"avg_{feature}"] = (df[f"sum_{feature}"] / df["track_count"]).astype("float32")
+    return df.sort_values("decade")[
+        ["decade", "avg_danceability", "avg_energy", "avg_valence", "avg_acousticness", "track_count"]
+    ].reset_index(drop=True)
+
+
+def mood_panel(rollup: pd.DataFrame, decades: List[str]) -> pd.DataFrame:
+    return _select(rollup, decades).sort_values(["decade", "mood"])[
+        ["decade", "mood", "track_count"]
+    ].reset_index(drop=True)
+
+
+def key_panel(rollup: pd.DataFrame, decades: List[str]) -> pd.DataFrame:
+    df = _select(rollup, decades).groupby(
+        ["key_description", "modality_description"], as_index=False, observed=True
+    )[["track_count", "sum_valence"]].sum()
+    df["avg_valence"] = (df["sum_valence"] / df["track_count"]).astype("float32")
+    return df.sort_values("track_count", ascending=False)[
+        ["key_description", "modality_description", "track_count", "avg_valence"]
+    ].reset_index(drop=True)
+
+
+def artist_panel(rollup: pd.DataFrame, decades: List[str]) -> pd.DataFrame:
+    df = _select(rollup, decades).copy()
+    for feature in ["danceability", "energy", "valence"]:
+        df[f"avg_{feature}"] = (df[f"sum_{feature}"] / df["track_count"]).astype("float32")
+    return df.sort_values(["decade", "track_count", "primary_artist"], ascending=[True, False, True])[
+        ["decade", "primary_artist", "track_count", "avg_danceability", "avg_energy", "avg_valence"]
+    ].reset_index(drop=True)
+
+
+def corr_panel(rollup: pd.DataFrame, decades: List[str]) -> pd.DataFrame:
+    # Totals the moment sums of the selected decades into one row, like corr_query
+    totals = _select(rollup, decades)[["track_count", *moment_columns()]].sum()
+    return totals.to_frame().T
+
+
+def correlation_matrix(moments: pd.DataFrame) -> pd.DataFrame:
+    """
+    Computes the exact Pearson correlations of CORR_FEATURES over every selected track from the
+    moment sums of corr_query (or corr_panel): cov(x, y) = sum_x_x_y / n - sum_x * sum_y / n².
+    """
+    totals = moments.sum(numeric_only=True)
+    n = totals["track_count"]
+    means = np.array([totals[f"sum_{x}"] for x in CORR_FEATURES]) / n
+    products = np.array([
+        [totals[f"sum_{x}_x_{y}" if i <= j else f"sum_{y}_x_{x}"] for j, y in enumerate(CORR_FEATURES)]
+        for i, x in enumerate(CORR_FEATURES)
+    ]) / n
+    covariance = products - np.outer(means, means)
+    stddev = np.sqrt(np.diag(covariance))
+    return pd.DataFrame(covariance / np.outer(stddev, stddev), index=CORR_FEATURES, columns=CORR_FEATURES)
+
+
+def density_grids(density: pd.DataFrame, decades: List[str], bins: int) -> Tuple[List[str], np.ndarray]:
+    """
+    Sums the 2D histograms of density_query over the selected decades into one grid of track
+    counts per mood.
+
+    :return: The moods, and the counts of shape (moods, bins, bins) indexed by mood, y bin and x bin
+    """
+    df = _select(density, decades)
+    df = df[df["mood"].notna()]
+    moods = sorted(df["mood"].unique())
+    grids = np.zeros((len(moods), bins, bins), dtype=np.int64)
+    np.add.at(
+        grids,
+        (pd.Categorical(df["mood"], categories=moods).codes, df["y_bin"].to_numpy(), df["x_bin"].to_numpy()),
+        df["track_count"].to_numpy()
+    )
+    return moods, grids
+
+
+# Same panel names and result columns as panel_queries, for the rollups of rollup_queries
+PANEL_BUILDERS: Dict[str, Callable[[pd.DataFrame, List[str]], pd.DataFrame]] = {
+    "features": features_panel,
+    "mood": mood_panel,
+    "key": key_panel,
+    "corr": corr_panel,
+    "artist": artist_panel,
+}
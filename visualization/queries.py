@@ -0,0 +1,283 @@
+"""SQL queries behind each panel of the Spotify dashboard."""
+from typing import Any, Dict, List
+
+# dbt dataset holding spotify_music_analysis and its rollup models
+DASHBOARD_DATASET = "data-engineering-spotify.dbt_spotify"
+
+
+# Audio features of the correlation matrix; keep in sync with models/spotify/spotify_decade_moments.sql
+CORR_FEATURES = ["danceability", "energy", "acousticness", "valence", "tempo_scaled"]
+
+# Audio features the tracks like this panel compares, each on a roughly 0-1 scale (see similarity_query)
+SIMILARITY_FEATURES = ["danceability", "energy", "acousticness", "valence", "tempo_scaled", "speechiness",
+                       "instrumentalness", "liveness", "loudness_scaled"]
+
+# Tracks in the feature scatter plot; exact up to the sample_per_decade var of the dbt project
+DEFAULT_SAMPLE_SIZE = 5000
+
+# Axes of the feature density plot: the SQL expression of each feature and the value range its
+# bins span. Values outside the range are counted in the edge bins.
+DENSITY_FEATURES = {
+    "energy": ("energy", (0.0, 1.0)),
+    "danceability": ("danceability", (0.0, 1.0)),
+    "acousticness": ("acousticness", (0.0, 1.0)),
+    "valence": ("valence", (0.0, 1.0)),
+    "tempo_scaled": ("tempo/200", (0.0, 1.25)),
+}
+
+# Bins per axis of the feature density plot
+DEFAULT_DENSITY_BINS = 50
+
+# Artists per decade in the top artists panels
+DEFAULT_TOP_ARTISTS = 3
+
+
+def moment_columns() -> Dict[str, str]:
+    """
+    Returns the columns of spotify_decade_moments after track_count, mapped to the expression they
+    sum: sum_x for every feature, then sum_x_x_y for x <= y.
+    """
+    columns = {f"sum_{x}": x for x in CORR_FEATURES}
+    columns.update({f"sum_{x}_x_{y}": f"{x} * {y}" for i, x in enumerate(CORR_FEATURES) for y in CORR_FEATURES[i:]})
+    return columns
+
+
+# Selection filters use bound query parameters (see decades_params), so the SQL text of every
+# panel is the same whatever the selection and engines can reuse its plan and cached results.
+# An empty @decades array selects every decade.
+DECADES_FILTER = "AND (ARRAY_LENGTH(@decades) = 0 OR decade IN UNNEST(@decades))"
+
+
+def decades_params(selected_decades: List[str]) -> Dict[str, Any]:
+    """Returns the query parameters of DECADES_FILTER for the selected decades."""
+    return {"decades": list(selected_decades)}
+
+
+def panel_params(
+        selected_decades: List[str],
+        sample_size: int = None,
+        top_artists: int = None,
+        density_bins: int = None
+) -> Dict[str, Any]:
+    """
+    Returns the query parameters of the panel queries: the decade selection, scatter sample size,
+    top artists per decade and bins per axis of the density plot.
+    """
+    return {
+        **decades_params(selected_decades),
+        "sample_size": sample_size or DEFAULT_SAMPLE_SIZE,
+        "top_artists": top_artists or DEFAULT_TOP_ARTISTS,
+        "density_bins": density_bins or DEFAULT_DENSITY_BINS,
+    }
+
+
+def decades_query(dataset: str = DASHBOARD_DATASET) -> str:
+    return f"""
+    SELECT decade
+    FROM `{dataset}.spotify_decade_features`
+    ORDER BY decade
+    """
+
+
+def features_query(dataset: str = DASHBOARD_DATASET) -> str:
+    # Averages are recombined from per-decade sums and counts
+    return f"""
+    SELECT
+        decade,
+        SUM(sum_danceability) / SUM(track_count) as avg_danceability,
+        SUM(sum_energy) / SUM(track_count) as avg_energy,
+        SUM(sum_valence) / SUM(track_count) as avg_valence,
+        SUM(sum_acousticness) / SUM(track_count) as avg_acousticness,
+        SUM(track_count) as track_count
+    FROM `{dataset}.spotify_decade_features`
+    WHERE decade IS NOT NULL {DECADES_FILTER}
+    GROUP BY decade
+    ORDER BY decade
+    """
+
+
+def mood_query(dataset: str = DASHBOARD_DATASET) -> str:
+    return f"""
+    SELECT
+        decade,
+        mood,
+        track_count
+    FROM `{dataset}.spotify_decade_mood`
+    WHERE decade IS NOT NULL {DECADES_FILTER}
+    ORDER BY decade, mood
+    """
+
+
+def key_query(dataset: str = DASHBOARD_DATASET) -> str:
+    return f"""
+    SELECT
+        key_description,
+        modality_description,
+        SUM(track_count) as track_count,
+        SUM(sum_valence) / SUM(track_count) as avg_valence
+    FROM `{dataset}.spotify_decade_key_mode`
+    WHERE decade IS NOT NULL {DECADES_FILTER}
+    GROUP BY key_description, modality_description
+    ORDER BY track_count DESC
+    """
+
+
+def corr_query(dataset: str = DASHBOARD_DATASET) -> str:
+    # Moment sums of the whole selection; panels.correlation_matrix turns them into exact correlations
+    sums = ",\n        ".join(f"SUM({column}) as {column}" for column in moment_columns())
+    return f"""
+    SELECT
+        SUM(track_count) as track_count,
+        {sums}
+    FROM `{dataset}.spotify_decade_moments`
+    WHERE decade IS NOT NULL {DECADES_FILTER}
+    """
+
+
+def sample_query(dataset: str = DASHBOARD_DATASET) -> str:
+    # Get a deterministic sample of tracks for the scatter plot: the tracks with the lowest sample buckets
+    return f"""
+    SELECT
+        danceability,
+        energy,
+        acousticness,
+        valence,
+        tempo/200 as tempo_scaled,  -- Scale tempo to 0-1 range (assuming max tempo around 200)
+        mood
+    FROM `{dataset}.spotify_track_sample`
+    WHERE decade IS NOT NULL {DECADES_FILTER}
+    ORDER BY sample_bucket, song_id
+    LIMIT @sample_size
+    """
+
+
+def _density_bin(feature: str) -> str:
+    # Bin number (0 to @density_bins - 1) of a feature within its DENSITY_FEATURES range
+    expression, (low, high) = DENSITY_FEATURES[feature]
+    return (f"CAST(LEAST(GREATEST(FLOOR(({expression} - {low}) / {high - low} * @density_bins), 0), "
+            f"@density_bins - 1) AS INT64)")
+
+
+def density_query(x_feature: str, y_feature: str, dataset: str = DASHBOARD_DATASET) -> str:
+    """
+    Returns the 2D histogram of two DENSITY_FEATURES over every track, split by decade and mood.
+
+    The tracks are binned and counted in the query engine, so the result has at most
+    decades x moods x @density_bins² rows however many tracks match; panels.density_grids
+    sums the selected decades into one grid per mood.
+    """
+    x_expression, _ = DENSITY_FEATURES[x_feature]
+    y_expression, _ = DENSITY_FEATURES[y_feature]
+    return f"""
+    SELECT
+        decade,
+        mood,
+        {_density_bin(x_feature)} as x_bin,
+        {_density_bin(y_feature)} as y_bin,
+        COUNT(*) as track_count
+    FROM `{dataset}.spotify_music_analysis`
+    WHERE decade IS NOT NULL AND {x_expression} IS NOT NULL AND {y_expression} IS NOT NULL {DECADES_FILTER}
+    GROUP BY decade, mood, x_bin, y_bin
+    """
+
+
+def artist_query(dataset: str = DASHBOARD_DATASET) -> str:
+    # Query to get the top artists of each decade; only those rows are transferred
+    return f"""
+    SELECT
+        decade,
+        primary_artist,
+        track_count,
+        sum_danceability / track_count as avg_danceability,
+        sum_energy / track_count as avg_energy,
+        sum_valence / track_count as avg_valence
+    FROM `{dataset}.spotify_decade_artist`
+    WHERE track_count > 5 {DECADES_FILTER}  -- Only include artists with more than 5 tracks
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY decade ORDER BY track_count DESC, primary_artist) <= @top_artists
+    ORDER BY decade, track_count DESC, primary_artist
+    """
+
+
+def similarity_query(dataset: str = DASHBOARD_DATASET) -> str:
+    # Feature vectors of every track for the similarity index (see similarity.py); tempo and
+    # loudness are scaled to about 0-1 like the other features, so no feature dominates the distances
+    return f"""
+    SELECT
+        song_id,
+        name,
+        primary_artist,
+        decade,
+        danceability,
+        energy,
+        acousticness,
+        valence,
+        tempo/200 as tempo_scaled,
+        speechiness,
+        instrumentalness,
+        liveness,
+        (loudness + 60)/60 as loudness_scaled
+    FROM `{dataset}.spotify_music_analysis`
+    WHERE danceability IS NOT NULL AND energy IS NOT NULL AND acousticness IS NOT NULL AND valence IS NOT NULL
+        AND tempo IS NOT NULL AND speechiness IS NOT NULL AND instrumentalness IS NOT NULL
+        AND liveness IS NOT NULL AND loudness IS NOT NULL
+    """
+
+
+# Panels whose result rows are keyed by decade: any decade selection is a row filter of the
+# all-decades result, so the result cache answers every selection from one entry
+DECADE_KEYED_PANELS = ("features", "mood", "artist", "density")
+
+
+def panel_queries(dataset: str = DASHBOARD_DATASET) -> Dict[str, str]:
+    """Returns the independent queries behind the dashboard panels, keyed by panel name; run them with panel_params."""
+    return {
+        "features": features_query(dataset),
+        "mood": mood_query(dataset),
+        "key": key_query(dataset),
+        "corr": corr_query(dataset),
+        "sample": sample_query(dataset),
+        "artist": artist_query(dataset),
+    }
+
+
+def dashboard_queries(dataset: str = DASHBOARD_DATASET) -> Dict[str, str]:
+    """Returns every dashboard query, keyed by panel name; the density plot is at its default axes."""
+    return {
+        "decades": decades_query(dataset),
+        **panel_queries(dataset),
+        "density": density_query(*list(DENSITY_FEATURES)[:2], dataset),
+    }
+
+
+def rollup_queries(dataset: str = DASHBOARD_DATASET) -> Dict[str, str]:
+    """
+    Returns the per-decade sums and counts behind the aggregate panels (all but the scatter sample),
+    keyed by panel name.
+
+    With client-side filtering the dashboard fetches these once, for every decade, and derives
+    the panels for each selection in pandas (see panels.py).
+    """
+    return {
+        "features": f"""
+        SELECT decade, track_count, sum_danceability, sum_energy, sum_valence, sum_acousticness
+        FROM `{dataset}.spotify_decade_features`
+        """,
+        "mood": f"""
+        SELECT decade, mood, track_count
+        FROM `{dataset}.spotify_decade_mood`
+        """,
+        "key": f"""
+        SELECT decade, key_description, modality_description, track_count, sum_valence
+        FROM `{dataset}.spotify_decade_key_mode`
+        """,
+        "corr": f"""
+        SELECT decade, track_count, {", ".join(moment_columns())}
+        FROM `{dataset}.spotify_decade_moments`
+        """,
+        "artist": f"""
+        SELECT decade, primary_artist, track_count, sum_danceability, sum_energy, sum_valence
+        FROM `{dataset}.spotify_decade_artist`
+        WHERE track_count > 5  -- Only include artists with more than 5 tracks
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY decade ORDER BY track_count DESC, primary_artist) <= @top_artists
+        """,
+    }
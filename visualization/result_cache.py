@@ -0,0 +1,150 @@
+"""On-disk cache of dashboard query results, shared by every session, process and replica."""
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Callable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DEFAULT_CACHE_DIR = ".dashboard_cache"
+DEFAULT_MAX_MB = 512
+
+# Parquet schema metadata key holding the source version a result was computed from
+_VERSION_KEY = b"spotify_source_version"
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapses whitespace and drops SQL line comments, so formatting changes do not miss the cache."""
+    sql = re.sub(r"--[^\n]*", "", sql)
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+class ResultCache:
+    """
+    Stores query results as Parquet files under `cache_dir`, keyed on the normalized SQL and its
+    parameters.
+
+    Each result records the version (last-modified time) of its source tables; a lookup with a
+    different version deletes the entry instead of returning it. Hits refresh the file's mtime, and
+    the least recently used files are evicted once the directory grows past `max_bytes`.
+
+    Entries are written to a temporary file and renamed into place, so several processes can
+    share one directory (e.g., a volume mounted by every dashboard replica).
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._evict_lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, sql: str, params: Optional[dict]) -> str:
+        key = json.dumps({"sql": normalize_sql(sql), "params": params or {}}, sort_keys=True, default=str)
+        return os.path.join(self.cache_dir, f"{hashlib.sha256(key.encode()).hexdigest()}.parquet")
+
+    def get(self, sql: str, version: str, params: Optional[dict] = None) -> Optional[pd.DataFrame]:
+        """Returns the cached result of a query, or None if it is missing or was computed from another version."""
+        path = self._path(sql, params)
+        try:
+            table = pq.read_table(path)
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+
+        if (table.schema.metadata or {}).get(_VERSION_KEY) != version.encode():
+            self._remove(path)
+            return None
+
+        try:
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            pass
+        return table.to_pandas()
+
+    def put(self, sql: str, version: str, df: pd.DataFrame, params: Optional[dict] = None) -> None:
+        """Stores a query result and evicts the least recently used results if the cache is full."""
+        path = self._path(sql, params)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), _VERSION_KEY: version.encode()})
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def fetch(
+            self,
+            sql: str,
+            run: Callable[[str, Optional[dict]], pd.DataFrame],
+            version: str,
+            params: Optional[dict] = None
+    ) -> pd.DataFrame:
+        """Returns the cached result of a query, running it as run(sql, params) and caching it on a miss."""
+        df = self.get(sql, version, params)
+        if df is None:
+            df = run(sql, params)
+            self.put(sql, version, df, params)
+        return df
+
+    def fetch_decades(
+            self,
+            all_decades_sql: str,
+            run: Callable[[str, Optional[dict]], pd.DataFrame],
+            version: str,
+            decades: List[str],
+            params: Optional[dict] = None
+    ) -> pd.DataFrame:
+        """
+        Answers a decade selection from the cached result of a query over all decades.
+
+        Only valid for queries whose rows are keyed by a `decade` column (see DECADE_KEYED_PANELS),
+        so that the selection is a row filter of the all-decades result. Every selection then
+        shares one cache entry and one query. An empty selection returns every decade, like
+        DECADES_FILTER; `params` must select every decade (see decades_params).
+        """
+        df = self.fetch(all_decades_sql, run, version, params)
+        if not decades:
+            return df
+        return df[df["decade"].isin(decades)].reset_index(drop=True)
+
+    def evict(self) -> None:
+        """Deletes the least recently used results until the cache fits in `max_bytes`."""
+        with self._evict_lock:
+            entries = []
+            for path in glob.glob(os.path.join(self.cache_dir, "*.parquet")):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def create_result_cache() -> ResultCache:
+    """
+    Creates the result cache configured by the environment:
+
+    - SPOTIFY_CACHE_DIR:    cache directory (default '.dashboard_cache'); point every replica at the same volume to share it
+    - SPOTIFY_CACHE_MAX_MB: size bound before least recently used results are evicted (default 512)
+    """
+    return ResultCache(
+        os.environ.get("SPOTIFY_CACHE_DIR", DEFAULT_CACHE_DIR),
+        int(os.environ.get("SPOTIFY_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024
+    )
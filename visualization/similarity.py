@@ -0,0 +1,252 @@
+"""Nearest-neighbour index over the audio features of every track, behind the tracks like this panel."""
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from queries import SIMILARITY_FEATURES, similarity_query
+
+DEFAULT_INDEX_PATH = "similarity_index"
+
+# Lists scanned per query; more lists raise the recall of search at a proportional cost
+DEFAULT_NPROBE = 16
+
+# Neighbours shown in the tracks like this panel
+DEFAULT_SIMILAR_TRACKS = 10
+
+# k-means is trained on this many points per list (at most), for this many iterations
+_TRAIN_POINTS_PER_LIST = 64
+_KMEANS_ITERATIONS = 10
+
+# Rows per block when assigning vectors to lists, and distances per block of search_exact
+_BLOCK_ROWS = 16384
+_BLOCK_DISTANCES = 4 * 1024 * 1024
+
+
+def _squared_distances(queries: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    # All pairwise squared distances in one matrix product: |q|² - 2 q·v + |v|²
+    distances = (queries * queries).sum(axis=1)[:, None] - 2 * queries @ vectors.T + (vectors * vectors).sum(axis=1)
+    return np.maximum(distances, 0)
+
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # argmin |v - c|² = argmax v·c - |c|²/2, since |v|² is the same for every centroid
+    half_norms = (centroids * centroids).sum(axis=1) / 2
+    labels = []
+    for start in range(0, len(vectors), _BLOCK_ROWS):
+        scores = vectors[start:start + _BLOCK_ROWS] @ centroids.T
+        scores -= half_norms
+        labels.append(scores.argmax(axis=1))
+    return np.concatenate(labels)
+
+
+def _kmeans(vectors: np.ndarray, lists: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    sample = vectors[np.sort(rng.choice(len(vectors), min(len(vectors), lists * _TRAIN_POINTS_PER_LIST), replace=False))]
+    centroids = sample[rng.choice(len(sample), lists, replace=False)]
+    for _ in range(_KMEANS_ITERATIONS):
+        labels = _nearest_centroids(sample, centroids)
+        counts = np.bincount(labels, minlength=lists)
+        sums = np.stack([np.bincount(labels, sample[:, i], minlength=lists) for i in range(sample.shape[1])], axis=1)
+        # An empty list keeps its centroid
+        filled = counts > 0
+        centroids[filled] = (sums[filled] / counts[filled, None]).astype(np.float32)
+    return centroids
+
+
+def _top_k(distances: np.ndarray, k: int) -> np.ndarray:
+    # Positions of the k smallest distances of every row, nearest first
+    if distances.shape[1] > k:
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(distances.shape[1]), distances.shape)
+    order = np.take_along_axis(distances, top, axis=1).argsort(axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1)
+
+
+class SimilarityIndex:
+    """
+    Inverted-file index over the SIMILARITY_FEATURES vectors of every track of spotify_music_analysis.
+
+    The vectors are clustered with k-means into about sqrt(n) lists and stored grouped by list
+    in one float32 array, so the vectors of a list are a contiguous slice. search scores the
+    queries against the list centroids, then only against the vectors of their `nprobe` nearest
+    lists: a few thousand distances instead of one per track. search_exact scores every vector.
+
+    Saved indexes are memory-mapped on load: opening one takes milliseconds, and every dashboard
+    process on a host shares the same pages.
+    """
+
+    def __init__(
+            self,
+            vectors: np.ndarray,
+            centroids: np.ndarray,
+            offsets: np.ndarray,
+            tracks: pa.Table,
+            metadata: Optional[Dict[str, Any]] = None
+    ):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.offsets = offsets
+        self.tracks = tracks
+        self.metadata = metadata or {}
+
+    @classmethod
+    def build(
+            cls,
+            df: pd.DataFrame,
+            lists: Optional[int] = None,
+            seed: int = 0,
+            metadata: Optional[Dict[str, Any]] = None
+    ) -> "SimilarityIndex":
+        """
+        Builds the index from the result of similarity_query.
+
+        :param df:       One row per track: song_id, name, primary_artist, decade and SIMILARITY_FEATURES
+        :param lists:    Number of k-means lists (defaults to sqrt of the number of tracks)
+        :param seed:     Seed of the k-means sample and initial centroids, so builds are reproducible
+        :param metadata: Saved with the index (e.g., the source and its version)
+        """
+        vectors = np.ascontiguousarray(df[SIMILARITY_FEATURES].to_numpy(dtype=np.float32))
+        lists = min(lists or max(1, int(np.sqrt(len(vectors)))), len(vectors))
+        centroids = _kmeans(vectors, lists, seed)
+        labels = _nearest_centroids(vectors, centroids)
+
+        order = np.argsort(labels, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=lists))])
+        tracks = pa.Table.from_pandas(
+            df.drop(columns=SIMILARITY_FEATURES).iloc[order].reset_index(drop=True), preserve_index=False
+        )
+        return cls(vectors[order], centroids, offsets, tracks, {
+            **(metadata or {}), "features": SIMILARITY_FEATURES, "tracks": len(vectors), "lists": lists
+        })
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), self.vectors)
+        np.save(os.path.join(path, "centroids.npy"), self.centroids)
+        np.save(os.path.join(path, "offsets.npy"), self.offsets)
+        pq.write_table(self.tracks, os.path.join(path, "tracks.parquet"))
+        with open(os.path.join(path, "index.json"), "w") as f:
+            json.dump(self.metadata, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "SimilarityIndex":
+        with open(os.path.join(path, "index.json")) as f:
+            metadata = json.load(f)
+        if metadata.get("features") != SIMILARITY_FEATURES:
+            raise ValueError(f"The similarity index at {path} was built from other features; rebuild it")
+        return cls(
+            np.load(os.path.join(path, "vectors.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, "centroids.npy")),
+            np.load(os.path.join(path, "offsets.npy")),
+            pq.read_table(os.path.join(path, "tracks.parquet")),
+            metadata
+        )
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def search(self, queries: np.ndarray, k: int = DEFAULT_SIMILAR_TRACKS, nprobe: int = DEFAULT_NPROBE) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the (approximate) k nearest tracks of each query vector.
+
+        :param queries: Vectors of SIMILARITY_FEATURES, one per row
+        :return:        Euclidean distances and track positions, each of shape (queries, k), nearest
+                        first; positions are -1 (at an infinite distance) when fewer tracks were scored
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        nprobe = min(nprobe, len(self.centroids))
+        probed = _top_k(_squared_distances(queries, self.centroids), nprobe)
+
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        positions = np.full((len(queries), k), -1, dtype=np.int64)
+        for i, (query, lists) in enumerate(zip(queries, probed)):
+            # The probed lists are contiguous slices of the vectors
+            candidates = np.concatenate([np.arange(self.offsets[j], self.offsets[j + 1]) for j in lists])
+            scored = ((np.concatenate([self.vectors[self.offsets[j]:self.offsets[j + 1]] for j in lists]) - query) ** 2).sum(axis=1)
+            top = _top_k(scored[None, :], k)[0]
+            distances[i, :len(top)] = np.sqrt(scored[top])
+            positions[i, :len(top)] = candidates[top]
+        return distances, positions
+
+    def search_exact(self, queries: np.ndarray, k: int = DEFAULT_SIMILAR_TRACKS) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the exact k nearest tracks of each query vector by scoring every track, like search.
+
+        The queries are scored together against blocks of the vectors, one matrix product per
+        block. Expanded distances lose float32 precision between near-duplicate tracks, so the
+        best 2k candidates are rescored from their differences before the k nearest are kept.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        candidates = 2 * k
+        distances = np.full((len(queries), 0), np.inf, dtype=np.float32)
+        positions = np.full((len(queries), 0), -1, dtype=np.int64)
+        block_rows = max(_BLOCK_DISTANCES // len(queries), candidates)
+        for start in range(0, len(self.vectors), block_rows):
+            # Keep the best candidates so far and those of each block of vectors
+            block = _squared_distances(queries, self.vectors[start:start + block_rows])
+            block_top = _top_k(block, candidates)
+            distances = np.concatenate([distances, np.take_along_axis(block, block_top, axis=1)], axis=1)
+            positions = np.concatenate([positions, block_top + start], axis=1)
+            top = _top_k(distances, candidates)
+            distances, positions = np.take_along_axis(distances, top, axis=1), np.take_along_axis(positions, top, axis=1)
+
+        vectors = np.asarray(self.vectors[positions.ravel()]).reshape(*positions.shape, -1)
+        distances = ((vectors - queries[:, None, :]) ** 2).sum(axis=2)
+        top = _top_k(distances, k)
+        return np.sqrt(np.take_along_axis(distances, top, axis=1)), np.take_along_axis(positions, top, axis=1)
+
+    def find(self, text: str, limit: int = 50) -> pd.DataFrame:
+        """Returns up to `limit` tracks whose name or primary artist contains `text` (ignoring case), indexed by position."""
+        matches = pc.or_(
+            pc.match_substring(self.tracks["name"], text, ignore_case=True),
+            pc.match_substring(self.tracks["primary_artist"], text, ignore_case=True)
+        )
+        positions = np.flatnonzero(matches.to_numpy(zero_copy_only=False).astype(bool))[:limit]
+        return self.tracks.take(positions).to_pandas().set_index(pd.Index(positions))
+
+    def similar_tracks(self, position: int, k: int = DEFAULT_SIMILAR_TRACKS, nprobe: int = DEFAULT_NPROBE) -> pd.DataFrame:
+        """
+        Returns the k tracks nearest to the track at `position`, with their distance and features.
+
+        Copies of the track itself (rows with its song_id, e.g. on other albums) are left out.
+        """
+        song_id = self.tracks["song_id"][position].as_py()
+        # Over-fetch, since copies of the track are removed
+        distances, positions = self.search(self.vectors[position], k + 10, nprobe)
+        found = positions[0] >= 0
+        df = self.tracks.take(positions[0][found]).to_pandas()
+        df["distance"] = distances[0][found]
+        df[SIMILARITY_FEATURES] = np.asarray(self.vectors[positions[0][found]])
+        return df[df["song_id"] != song_id].head(k).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    from backends import create_backend
+
+    parser = argparse.ArgumentParser(description="Build the similarity index of the tracks like this panel.")
+    parser.add_argument("--output", default=DEFAULT_INDEX_PATH, help="Index directory (SPOTIFY_SIMILARITY_INDEX of the dashboard)")
+    parser.add_argument("--lists", type=int, help="Number of k-means lists (defaults to sqrt of the number of tracks)")
+    args = parser.parse_args()
+
+    # Reads spotify_music_analysis from the engine selected by SPOTIFY_DASHBOARD_BACKEND
+    backend = create_backend()
+    sql = similarity_query(backend.dataset)
+    start = time.perf_counter()
+    tracks_df = backend.query(sql)
+    index = SimilarityIndex.build(tracks_df, args.lists, metadata={
+        "source": backend.name,
+        "source_version": backend.source_version(sql),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    })
+    index.save(args.output)
+    print(f"Indexed {len(index)} tracks in {index.metadata['lists']} lists to {args.output} "
+          f"in {time.perf_counter() - start:.1f}s")
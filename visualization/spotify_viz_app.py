@@ -1,8 +1,20 @@
+import os
+import time
+
+import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import streamlit as st
-from google.cloud import bigquery
+
+from backends import create_backend, run_queries
+from panels import PANEL_BUILDERS, correlation_matrix, density_grids
+from queries import (
+    DECADE_KEYED_PANELS, DEFAULT_DENSITY_BINS, DEFAULT_SAMPLE_SIZE, DEFAULT_TOP_ARTISTS, DENSITY_FEATURES,
+    decades_query, density_query, panel_params, panel_queries, rollup_queries, similarity_query
+)
+from result_cache import create_result_cache
+
+# plotly and the similarity index are imported by the sections that use them, so the first view
+# does not wait for them and each rerun only imports what its section draws
 
 # Page configuration
 st.set_page_config(
@@ -40,285 +52,373 @@ st.markdown("<h1 class='main-header'>Spotify Music Analysis Dashboard</h1>", uns
 st.markdown("Explore trends and patterns in Spotify music data across decades, genres, and audio features.")
 st.markdown("---")
 
-# Initialize BigQuery client using application default credentials
+# Initialize the query engine selected by SPOTIFY_DASHBOARD_BACKEND (BigQuery by default).
+# The local DuckDB engine materializes its rollups on start, so it is kept across reruns.
+@st.cache_resource
+def get_backend():
+    return create_backend()
+
+
 try:
-    client = bigquery.Client(project="data-engineering-spotify")
-    st.sidebar.success("✅ Connected to BigQuery using Application Default Credentials")
+    backend = get_backend()
+    st.sidebar.success(f"✅ Connected to {backend.name}")
     connection_successful = True
 except Exception as e:
-    st.sidebar.error(f"Error connecting to BigQuery: {e}")
+    st.sidebar.error(f"Error connecting to the query engine: {e}")
     st.sidebar.warning("Please run 'gcloud auth application-default login' in your terminal")
     connection_successful = False
 
 
-# Function to run BigQuery queries
-@st.cache_data(ttl=3600)
-def run_query(query):
-    try:
-        df = client.query(query).to_dataframe()
-        return df
-    except Exception as e:
-        st.error(f"Error executing query: {e}")
-        return pd.DataFrame()
+# Query results are cached on disk and shared by every session and process; see result_cache.py
+@st.cache_resource
+def get_result_cache():
+    return create_result_cache()
 
 
-# Only proceed if connection is successful
-if connection_successful:
-    # Sidebar filters
-    st.sidebar.header("Filters")
+result_cache = get_result_cache()
 
-    # Get decades for filtering
-    decades_query = """
-    SELECT DISTINCT decade 
-    FROM `data-engineering-spotify.dbt_spotify.spotify_music_analysis`
-    WHERE decade IS NOT NULL
-    ORDER BY decade
-    """
-    decades_df = run_query(decades_query)
 
-    if not decades_df.empty:
-        decades = decades_df['decade'].tolist()
-        selected_decades = st.sidebar.multiselect(
-            "Select Decades",
-            decades,
-            default=decades[:5] if len(decades) >= 5 else decades
-        )
+# Nearest-neighbour index of the tracks like this panel, built by similarity.py and loaded once per
+# process; its vectors are memory-mapped, so every process on the host shares them
+@st.cache_resource
+def get_similarity_index():
+    from similarity import DEFAULT_INDEX_PATH, SimilarityIndex
 
-        # Fix the f-string issue by constructing the filter differently
-        if selected_decades:
-            quoted_decades = [f"'{d}'" for d in selected_decades]
-            decades_filter = f"AND decade IN ({', '.join(quoted_decades)})"
-        else:
-            decades_filter = ""
+    path = os.environ.get("SPOTIFY_SIMILARITY_INDEX", DEFAULT_INDEX_PATH)
+    return SimilarityIndex.load(path) if os.path.isdir(path) else None
 
-        # Main dashboard content
-        # 1. Decade Overview
-        st.markdown("<h2 class='section-header'>Music Across Decades</h2>", unsafe_allow_html=True)
 
-        col1, col2 = st.columns(2)
+# Function to run dashboard queries; errors are raised rather than returned so they are never cached.
+# Whether the result cache was hit and the query's job statistics are recorded in `attributes`.
+def cached_query(attributes):
+    attributes["cache_hit"] = True
 
-        # Audio features by decade
-        features_query = f"""
-        SELECT 
-            decade,
-            AVG(danceability) as avg_danceability,
-            AVG(energy) as avg_energy,
-            AVG(valence) as avg_valence,
-            AVG(acousticness) as avg_acousticness,
-            COUNT(*) as track_count
-        FROM `data-engineering-spotify.dbt_spotify.spotify_music_analysis`
-        WHERE decade IS NOT NULL {decades_filter}
-        GROUP BY decade
-        ORDER BY decade
-        """
-        features_df = run_query(features_query)
-
-        if not features_df.empty:
-            with col1:
-                # Convert to long format for plotly
-                features_long = pd.melt(
-                    features_df,
-                    id_vars=['decade', 'track_count'],
-                    value_vars=['avg_danceability', 'avg_energy', 'avg_valence', 'avg_acousticness'],
-                    var_name='feature', value_name='value'
-                )
+    def run(query, params):
+        attributes["cache_hit"] = False
+        return backend.query(query, params, attributes)
+    return run
 
-                # Clean feature names
-                features_long['feature'] = features_long['feature'].str.replace('avg_', '')
 
-                # Create the line chart
-                fig = px.line(
-                    features_long,
-                    x='decade',
-                    y='value',
-                    color='feature',
-                    title="Audio Features Evolution Across Decades",
-                    labels={'value': 'Average Value (0-1)', 'decade': 'Decade', 'feature': 'Audio Feature'},
-                    markers=True,
-                    line_shape='spline',
-                    color_discrete_sequence=px.colors.qualitative.Set1
-                )
-                fig.update_layout(height=500, legend_title_text='Audio Feature')
-                st.plotly_chart(fig, use_container_width=True)
+def fetch_query(query, params=None, attributes=None):
+    return result_cache.fetch(query, cached_query({} if attributes is None else attributes),
+                              backend.source_version(query), params)
 
-                st.markdown(
-                    "<p class='insight-text'>This chart shows how key audio features have evolved over the decades. Danceability, energy, and valence (positivity) reflect changing musical preferences and production techniques.</p>",
-                    unsafe_allow_html=True)
 
-            with col2:
-                # Mood distribution by decade
-                mood_query = f"""
-                SELECT 
-                    decade,
-                    mood,
-                    COUNT(*) as track_count
-                FROM `data-engineering-spotify.dbt_spotify.spotify_music_analysis`
-                WHERE decade IS NOT NULL {decades_filter}
-                GROUP BY decade, mood
-                ORDER BY decade, mood
-                """
-                mood_df = run_query(mood_query)
-
-                if not mood_df.empty:
-                    # Calculate percentage within each decade
-                    mood_pivot = mood_df.pivot_table(
-                        index='decade',
-                        columns='mood',
-                        values='track_count',
-                        fill_value=0
-                    )
-                    mood_pivot_percent = mood_pivot.div(mood_pivot.sum(axis=1), axis=0) * 100
+# With client-side filtering (the default), the aggregate panels are derived in pandas from
+# per-decade rollups fetched once for every decade, so changing the selection needs no query.
+# SPOTIFY_DASHBOARD_FILTERING=server runs the parameterized panel queries for each selection instead.
+CLIENT_FILTERING = os.environ.get("SPOTIFY_DASHBOARD_FILTERING", "client").lower() != "server"
 
-                    # Convert back to long format for plotting
-                    mood_long = mood_pivot_percent.reset_index().melt(
-                        id_vars=['decade'],
-                        var_name='mood',
-                        value_name='percentage'
-                    )
+# Tracks shown in the feature scatter plot; the sample is deterministic, so it is cached like any result
+SAMPLE_SIZE = int(os.environ.get("SPOTIFY_SAMPLE_SIZE", DEFAULT_SAMPLE_SIZE))
 
-                    # Create stacked bar chart
-                    fig = px.bar(
-                        mood_long,
-                        x='decade',
-                        y='percentage',
-                        color='mood',
-                        title="Mood Distribution by Decade",
-                        labels={'percentage': 'Percentage of Tracks', 'decade': 'Decade', 'mood': 'Mood'},
-                        color_discrete_map={'Happy': '#1DB954', 'Sad': '#191414', 'Ambivalent': '#CCCCCC'}
-                    )
-                    fig.update_layout(height=500, barmode='stack', legend_title_text='Mood')
-                    st.plotly_chart(fig, use_container_width=True)
-
-                    st.markdown(
-                        "<p class='insight-text'>This chart shows the distribution of happy, sad, and ambivalent songs across decades, revealing shifting emotional tones in popular music.</p>",
-                        unsafe_allow_html=True)
-
-        # 2. Musical Key Analysis
-        st.markdown("<h2 class='section-header'>Musical Key Insights</h2>", unsafe_allow_html=True)
-
-        key_query = f"""
-        SELECT 
-            key_description,
-            modality_description,
-            COUNT(*) as track_count,
-            AVG(valence) as avg_valence
-        FROM `data-engineering-spotify.dbt_spotify.spotify_music_analysis`
-        WHERE decade IS NOT NULL {decades_filter}
-        GROUP BY key_description, modality_description
-        ORDER BY track_count DESC
-        """
-        key_df = run_query(key_query)
-
-        if not key_df.empty:
-            col1, col2 = st.columns(2)
-
-            with col1:
-                # Create combined key-modality labels and calculate percentages
-                key_df['key_mode'] = key_df['key_description'] + ' ' + key_df['modality_description']
-                key_df['percentage'] = key_df['track_count'] / key_df['track_count'].sum() * 100
-
-                # Sort by track count
-                key_df_sorted = key_df.sort_values(by='track_count', ascending=False)
-
-                # Create horizontal bar chart for key distribution
+# Artists per decade in the top artists panels; only those rows are fetched
+TOP_ARTISTS = int(os.environ.get("SPOTIFY_TOP_ARTISTS", DEFAULT_TOP_ARTISTS))
+
+# Bins per axis of the feature density plot; its result and chart have at most moods x bins² cells
+DENSITY_BINS = int(os.environ.get("SPOTIFY_DENSITY_BINS", DEFAULT_DENSITY_BINS))
+
+
+def fetch_panel(name, query, selected_decades, attributes):
+    all_decades = panel_params([], SAMPLE_SIZE, TOP_ARTISTS, DENSITY_BINS)
+    if CLIENT_FILTERING and name in PANEL_BUILDERS:
+        rollup = fetch_query(rollup_queries(backend.dataset)[name], all_decades, attributes)
+        return PANEL_BUILDERS[name](rollup, selected_decades)
+    if name in DECADE_KEYED_PANELS:
+        # Every decade selection is filtered from the one cached all-decades result
+        return result_cache.fetch_decades(
+            query, cached_query(attributes), backend.source_version(query), selected_decades, all_decades
+        )
+    return fetch_query(query, panel_params(selected_decades, SAMPLE_SIZE, TOP_ARTISTS, DENSITY_BINS), attributes)
+
+
+def run_query(name, query):
+    # Run through run_queries so the query is timed and traced like the panel queries
+    result = run_queries(lambda q, attributes: fetch_query(q, attributes=attributes), {name: query})[name]
+    if result.error is not None:
+        st.error(f"Error executing the {name} query: {result.error}")
+    return result.df
+
+
+def run_panel_query(name, query, selected_decades):
+    # Run a panel query that depends on a section's widgets, timed and traced like the others
+    result = run_queries(
+        lambda panel, attributes: fetch_panel(*panel, selected_decades, attributes), {name: (name, query)}
+    )[name]
+    if result.error is not None:
+        st.error(f"Error executing the {name} query: {result.error}")
+    return result
+
+
+def describe(result):
+    status = f"failed: {result.error}" if result.error else "ok"
+    memory_kib = result.df.memory_usage(deep=True).sum() / 1024
+    cache = "cache hit" if result.attributes.get("cache_hit") else "cache miss"
+    billed = result.attributes.get("bytes_billed")
+    billed = f", {billed / 1024 ** 2:.1f} MiB billed" if billed is not None else ""
+    return f"{result.seconds * 1000:.0f} ms, {len(result.df)} rows, {memory_kib:.0f} KiB, {cache}{billed} ({status})"
+
+
+def run_panel_queries(selected_decades, names):
+    # Run the independent queries of the open section's panels concurrently, so a cold page load
+    # takes about as long as the slowest query instead of the sum of all of them
+    queries = {name: query for name, query in panel_queries(backend.dataset).items() if name in names}
+    if not queries:
+        return {}
+
+    start = time.perf_counter()
+    results = run_queries(
+        lambda panel, attributes: fetch_panel(*panel, selected_decades, attributes),
+        {name: (name, query) for name, query in queries.items()}
+    )
+    wall_seconds = time.perf_counter() - start
+
+    with st.sidebar.expander("Query timings and frame sizes"):
+        for name, result in results.items():
+            st.caption(f"{name}: {describe(result)}")
+        st.caption(f"All panels: {wall_seconds * 1000:.0f} ms wall clock, "
+                   f"{sum(r.seconds for r in results.values()) * 1000:.0f} ms summed")
+
+    # A failed query only blanks its own panel; every other panel still renders
+    for name, result in results.items():
+        if result.error is not None:
+            st.error(f"Error executing the {name} query: {result.error}")
+
+    return {name: result.df for name, result in results.items()}
+
+
+def render_decades(panels, selected_decades):
+    import plotly.express as px
+
+    st.markdown("<h2 class='section-header'>Music Across Decades</h2>", unsafe_allow_html=True)
+
+    col1, col2 = st.columns(2)
+
+    # Audio features by decade
+    features_df = panels['features']
+
+    if not features_df.empty:
+        with col1:
+            # Convert to long format for plotly
+            features_long = pd.melt(
+                features_df,
+                id_vars=['decade', 'track_count'],
+                value_vars=['avg_danceability', 'avg_energy', 'avg_valence', 'avg_acousticness'],
+                var_name='feature', value_name='value'
+            )
+
+            # Clean feature names
+            features_long['feature'] = features_long['feature'].str.replace('avg_', '')
+
+            # Create the line chart
+            fig = px.line(
+                features_long,
+                x='decade',
+                y='value',
+                color='feature',
+                title="Audio Features Evolution Across Decades",
+                labels={'value': 'Average Value (0-1)', 'decade': 'Decade', 'feature': 'Audio Feature'},
+                markers=True,
+                line_shape='spline',
+                color_discrete_sequence=px.colors.qualitative.Set1
+            )
+            fig.update_layout(height=500, legend_title_text='Audio Feature')
+            st.plotly_chart(fig, use_container_width=True)
+
+            st.markdown(
+                "<p class='insight-text'>This chart shows how key audio features have evolved over the decades. Danceability, energy, and valence (positivity) reflect changing musical preferences and production techniques.</p>",
+                unsafe_allow_html=True)
+
+        with col2:
+            # Mood distribution by decade
+            mood_df = panels['mood']
+
+            if not mood_df.empty:
+                # Calculate percentage within each decade
+                mood_pivot = mood_df.pivot_table(
+                    index='decade',
+                    columns='mood',
+                    values='track_count',
+                    fill_value=0,
+                    observed=True
+                )
+                mood_pivot_percent = mood_pivot.div(mood_pivot.sum(axis=1), axis=0) * 100
+
+                # Convert back to long format for plotting
+                mood_long = mood_pivot_percent.reset_index().melt(
+                    id_vars=['decade'],
+                    var_name='mood',
+                    value_name='percentage'
+                )
+
+                # Create stacked bar chart
                 fig = px.bar(
-                    key_df_sorted.head(12),  # Top 12 keys
-                    x='percentage',
-                    y='key_mode',
-                    color='modality_description',
-                    title="Most Popular Musical Keys",
-                    labels={'percentage': 'Percentage of Tracks', 'key_mode': 'Musical Key',
-                            'modality_description': 'Mode'},
-                    color_discrete_map={'Major': '#1DB954', 'Minor': '#191414'},
-                    orientation='h'
+                    mood_long,
+                    x='decade',
+                    y='percentage',
+                    color='mood',
+                    title="Mood Distribution by Decade",
+                    labels={'percentage': 'Percentage of Tracks', 'decade': 'Decade', 'mood': 'Mood'},
+                    color_discrete_map={'Happy': '#1DB954', 'Sad': '#191414', 'Ambivalent': '#CCCCCC'}
                 )
-                fig.update_layout(height=500, yaxis={'categoryorder': 'total ascending'})
+                fig.update_layout(height=500, barmode='stack', legend_title_text='Mood')
                 st.plotly_chart(fig, use_container_width=True)
 
                 st.markdown(
-                    "<p class='insight-text'>This chart shows the most commonly used musical keys in the dataset. The distribution reveals preferences for certain keys and modalities in popular music.</p>",
+                    "<p class='insight-text'>This chart shows the distribution of happy, sad, and ambivalent songs across decades, revealing shifting emotional tones in popular music.</p>",
                     unsafe_allow_html=True)
 
-            with col2:
-                # Create a heatmap for valence (happiness) by key and mode
-                pivot_df = key_df.pivot_table(
-                    index='modality_description',
-                    columns='key_description',
-                    values='avg_valence',
-                    fill_value=0
-                )
 
-                # Define the order of keys for the heatmap (circle of fifths)
-                key_order = ['C', 'G', 'D', 'A', 'E', 'B', 'F#/Gb', 'C#/Db', 'G#/Ab', 'D#/Eb', 'A#/Bb', 'F']
-                mode_order = ['Major', 'Minor']
+def render_keys(panels, selected_decades):
+    import plotly.express as px
 
-                # Reindex to ensure correct order
-                ordered_pivot = pivot_df.reindex(index=mode_order, columns=key_order)
+    st.markdown("<h2 class='section-header'>Musical Key Insights</h2>", unsafe_allow_html=True)
 
-                # Create the heatmap
-                fig = px.imshow(
-                    ordered_pivot,
-                    x=ordered_pivot.columns,
-                    y=ordered_pivot.index,
-                    color_continuous_scale='Viridis',
-                    title="Average 'Happiness' (Valence) by Musical Key",
-                    labels=dict(x="Musical Key", y="Mode", color="Avg. Valence (0-1)")
-                )
+    key_df = panels['key']
 
-                fig.update_layout(height=500)
-                st.plotly_chart(fig, use_container_width=True)
+    if not key_df.empty:
+        col1, col2 = st.columns(2)
 
-                st.markdown(
-                    "<p class='insight-text'>This heatmap reveals the average 'happiness' level (valence) of songs in different musical keys and modes. Traditionally, major keys are associated with happier emotional tones.</p>",
-                    unsafe_allow_html=True)
+        with col1:
+            # Create combined key-modality labels and calculate percentages
+            key_df['key_mode'] = key_df['key_description'].astype(str) + ' ' + key_df['modality_description'].astype(str)
+            key_df['percentage'] = key_df['track_count'] / key_df['track_count'].sum() * 100
+
+            # Sort by track count
+            key_df_sorted = key_df.sort_values(by='track_count', ascending=False)
+
+            # Create horizontal bar chart for key distribution
+            fig = px.bar(
+                key_df_sorted.head(12),  # Top 12 keys
+                x='percentage',
+                y='key_mode',
+                color='modality_description',
+                title="Most Popular Musical Keys",
+                labels={'percentage': 'Percentage of Tracks', 'key_mode': 'Musical Key',
+                        'modality_description': 'Mode'},
+                color_discrete_map={'Major': '#1DB954', 'Minor': '#191414'},
+                orientation='h'
+            )
+            fig.update_layout(height=500, yaxis={'categoryorder': 'total ascending'})
+            st.plotly_chart(fig, use_container_width=True)
+
+            st.markdown(
+                "<p class='insight-text'>This chart shows the most commonly used musical keys in the dataset. The distribution reveals preferences for certain keys and modalities in popular music.</p>",
+                unsafe_allow_html=True)
+
+        with col2:
+            # Create a heatmap for valence (happiness) by key and mode
+            pivot_df = key_df.pivot_table(
+                index='modality_description',
+                columns='key_description',
+                values='avg_valence',
+                fill_value=0,
+                observed=True
+            )
+
+            # Define the order of keys for the heatmap (circle of fifths)
+            key_order = ['C', 'G', 'D', 'A', 'E', 'B', 'F#/Gb', 'C#/Db', 'G#/Ab', 'D#/Eb', 'A#/Bb', 'F']
+            mode_order = ['Major', 'Minor']
+
+            # Reindex to ensure correct order
+            ordered_pivot = pivot_df.reindex(index=mode_order, columns=key_order)
+
+            # Create the heatmap
+            fig = px.imshow(
+                ordered_pivot,
+                x=ordered_pivot.columns,
+                y=ordered_pivot.index,
+                color_continuous_scale='Viridis',
+                title="Average 'Happiness' (Valence) by Musical Key",
+                labels=dict(x="Musical Key", y="Mode", color="Avg. Valence (0-1)")
+            )
+
+            fig.update_layout(height=500)
+            st.plotly_chart(fig, use_container_width=True)
+
+            st.markdown(
+                "<p class='insight-text'>This heatmap reveals the average 'happiness' level (valence) of songs in different musical keys and modes. Traditionally, major keys are associated with happier emotional tones.</p>",
+                unsafe_allow_html=True)
+
+
+def render_relationships(panels, selected_decades):
+    import plotly.express as px
+
+    st.markdown("<h2 class='section-header'>Audio Feature Relationships</h2>", unsafe_allow_html=True)
+
+    # Moment sums over every selected track
+    moments_df = panels['corr']
+
+    if not moments_df.empty and moments_df['track_count'].fillna(0).sum() > 0:
+        col1, col2 = st.columns(2)
+
+        with col1:
+            # Create correlation matrix heatmap; exact over all selected tracks, not just the sample
+            corr_matrix = correlation_matrix(moments_df)
+
+            # Plot correlation matrix
+            fig = px.imshow(
+                corr_matrix,
+                text_auto='.2f',
+                color_continuous_scale='RdBu_r',
+                title="Correlation Between Audio Features",
+                range_color=[-1, 1]
+            )
+            fig.update_layout(height=500)
+            st.plotly_chart(fig, use_container_width=True)
+
+            st.markdown(
+                "<p class='insight-text'>This correlation matrix shows relationships between different audio features. Strong positive correlations appear in dark blue, while negative correlations appear in dark red.</p>",
+                unsafe_allow_html=True)
+
+        with col2:
+            # Feature selection for the density or scatter plot
+            plot = st.radio("Plot", ["Density", "Sample"], horizontal=True,
+                            help="Density counts every selected track in bins; Sample draws a sample of tracks as points")
+            x_feature = st.selectbox("X-axis feature", list(DENSITY_FEATURES), index=0)
+            y_feature = st.selectbox("Y-axis feature", list(DENSITY_FEATURES), index=1)
+            x_label = x_feature.capitalize().replace('_scaled', ' (scaled)')
+            y_label = y_feature.capitalize().replace('_scaled', ' (scaled)')
+
+            if plot == "Density":
+                # 2D histogram of every selected track, binned in the query engine: the result and the
+                # chart have the same size whether a hundred or a million tracks match
+                result = run_panel_query("density", density_query(x_feature, y_feature, backend.dataset),
+                                         selected_decades)
+                if result.df.empty:
+                    return
+                moods, grids = density_grids(result.df, selected_decades, DENSITY_BINS)
+
+                def bin_centers(feature):
+                    low, high = DENSITY_FEATURES[feature][1]
+                    return low + (np.arange(DENSITY_BINS) + 0.5) * (high - low) / DENSITY_BINS
 
-        # 3. Explore correlations between audio features
-        st.markdown("<h2 class='section-header'>Audio Feature Relationships</h2>", unsafe_allow_html=True)
-
-        # Get a sample of tracks for scatter plot
-        corr_query = f"""
-        SELECT 
-            danceability,
-            energy,
-            acousticness,
-            valence,
-            tempo/200 as tempo_scaled,  -- Scale tempo to 0-1 range (assuming max tempo around 200)
-            mood
-        FROM `data-engineering-spotify.dbt_spotify.spotify_music_analysis`
-        WHERE decade IS NOT NULL {decades_filter}
-        ORDER BY RAND()
-        LIMIT 5000
-        """
-        corr_df = run_query(corr_query)
-
-        if not corr_df.empty:
-            col1, col2 = st.columns(2)
-
-            with col1:
-                # Create correlation matrix heatmap
-                corr_matrix = corr_df[['danceability', 'energy', 'acousticness', 'valence', 'tempo_scaled']].corr()
-
-                # Plot correlation matrix
                 fig = px.imshow(
-                    corr_matrix,
-                    text_auto='.2f',
-                    color_continuous_scale='RdBu_r',
-                    title="Correlation Between Audio Features",
-                    range_color=[-1, 1]
+                    grids,
+                    facet_col=0,
+                    x=bin_centers(x_feature),
+                    y=bin_centers(y_feature),
+                    origin='lower',
+                    aspect='auto',
+                    color_continuous_scale='Viridis',
+                    title=f"Track Density: {x_feature.capitalize()} vs {y_feature.capitalize()}",
+                    labels={'x': x_label, 'y': y_label, 'color': 'Tracks'}
                 )
+                # Facets are titled by position; name them after their mood
+                fig.for_each_annotation(lambda a: a.update(text=moods[int(a.text.split('=')[-1])]))
                 fig.update_layout(height=500)
                 st.plotly_chart(fig, use_container_width=True)
 
+                st.caption(f"{grids.sum():,} tracks in {DENSITY_BINS}x{DENSITY_BINS} bins per mood; "
+                           f"density query: {describe(result)}")
                 st.markdown(
-                    "<p class='insight-text'>This correlation matrix shows relationships between different audio features. Strong positive correlations appear in dark blue, while negative correlations appear in dark red.</p>",
+                    "<p class='insight-text'>This density plot counts every selected track by two audio features, one panel per mood classification based on valence. Brighter bins hold more tracks.</p>",
                     unsafe_allow_html=True)
-
-            with col2:
-                # Feature selection for scatter plot
-                x_feature = st.selectbox("X-axis feature",
-                                         ['energy', 'danceability', 'acousticness', 'valence', 'tempo_scaled'], index=0)
-                y_feature = st.selectbox("Y-axis feature",
-                                         ['danceability', 'energy', 'acousticness', 'valence', 'tempo_scaled'], index=1)
+            else:
+                # A deterministic sample of tracks drawn as points
+                corr_df = run_panel_query("sample", panel_queries(backend.dataset)["sample"], selected_decades).df
+                if corr_df.empty:
+                    return
 
                 # Create scatter plot
                 fig = px.scatter(
@@ -328,8 +428,8 @@ if connection_successful:
                     color='mood',
                     title=f"Relationship: {x_feature.capitalize()} vs {y_feature.capitalize()}",
                     labels={
-                        x_feature: x_feature.capitalize().replace('_scaled', ' (scaled)'),
-                        y_feature: y_feature.capitalize().replace('_scaled', ' (scaled)'),
+                        x_feature: x_label,
+                        y_feature: y_label,
                         'mood': 'Mood'
                     },
                     opacity=0.7,
@@ -342,104 +442,179 @@ if connection_successful:
                     "<p class='insight-text'>This scatter plot allows you to explore relationships between different audio features. The color represents the mood classification based on valence.</p>",
                     unsafe_allow_html=True)
 
-        # 4. Additional insights section
-        st.markdown("<h2 class='section-header'>Additional Insights</h2>", unsafe_allow_html=True)
-
-        # Query to get top artists by decade
-        artist_query = f"""
-        SELECT 
-            decade,
-            primary_artist,
-            COUNT(*) as track_count,
-            AVG(danceability) as avg_danceability,
-            AVG(energy) as avg_energy,
-            AVG(valence) as avg_valence
-        FROM `data-engineering-spotify.dbt_spotify.spotify_music_analysis`
-        WHERE decade IS NOT NULL {decades_filter}
-        GROUP BY decade, primary_artist
-        HAVING COUNT(*) > 5  -- Only include artists with more than 5 tracks
-        ORDER BY decade, track_count DESC
-        """
-        artist_df = run_query(artist_query)
-
-        if not artist_df.empty:
-            # Create a dataframe with top 3 artists per decade
-            top_artists = artist_df.groupby('decade').apply(lambda x: x.nlargest(3, 'track_count')).reset_index(
-                drop=True)
-
-            col1, col2 = st.columns(2)
-
-            with col1:
-                # Top artists by decade table
-                st.subheader("Top Artists by Decade")
-
-                # Format the table for display
-                display_df = top_artists[['decade', 'primary_artist', 'track_count']].copy()
-                display_df.columns = ['Decade', 'Artist', 'Number of Tracks']
-
-                # Display as a styled table
-                st.dataframe(
-                    display_df,
-                    column_config={
-                        "Decade": st.column_config.TextColumn("Decade"),
-                        "Artist": st.column_config.TextColumn("Artist"),
-                        "Number of Tracks": st.column_config.NumberColumn("Number of Tracks")
-                    },
-                    hide_index=True,
-                    use_container_width=True
-                )
 
-            with col2:
-                # Create a chart showing audio features for top artists in the selected decades
-                selected_decade = st.selectbox(
-                    "Select decade for artist comparison",
-                    sorted(top_artists['decade'].unique())
-                )
+def render_insights(panels, selected_decades):
+    import plotly.graph_objects as go
 
-                decade_artists = top_artists[top_artists['decade'] == selected_decade].copy()
-
-                # Prepare data for radar chart
-                artists = decade_artists['primary_artist'].tolist()
-                fig = go.Figure()
-
-                for i, artist in enumerate(artists):
-                    artist_data = decade_artists[decade_artists['primary_artist'] == artist].iloc[0]
-
-                    fig.add_trace(go.Scatterpolar(
-                        r=[
-                            artist_data['avg_danceability'],
-                            artist_data['avg_energy'],
-                            artist_data['avg_valence'],
-                            artist_data['track_count'] / max(decade_artists['track_count'])  # Normalize
-                        ],
-                        theta=['Danceability', 'Energy', 'Valence', 'Popularity'],
-                        fill='toself',
-                        name=artist
-                    ))
-
-                fig.update_layout(
-                    polar=dict(
-                        radialaxis=dict(
-                            visible=True,
-                            range=[0, 1]
-                        )
-                    ),
-                    title=f"Artist Comparison in {selected_decade}",
-                    height=400
-                )
+    st.markdown("<h2 class='section-header'>Additional Insights</h2>", unsafe_allow_html=True)
 
-                st.plotly_chart(fig, use_container_width=True)
+    # Top artists of each decade, ranked at the source
+    top_artists = panels['artist']
 
-                st.markdown(
-                    "<p class='insight-text'>This radar chart compares the musical characteristics of top artists from the selected decade.</p>",
-                    unsafe_allow_html=True)
+    if not top_artists.empty:
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            # Top artists by decade table
+            st.subheader("Top Artists by Decade")
+
+            # Format the table for display
+            display_df = top_artists[['decade', 'primary_artist', 'track_count']].copy()
+            display_df.columns = ['Decade', 'Artist', 'Number of Tracks']
+
+            # Display as a styled table
+            st.dataframe(
+                display_df,
+                column_config={
+                    "Decade": st.column_config.TextColumn("Decade"),
+                    "Artist": st.column_config.TextColumn("Artist"),
+                    "Number of Tracks": st.column_config.NumberColumn("Number of Tracks")
+                },
+                hide_index=True,
+                use_container_width=True
+            )
+
+        with col2:
+            # Create a chart showing audio features for top artists in the selected decades
+            selected_decade = st.selectbox(
+                "Select decade for artist comparison",
+                sorted(top_artists['decade'].unique())
+            )
+
+            decade_artists = top_artists[top_artists['decade'] == selected_decade].copy()
+
+            # Prepare data for radar chart
+            artists = decade_artists['primary_artist'].tolist()
+            fig = go.Figure()
+
+            for i, artist in enumerate(artists):
+                artist_data = decade_artists[decade_artists['primary_artist'] == artist].iloc[0]
+
+                fig.add_trace(go.Scatterpolar(
+                    r=[
+                        artist_data['avg_danceability'],
+                        artist_data['avg_energy'],
+                        artist_data['avg_valence'],
+                        artist_data['track_count'] / max(decade_artists['track_count'])  # Normalize
+                    ],
+                    theta=['Danceability', 'Energy', 'Valence', 'Popularity'],
+                    fill='toself',
+                    name=artist
+                ))
+
+            fig.update_layout(
+                polar=dict(
+                    radialaxis=dict(
+                        visible=True,
+                        range=[0, 1]
+                    )
+                ),
+                title=f"Artist Comparison in {selected_decade}",
+                height=400
+            )
+
+            st.plotly_chart(fig, use_container_width=True)
+
+            st.markdown(
+                "<p class='insight-text'>This radar chart compares the musical characteristics of top artists from the selected decade.</p>",
+                unsafe_allow_html=True)
+
+
+def render_similar_tracks(panels, selected_decades):
+    # Nearest neighbours by audio features; the index is searched directly, so no panel query runs
+    from similarity import DEFAULT_SIMILAR_TRACKS
+
+    st.markdown("<h2 class='section-header'>Tracks Like This</h2>", unsafe_allow_html=True)
+
+    similarity_index = get_similarity_index()
+
+    if similarity_index is None:
+        st.info("Build the similarity index with 'python visualization/similarity.py' "
+                "to find tracks that sound alike.")
+        return
+
+    # The index is a snapshot of spotify_music_analysis: its results may be missing or show stale
+    # tracks once the table changed, so it is flagged until it is rebuilt
+    if similarity_index.metadata.get("source_version") != backend.source_version(similarity_query(backend.dataset)):
+        st.warning(f"The similarity index was built on {similarity_index.metadata.get('built_at', 'an unknown date')} "
+                   f"from other data than the dashboard reads; rebuild it with 'python visualization/similarity.py'.")
+
+    search = st.text_input("Find a track by name or artist")
+    matches = similarity_index.find(search) if search else pd.DataFrame()
+
+    if search and matches.empty:
+        st.warning(f"No tracks match '{search}'.")
+    elif not matches.empty:
+        position = st.selectbox(
+            "Track",
+            matches.index.tolist(),
+            format_func=lambda p: f"{matches.at[p, 'name']} by {matches.at[p, 'primary_artist']} "
+                                  f"({matches.at[p, 'decade'] or 'unknown decade'})"
+        )
+
+        start = time.perf_counter()
+        similar_df = similarity_index.similar_tracks(position, DEFAULT_SIMILAR_TRACKS)
+        search_ms = (time.perf_counter() - start) * 1000
+
+        display_df = similar_df[['name', 'primary_artist', 'decade', 'distance',
+                                 'danceability', 'energy', 'acousticness', 'valence']]
+        st.dataframe(
+            display_df,
+            column_config={
+                "name": st.column_config.TextColumn("Track"),
+                "primary_artist": st.column_config.TextColumn("Artist"),
+                "decade": st.column_config.TextColumn("Decade"),
+                "distance": st.column_config.NumberColumn("Distance", format="%.3f"),
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+
+        st.caption(f"{len(similar_df)} nearest of {len(similarity_index):,} tracks by audio features, "
+                   f"found in {search_ms:.1f} ms")
+
+
+# Dashboard sections: the panels each one reads and the function that draws it. Only the open
+# section is rendered, so a rerun (opening a section or changing one of its widgets) only fetches
+# and draws that section's panels.
+SECTIONS = {
+    "Music Across Decades": (["features", "mood"], render_decades),
+    "Musical Key Insights": (["key"], render_keys),
+    "Audio Feature Relationships": (["corr"], render_relationships),
+    "Additional Insights": (["artist"], render_insights),
+    "Tracks Like This": ([], render_similar_tracks),
+}
+
+
+# Only proceed if connection is successful
+if connection_successful:
+    # Sidebar filters
+    st.sidebar.header("Filters")
+
+    # Get decades for filtering
+    decades_df = run_query("decades", decades_query(backend.dataset))
+
+    if not decades_df.empty:
+        decades = decades_df['decade'].tolist()
+        selected_decades = st.sidebar.multiselect(
+            "Select Decades",
+            decades,
+            default=decades[:5] if len(decades) >= 5 else decades
+        )
+
+        # Main dashboard content: the open section's panel queries are dispatched at once and
+        # gathered before it renders
+        section = st.radio("Section", list(SECTIONS), horizontal=True)
+        panel_names, render_section = SECTIONS[section]
+        render_section(run_panel_queries(selected_decades, panel_names), selected_decades)
 
         # Footer with data info
         st.markdown("---")
-        st.caption("Data source: Spotify tracks dataset from BigQuery | Analyzed using dbt and Streamlit")
+        st.caption(f"Data source: Spotify tracks dataset from {backend.name} | Analyzed using dbt and Streamlit")
 
     else:
-        st.error("Error fetching decade data from BigQuery. Please check your connection and dataset.")
+        st.error(f"Error fetching decade data from {backend.name}. Please check your connection and dataset.")
 else:
     st.error("Please set up authentication to proceed.")
     st.info("Run 'gcloud auth application-default login' in your terminal, then restart this app.")